@@ -0,0 +1,244 @@
+"""
+Recognize a directory of passport and vehicle document images without Telegram.
+
+Usage:
+    python -m app.cli DIRECTORY [--type auto|passport|vehicle] [--output results.jsonl] [--concurrency 8]
+
+Every image goes through the bot's pipeline: preprocessing, the document classifier, local OCR if enabled,
+Mindee, validation and the confirmation text. The OCR cache is not used, so archived documents are re-verified.
+Results are appended to --output as they finish, as JSON lines or as CSV if the file name ends with .csv.
+
+Processed files are recorded in a manifest next to the output. Running the same command again skips the files
+whose content is unchanged, so an interrupted run resumes where it stopped; files that failed with an error
+(timeouts, Mindee unavailable) are tried again. Throughput and latency are printed at the end.
+
+With --type auto, only passports are recognized by their machine-readable zone. Other images are recorded
+as an error, so a second run with --type vehicle (or passport) picks them up.
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import logging
+import statistics
+import sys
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from io import BytesIO
+from pathlib import Path
+
+from app.config import s
+from app.models import PassportData, VehicleDocumentData
+from app.processors import PhotoProcessor
+from app.services.classifier import DocumentTypeMismatch, classify_document
+from app.services.local_ocr import local_reader
+from app.services.mindee import mindee_registry
+from app.services.ocr_executor import ocr_executor
+from app.services.preprocessing import PhotoQualityError, image_preprocessor
+from app.services.validation import InvalidDocument, validate_document
+from app.utils.file_utils import get_passport_extracted_text, get_vehicle_extracted_text
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+RETRIED_STATUSES = {"error"}  # Everything else is final and skipped when the run is resumed
+DATA_FIELDS = [  # The warnings have their own column
+    *(f.alias or name for name, f in PassportData.model_fields.items() if name != "warnings"),
+    *(f.alias or name for name, f in VehicleDocumentData.model_fields.items() if name != "warnings"),
+]
+CSV_FIELDS = ["file", "sha256", "doc_type", "status", "error", "warnings", "seconds", *DATA_FIELDS]
+
+
+@dataclass
+class Result:
+    file: str  # Relative to the input directory
+    sha256: str
+    doc_type: str | None = None
+    status: str = "error"  # ok, unrecognized, rejected, wrong_type, poor_quality or error
+    error: str | None = None
+    data: dict | None = None
+    warnings: list[str] = field(default_factory=list)
+    text: str | None = None  # The confirmation text the bot would show
+    seconds: float = 0.0
+
+
+# --- Manifest Class ---
+class Manifest:
+    """
+    The files already processed, as JSON lines of {"file", "sha256", "status"} appended after each result.
+    A file is done if its last entry has the same content hash and a final status.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.done: dict[str, str] = {}
+        if path.exists():
+            with path.open() as manifest:
+                for line in manifest:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # The last line of an interrupted run
+                    if entry["status"] in RETRIED_STATUSES:
+                        self.done.pop(entry["file"], None)
+                    else:
+                        self.done[entry["file"]] = entry["sha256"]
+        self._file = path.open("a")
+
+    def is_done(self, file: str, sha256: str) -> bool:
+        return self.done.get(file) == sha256
+
+    def record(self, result: Result):
+        entry = {"file": result.file, "sha256": result.sha256, "status": result.status}
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+# --- ResultWriter Class ---
+class ResultWriter:
+    """Appends results to a JSON lines or CSV file, flushed after every result."""
+
+    def __init__(self, path: Path):
+        self.is_csv = path.suffix.lower() == ".csv"
+        is_new = not path.exists() or path.stat().st_size == 0
+        self._file = path.open("a", newline="")
+        if self.is_csv:
+            self._csv = csv.DictWriter(self._file, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            if is_new:
+                self._csv.writeheader()
+
+    def write(self, result: Result):
+        if self.is_csv:
+            row = asdict(result) | (result.data or {})
+            row["warnings"] = "; ".join(result.warnings)
+            self._csv.writerow(row)
+        else:
+            self._file.write(json.dumps(asdict(result), ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+# --- Pipeline ---
+def find_images(directory: Path) -> list[Path]:
+    return sorted(path for path in directory.rglob("*") if path.is_file() and path.suffix.lower() in IMAGE_SUFFIXES)
+
+
+async def recognize(data: bytes, result: Result, doc_type: str):
+    """Fill `result` with what the bot would recognize in the image; `doc_type` "auto" runs the classifier."""
+    file = BytesIO(data)
+    file.name = Path(result.file).name
+    started = time.perf_counter()
+    try:
+        check_type = doc_type != "auto"
+        result.doc_type = await classify_document(file) if doc_type == "auto" else doc_type
+        if result.doc_type == "unknown":
+            # An error is retried on resume, unlike the final status the model of a guessed type would give
+            result.status, result.error = "error", "Document type not detected, run again with --type"
+        elif (document := await PhotoProcessor.recognize_file(file, result.doc_type, check_type=check_type)) is None:
+            result.status = "unrecognized"
+        else:
+            document = validate_document(result.doc_type, document)
+            result.status, result.data = "ok", document.model_dump(by_alias=True, exclude={"warnings"})
+            result.warnings = document.warnings
+            if result.doc_type == "passport":
+                result.text = await get_passport_extracted_text(document)
+            else:
+                result.text = await get_vehicle_extracted_text(document)
+    except InvalidDocument as e:
+        result.status, result.error = "rejected", "; ".join(e.reasons)
+    except DocumentTypeMismatch as e:
+        result.status, result.error = "wrong_type", str(e)
+    except PhotoQualityError as e:
+        result.status, result.error = "poor_quality", e.reason
+    except Exception as e:
+        logger.warning("Error processing %s: %r", result.file, e)
+        result.status, result.error = "error", repr(e)
+    result.seconds = round(time.perf_counter() - started, 3)
+
+
+async def run(directory: Path, output: Path, doc_type: str, concurrency: int, manifest_path: Path) -> dict:
+    """Process the images `concurrency` at a time and return the statistics of the run."""
+    images = find_images(directory)
+    queue: asyncio.Queue[Path] = asyncio.Queue()
+    for path in images:
+        queue.put_nowait(path)
+
+    manifest, writer = Manifest(manifest_path), ResultWriter(output)
+    statuses, timings = Counter(), []
+
+    async def worker():
+        while not queue.empty():
+            path = queue.get_nowait()
+            data = await asyncio.to_thread(path.read_bytes)
+            result = Result(file=path.relative_to(directory).as_posix(), sha256=hashlib.sha256(data).hexdigest())
+            if manifest.is_done(result.file, result.sha256):
+                statuses["skipped"] += 1
+                continue
+            await recognize(data, result, doc_type)
+            writer.write(result)  # Before the manifest: an interrupted run may repeat a result but never lose one
+            manifest.record(result)
+            statuses[result.status] += 1
+            timings.append(result.seconds)
+            processed = len(timings)
+            if processed % 100 == 0:
+                logger.info("%d/%d files processed", processed, len(images))
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        writer.close()
+        manifest.close()
+    return {"files": len(images), "statuses": statuses, "timings": timings, "duration": time.perf_counter() - started}
+
+
+def report(stats: dict):
+    timings = sorted(stats["timings"]) or [0.0]
+    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) >= 20 else timings[-1]
+    processed = len(stats["timings"])
+    print(f"{stats['files']} files, {processed} processed in {stats['duration']:.1f}s", file=sys.stderr)
+    print(f"statuses: {dict(stats['statuses'].most_common())}", file=sys.stderr)
+    print(
+        f"throughput {processed / stats['duration']:.2f} files/s, latency mean {statistics.mean(timings):.2f}s "
+        f"p50 {statistics.median(timings):.2f}s p95 {p95:.2f}s",
+        file=sys.stderr,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", type=Path, help="directory with the images, searched recursively")
+    parser.add_argument("--type", choices=["auto", "passport", "vehicle"], default="auto", help="document type")
+    parser.add_argument("--output", type=Path, default=Path("results.jsonl"), help=".jsonl or .csv file")
+    parser.add_argument("--manifest", type=Path, help="defaults to the output file name + .manifest")
+    parser.add_argument("--concurrency", type=int, default=s.ocr_max_concurrency, help="images in flight")
+    args = parser.parse_args()
+    if not args.directory.is_dir():
+        parser.error(f"{args.directory} is not a directory")
+
+    logging.basicConfig(level=logging.INFO)
+    if args.concurrency > ocr_executor.max_concurrency:
+        # Otherwise Mindee calls would wait for OCR_MAX_CONCURRENCY slots and reopen the connections above it
+        ocr_executor.resize(args.concurrency)
+        mindee_registry.transport.resize(args.concurrency)
+    manifest = args.manifest or args.output.with_name(args.output.name + ".manifest")
+    try:
+        stats = asyncio.run(run(args.directory, args.output, args.type, args.concurrency, manifest))
+    finally:
+        ocr_executor.shutdown()
+        image_preprocessor.shutdown()
+        local_reader.shutdown()
+        mindee_registry.close()
+    report(stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,84 @@
+import asyncio
+import logging
+import time
+
 from aiogram import Bot, F, Router
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command, CommandStart, StateFilter
 from aiogram.fsm.context import FSMContext
-from aiogram.types import CallbackQuery, Message, ReplyKeyboardRemove
+from aiogram.types import BufferedInputFile, CallbackQuery, Message, ReplyKeyboardRemove
 
 import app.keyboard as kb
 from app.config import s
+from app.middlewares import THROTTLED_TEXTS, TokenBucketLimiter
 from app.models import PassportData, VehicleDocumentData
 from app.processors import PhotoProcessor
-from app.services.openai import openai_service
-from app.states import Form
-from app.utils.file_utils import get_clean_text, get_summary_text
+from app.services.fleet import (
+    FleetItem,
+    FleetUploadError,
+    ProgressMessage,
+    get_fleet_text,
+    issue_policies,
+    list_archive,
+    merge_vehicles,
+    open_archive,
+    recognize_vehicles,
+)
+from app.services.media_groups import media_groups
+from app.services.ocr_queue import OCRJob, ocr_queue
+from app.services.openai import POLICY_BUSY_TEXT, POLICY_ERROR_TEXT, openai_service
+from app.services.policy_renderer import policy_renderer
+from app.services.policy_store import policy_repository, save_policies
+from app.services.replies import get_conversational_reply
+from app.session import Session
+from app.states import FleetForm, Form
+from app.storage import events_isolation
+from app.utils.file_utils import (
+    download_user_photo,
+    get_clean_text,
+    get_html_safe_prefix,
+    get_passport_extracted_text,
+    get_summary_text,
+    get_vehicle_extracted_text,
+)
 
 # Initialize the router
 router = Router()
+logger = logging.getLogger(__name__)
+
+# Keeps references to tasks started from handlers until they finish
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _run_in_background(coroutine):
+    """Run the slow part of an update after the handler has returned, e.g. a whole album or fleet upload."""
+    task = asyncio.create_task(coroutine)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def drain_background_tasks(timeout: float = s.webhook_shutdown_timeout):
+    """Wait for the albums, fleet uploads and fleet policies still being processed in the background, on shutdown."""
+    if _background_tasks:
+        logger.info("Waiting for %d background tasks", len(_background_tasks))
+        await asyncio.wait(set(_background_tasks), timeout=timeout)
+
 
 HELP_TEXT = (
     "Hello! I'm your car insurance assistant. 🤖\n\n"
-    "To start the process of getting your insurance policy, please use the /start command.\n\n"
+    "To start the process of getting your insurance policy, please use the /start command.\n"
+    "To insure several vehicles of one owner at once, use /fleet.\n"
+    "To get the policies you already bought again, use /mypolicies.\n\n"
     "If you get stuck at any point, you can always use the /cancel command to restart the process from the beginning."
 )
+NO_DATA_TEXT = "No data available."
+POLICY_NOT_FOUND_TEXT = "🛑 This policy was not found."
+FLEET_DOCUMENTS_TEXT = (
+    "✅ Passport data confirmed.\n\n"
+    "Now send the vehicle documents 🚗: photos in albums of up to 10, or a ZIP file with the photos. "
+    f"Up to {s.fleet_max_vehicles} vehicles can be insured at once."
+)
+ZIP_MIME_TYPES = {"application/zip", "application/x-zip-compressed"}
 
 
 # --- Command Handlers ---
@@ -42,22 +102,108 @@ async def handle_cancel(message: Message, state: FSMContext) -> None:
     )
 
 
+@router.message(Command("mypolicies"))
+async def handle_my_policies(message: Message):
+    """Lists the user's stored policies, newest first, to send them again without OCR or generation."""
+    try:
+        policies = await policy_repository.find_by_user(message.from_user.id, limit=s.my_policies_limit)
+    except Exception as e:
+        logger.warning("Policy store is unavailable: %r", e)
+        await message.answer("⏳ Your policies can't be loaded right now. Please try again in a few minutes.")
+        return
+
+    if not policies:
+        await message.answer("You don't have any policies yet. To get one, use the /start command.")
+    elif len(policies) == 1:
+        await message.answer(policies[0].policy_html, parse_mode="HTML")
+    else:
+        await message.answer(
+            "📄 Your policies, newest first. Choose one to get it again:", reply_markup=kb.my_policies_kb(policies)
+        )
+
+
+@router.callback_query(F.data.startswith("policy:"))
+async def handle_policy_choice(callback: CallbackQuery):
+    """Sends a stored policy again; only its owner can get it."""
+    try:
+        policy_id = int(callback.data.removeprefix("policy:"))
+    except ValueError:
+        await callback.answer(POLICY_NOT_FOUND_TEXT, show_alert=True)
+        return
+
+    try:
+        policy = await policy_repository.get(policy_id)
+    except Exception as e:
+        logger.warning("Policy store is unavailable: %r", e)
+        await callback.answer("⏳ The policy can't be loaded right now.", show_alert=True)
+        return
+
+    if policy is None or policy.user_id != callback.from_user.id:
+        await callback.answer(POLICY_NOT_FOUND_TEXT, show_alert=True)
+        return
+    await callback.message.answer(policy.policy_html, parse_mode="HTML")
+    await callback.answer()
+
+
 # --- PRIVATE HELPER FOR THIS MODULE ---
-async def _show_summary(message: Message, state: FSMContext, edit_mode: bool = False):
+async def _show_summary(message: Message, state: FSMContext, session: Session, edit_mode: bool = False):
     """Private helper to show summary and set state. Avoids code duplication."""
-    data = await state.get_data()
-    passport_data = PassportData.model_validate(data.get("passport_data"))
-    vehicle_data = VehicleDocumentData.model_validate(data.get("vehicle_document_data"))
-    summary_text = await get_summary_text(passport_data, vehicle_data)
+    summary_text = await get_summary_text(session.passport_data, session.vehicle_document_data)
 
     if edit_mode:
         await message.edit_text(summary_text, reply_markup=kb.document_confirm_kb)
     else:
         await message.answer(summary_text, reply_markup=kb.document_confirm_kb)
-    await state.update_data(summary_text_message=summary_text)
     await state.set_state(Form.waiting_for_summary_confirmation)
 
 
+async def _stream_policy(message: Message, passport_data: PassportData, vehicle_data: VehicleDocumentData) -> str:
+    """
+    Private helper that edits the message with the policy while OpenAI is still generating it.
+    Edits are spaced by `policy_stream_edit_interval` and every intermediate text is valid HTML.
+    Returns the complete policy, or the error text that was shown instead.
+    """
+    shown_text = ""
+    last_edit_at = 0.0
+    policy_text = ""
+    async for policy_text in openai_service.stream_policy_text(passport_data, vehicle_data):
+        if time.monotonic() - last_edit_at < s.policy_stream_edit_interval:
+            continue
+        partial_text = get_html_safe_prefix(policy_text)
+        if not partial_text or partial_text == shown_text:
+            continue
+        try:
+            await message.edit_text(partial_text, parse_mode="HTML")
+            shown_text = partial_text
+        except TelegramBadRequest as e:
+            logger.warning("Error editing streamed policy: %s", e)
+        last_edit_at = time.monotonic()
+
+    if policy_text and policy_text != shown_text:
+        await message.edit_text(policy_text, parse_mode="HTML")
+    return policy_text
+
+
+async def _enqueue_photo(message: Message, session: Session, bot: Bot, doc_type: str):
+    """
+    Private helper that hands the photo to the OCR workers and returns right away.
+    The worker edits the "processing" message with the result; the job id in the FSM data
+    lets it drop the result if the user has sent another photo or cancelled in the meantime.
+    """
+    await PhotoProcessor.remove_previous_keyboard(message, session, bot)
+    processing_msg = await message.answer("✨ Photo received, processing...")
+    job = OCRJob(
+        chat_id=message.chat.id,
+        user_id=message.from_user.id,
+        message_id=processing_msg.message_id,
+        doc_type=doc_type,
+        photo=message.photo[-1],
+    )
+    # Saved after the handler but still under the chat lock, which the worker takes before reading it
+    session.ocr_job_id = job.job_id
+    await ocr_queue.enqueue(job)
+
+
 # --- Start command handler ---
 @router.message(CommandStart())
 async def cmd_start(message: Message, state: FSMContext):
@@ -67,20 +213,57 @@ async def cmd_start(message: Message, state: FSMContext):
     await state.clear()  # Clear any previous state
     await message.answer(
         f"Hello, {message.from_user.first_name}!👋 Welcome to the insurance bot 🤖\n\n"
-        f"To start, please a send photo of your passport. 🛂"
+        f"To start, please a send photo of your passport. 🛂\n"
+        f"To save time, you can also send your passport and vehicle document together as one album. 📎"
     )
     await state.set_state(Form.waiting_for_passport)
 
 
+# --- 1. Both Documents at Once (an album of two photos) ---
+@router.message(Form.waiting_for_passport, F.photo, F.media_group_id, flags={"rate_limit": "ocr"})
+async def handle_document_album(message: Message, state: FSMContext, bot: Bot):
+    """
+    Collects an album with the passport and the vehicle document and recognizes both concurrently.
+    Album photos arrive as separate updates, so the first one schedules processing of the whole album.
+    """
+    if await media_groups.add(message.media_group_id, message.photo[-1]):
+        _run_in_background(_process_document_album(message, state, bot))
+
+
+async def _process_document_album(message: Message, state: FSMContext, bot: Bot):
+    """Private helper that recognizes a collected album and shows the combined summary."""
+    photos = await media_groups.collect(message.media_group_id)
+    # Runs outside of the update that started it, so it takes the chat lock itself; two OCR rounds
+    # (the second with the photos swapped) can take longer than the lock timeout, so it is renewed
+    async with events_isolation.hold(state.key):
+        if await state.get_state() != Form.waiting_for_passport.state:
+            return  # The user has moved on in the meantime
+
+        text, success, documents = await PhotoProcessor.process_document_pair(message, bot, photos)
+        if success and documents:
+            session = await Session.load(state)
+            session.passport_data, session.vehicle_document_data = documents
+            session.is_changing = False
+            await session.save(state)
+            await message.answer(text, reply_markup=kb.document_confirm_kb)
+            await state.set_state(Form.waiting_for_summary_confirmation)
+        elif text:
+            await message.answer(text)
+
+
 # --- 1 Passport Photo Handler ---
-@router.message(Form.waiting_for_passport, F.photo)
-async def handle_passport(message: Message, state: FSMContext, bot: Bot):
+@router.message(Form.waiting_for_passport, F.photo, flags={"rate_limit": "ocr"})
+async def handle_passport(message: Message, session: Session, bot: Bot):
     """
     Processes the passport photo using Mindee and asks for confirmation
     """
-    text, success, data_obj = await PhotoProcessor.process_photo(message, state, bot, "passport")
+    if s.ocr_queue:
+        await _enqueue_photo(message, session, bot, "passport")
+        return
+
+    text, success, data_obj = await PhotoProcessor.process_photo(message, session, bot, "passport")
     if success and data_obj:
-        await state.update_data(passport_data=data_obj.model_dump(by_alias=True), passport_confirm_text=text)
+        session.store_document("passport", data_obj)
         await message.answer(text, reply_markup=kb.document_confirm_kb)
     elif text:
         await message.answer(text)
@@ -88,25 +271,21 @@ async def handle_passport(message: Message, state: FSMContext, bot: Bot):
 
 # --- 1a. Passport Confirmation ---
 @router.callback_query(F.data.in_(["data_ok", "data_wrong", "cancel_changing"]), Form.waiting_for_passport)
-async def process_passport(callback: CallbackQuery, state: FSMContext):
+async def process_passport(callback: CallbackQuery, state: FSMContext, session: Session):
     """
     This function is called when the user confirms or rejects the passport data.
     If the user confirms, it sends a message asking for the vehicle document photo.
     If the user rejects, it asks them to send a new passport photo.
     If the user chooses to cancel changing, it sends a summary of the insurance data and asks
     """
-
-    data = await state.get_data()
-    is_changing = data.get("is_changing", False)
-
     if callback.data == "data_ok":
         clean_text = get_clean_text(callback.message.text)
         await callback.message.edit_text(clean_text, reply_markup=None)
 
-        if is_changing:
-            await state.update_data(is_changing=False)
+        if session.is_changing:
+            session.is_changing = False
             await callback.message.answer("✅ Data updated. Let's review the final summary again.")
-            await _show_summary(callback.message, state)
+            await _show_summary(callback.message, state, session)
         else:
             await callback.message.edit_text(
                 "✅ Passport data confirmed.\n\n"
@@ -120,12 +299,13 @@ async def process_passport(callback: CallbackQuery, state: FSMContext):
             "❌ Passport data is incorrect. Please send a new photo of your passport.",
             reply_markup=kb.cancel_only_kb,
         )
-        await state.update_data(msg_to_edit_id=msg_with_cancel_button.message_id)
+        session.msg_to_edit_id = msg_with_cancel_button.message_id
         await state.set_state(Form.waiting_for_passport)
 
     elif callback.data == "cancel_changing":
-        data = await state.get_data()
-        passport_confirm_text = data.get("passport_confirm_text", "No data available.")
+        passport_confirm_text = (
+            await get_passport_extracted_text(session.passport_data) if session.passport_data else NO_DATA_TEXT
+        )
         await callback.message.edit_text(passport_confirm_text, reply_markup=kb.document_confirm_kb)
         await state.set_state(Form.waiting_for_passport)
 
@@ -133,17 +313,18 @@ async def process_passport(callback: CallbackQuery, state: FSMContext):
 
 
 # --- 2. Vehicle Document Photo Handler ---
-@router.message(Form.waiting_for_vehicle_document, F.photo)
-async def handle_vehicle_document(message: Message, state: FSMContext, bot: Bot):
+@router.message(Form.waiting_for_vehicle_document, F.photo, flags={"rate_limit": "ocr"})
+async def handle_vehicle_document(message: Message, session: Session, bot: Bot):
     """
     Processes the vehicle document photo using Mindee and asks for confirmation.
     """
-    text, success, data_obj = await PhotoProcessor.process_photo(message, state, bot, "vehicle")
+    if s.ocr_queue:
+        await _enqueue_photo(message, session, bot, "vehicle")
+        return
+
+    text, success, data_obj = await PhotoProcessor.process_photo(message, session, bot, "vehicle")
     if success and data_obj:
-        await state.update_data(
-            vehicle_document_data=data_obj.model_dump(by_alias=True),
-            vehicle_confirm_text=text,
-        )
+        session.store_document("vehicle", data_obj)
         await message.answer(text, reply_markup=kb.document_confirm_kb)
     elif text:
         await message.answer(text)
@@ -151,7 +332,7 @@ async def handle_vehicle_document(message: Message, state: FSMContext, bot: Bot)
 
 # --- 2a. Vehicle Document Confirmation ---
 @router.callback_query(F.data.in_(["data_ok", "data_wrong", "cancel_changing"]), Form.waiting_for_vehicle_document)
-async def process_vehicle_document(callback: CallbackQuery, state: FSMContext):
+async def process_vehicle_document(callback: CallbackQuery, state: FSMContext, session: Session):
     """
     This function is called when the user confirms or rejects the vehicle document data.
     If the user confirms, it sends a message asking for the summary confirmation.
@@ -159,31 +340,31 @@ async def process_vehicle_document(callback: CallbackQuery, state: FSMContext):
     If the user chooses to cancel changing, it sends a summary of the insurance data and asks
     for confirmation.
     """
-
-    data = await state.get_data()
-    is_changing = data.get("is_changing", False)
-
     if callback.data == "data_ok":
-        if is_changing:
-            await state.update_data(is_changing=False)
+        if session.is_changing:
+            session.is_changing = False
 
-            await _show_summary(callback.message, state, edit_mode=True)
+            await _show_summary(callback.message, state, session, edit_mode=True)
 
             await callback.message.answer("✅ Data updated. Let's review the final summary again", show_alert=False)
 
         else:
-            await _show_summary(callback.message, state, edit_mode=True)
+            await _show_summary(callback.message, state, session, edit_mode=True)
 
     elif callback.data == "data_wrong":
         msg_with_cancel_button = await callback.message.edit_text(
             "❌ OK. Please send a new photo of your vehicle document.",
             reply_markup=kb.cancel_only_kb,
         )
-        await state.update_data(msg_to_edit_id=msg_with_cancel_button.message_id)
+        session.msg_to_edit_id = msg_with_cancel_button.message_id
         await state.set_state(Form.waiting_for_vehicle_document)
 
     elif callback.data == "cancel_changing":
-        vehicle_confirm_text = data.get("vehicle_confirm_text", "No data available.")
+        vehicle_confirm_text = (
+            await get_vehicle_extracted_text(session.vehicle_document_data)
+            if session.vehicle_document_data
+            else NO_DATA_TEXT
+        )
         await callback.message.edit_text(vehicle_confirm_text, reply_markup=kb.document_confirm_kb)
         await state.set_state(Form.waiting_for_vehicle_document)
 
@@ -192,16 +373,12 @@ async def process_vehicle_document(callback: CallbackQuery, state: FSMContext):
 
 # --- 3. Summary Confirmation ---
 @router.callback_query(F.data.in_(["data_ok", "data_wrong"]), Form.waiting_for_summary_confirmation)
-async def process_summary(callback: CallbackQuery, state: FSMContext):
+async def process_summary(callback: CallbackQuery, state: FSMContext, session: Session):
     """
     This function is called when the user confirms or rejects the summary data.
     If the user confirms, it sends a message asking for the insurance price confirmation.
     If the user rejects, it asks them to change the photo.
     """
-    data = await state.get_data()
-    summary_text_message = data.get("summary_text_message", "No data available.")
-    clean_text = get_clean_text(summary_text_message)
-
     if callback.data == "data_ok":
         await callback.message.edit_text(
             f"✅ Summary data confirmed.\n\nThe insurance price is: **{s.insurance_price} USD**. Do you agree?",
@@ -212,6 +389,7 @@ async def process_summary(callback: CallbackQuery, state: FSMContext):
         await state.set_state(Form.waiting_for_price_confirmation)
 
     elif callback.data == "data_wrong":
+        clean_text = get_clean_text(await get_summary_text(session.passport_data, session.vehicle_document_data))
         await callback.message.edit_text(
             f"{clean_text}\n\n❌ Summary data is incorrect. Choice which photo you want to change.",
             reply_markup=kb.change_photo_kb,
@@ -222,37 +400,57 @@ async def process_summary(callback: CallbackQuery, state: FSMContext):
 
 # --- 4. Price Confirmation ---
 @router.callback_query(F.data.in_(["confirm_yes", "confirm_no"]), Form.waiting_for_price_confirmation)
-async def handle_price_confirmation(callback: CallbackQuery, state: FSMContext):
+async def handle_price_confirmation(
+    callback: CallbackQuery, state: FSMContext, session: Session, rate_limiter: TokenBucketLimiter | None = None
+):
     """
     This function is called when the user confirms or rejects the insurance price.
-    If the user confirms, it generates the insurance policy text using OpenAI and sends it to the user.
+    If the user confirms, it renders the insurance policy (locally or with OpenAI) and sends it to the user.
     If the user rejects, it sends a message indicating that the price is not acceptable.
+    Only a policy generated with OpenAI takes from the "llm" rate limit; a throttled user can press the button again.
     """
+    if callback.data == "confirm_yes" and s.policy_mode != "template" and rate_limiter is not None:
+        exhausted = await rate_limiter.acquire("llm", callback.from_user.id)
+        if exhausted is not None:
+            await callback.answer(THROTTLED_TEXTS[exhausted], show_alert=True)
+            return
+
     if callback.data == "confirm_yes":
         await callback.message.edit_text(
             "✅ Purchase confirmed!\n\n🎨 Generating your insurance policy...",
             reply_markup=None,
         )
-        data = await state.get_data()
-        passport_data = PassportData.model_validate(data.get("passport_data"))
-        vehicle_data = VehicleDocumentData.model_validate(data.get("vehicle_document_data"))
+        passport_data, vehicle_data = session.passport_data, session.vehicle_document_data
 
-        policy_text = await openai_service.generate_policy_text(passport_data, vehicle_data)
+        if s.policy_mode == "template":
+            policy_text = policy_renderer.render_policy(passport_data, vehicle_data)
+            await callback.message.edit_text(
+                policy_text,
+                parse_mode="HTML",
+            )
+        elif s.policy_streaming:
+            policy_text = await _stream_policy(callback.message, passport_data, vehicle_data)
+        else:
+            policy_text = await openai_service.generate_policy_text(passport_data, vehicle_data)
 
-        await callback.message.edit_text(
-            policy_text,
-            parse_mode="HTML",
-        )
+            await callback.message.edit_text(
+                policy_text,
+                parse_mode="HTML",
+            )
 
+        if policy_text and policy_text not in (POLICY_BUSY_TEXT, POLICY_ERROR_TEXT):
+            await save_policies(callback.from_user.id, passport_data, [(vehicle_data, policy_text)])
         await callback.message.answer("Thank you for using our service! 🎉\n\n")
-        await state.clear()
+        session.clear()
+        await state.set_state(None)
 
     elif callback.data == "confirm_no":
         await callback.message.edit_text(
             "❌ We are sorry that the price did not suit you. This is the only available price. If you change your mind, please start over with /start.",
             reply_markup=None,
         )
-        await state.clear()
+        session.clear()
+        await state.set_state(None)
 
     await callback.answer()
 
@@ -262,7 +460,7 @@ async def handle_price_confirmation(callback: CallbackQuery, state: FSMContext):
     F.data.in_(["change_passport", "change_vehicle_document", "cancel_changing"]),
     Form.waiting_for_change_choice,
 )
-async def process_change_choice(callback: CallbackQuery, state: FSMContext):
+async def process_change_choice(callback: CallbackQuery, state: FSMContext, session: Session):
     """
     This function is called when the user chooses to change a photo or cancel the changing.
     It handles the following cases:
@@ -273,32 +471,237 @@ async def process_change_choice(callback: CallbackQuery, state: FSMContext):
     if callback.data == "change_passport":
         await callback.message.edit_reply_markup(reply_markup=None)
         await callback.message.answer("🛂 Please send a new photo of your passport.")
-        await state.update_data(is_changing=True)
+        session.is_changing = True
         await state.set_state(Form.waiting_for_passport)
 
     elif callback.data == "change_vehicle_document":
         await callback.message.edit_reply_markup(reply_markup=None)
         await callback.message.answer("🚗 Please send a new photo of your vehicle.")
-        await state.update_data(is_changing=True)
+        session.is_changing = True
         await state.set_state(Form.waiting_for_vehicle_document)
 
     elif callback.data == "cancel_changing":
         await callback.message.delete()
-        await _show_summary(callback.message, state)
+        await _show_summary(callback.message, state, session)
+
+    await callback.answer()
+
+
+# --- Fleet: several vehicles of one policyholder ---
+@router.message(Command("fleet"))
+async def cmd_fleet(message: Message, state: FSMContext):
+    """
+    Starts a fleet batch: the policyholder's passport first, then the vehicle documents
+    as albums or ZIP files, recognized together and insured with one policy per vehicle.
+    """
+    await state.clear()
+    await message.answer(
+        "🚚 Fleet insurance: one policy for each vehicle of the same policyholder.\n\n"
+        "First, please send a photo of the policyholder's passport. 🛂"
+    )
+    await state.set_state(FleetForm.waiting_for_passport)
+
 
+@router.message(FleetForm.waiting_for_passport, F.photo, flags={"rate_limit": "ocr"})
+async def handle_fleet_passport(message: Message, session: Session, bot: Bot):
+    """Processes the policyholder's passport photo and asks for confirmation."""
+    text, success, data_obj = await PhotoProcessor.process_photo(message, session, bot, "passport")
+    if success and data_obj:
+        session.passport_data = data_obj
+        await message.answer(text, reply_markup=kb.document_confirm_kb)
+    elif text:
+        await message.answer(text)
+
+
+@router.callback_query(F.data.in_(["data_ok", "data_wrong"]), FleetForm.waiting_for_passport)
+async def process_fleet_passport(callback: CallbackQuery, state: FSMContext, session: Session):
+    if callback.data == "data_ok" and session.passport_data:
+        await callback.message.edit_text(get_clean_text(callback.message.text), reply_markup=None)
+        await callback.message.answer(FLEET_DOCUMENTS_TEXT)
+        await state.set_state(FleetForm.waiting_for_vehicle_documents)
+    else:
+        session.passport_data = None
+        await callback.message.edit_text(
+            "❌ Passport data is incorrect. Please send a new photo of the policyholder's passport.", reply_markup=None
+        )
     await callback.answer()
 
 
+async def _process_fleet_upload(
+    message: Message,
+    state: FSMContext,
+    bot: Bot,
+    items: list[FleetItem] | None = None,
+    archive=None,
+    rate_limiter: TokenBucketLimiter | None = None,
+):
+    """
+    Private helper that recognizes the vehicle documents of one upload, album photos or a ZIP archive,
+    adds them to the fleet and shows the confirmation table. The caller must hold the chat lock.
+    """
+    session = await Session.load(state)
+    room = s.fleet_max_vehicles - len(session.fleet_vehicles)
+    try:
+        if archive is not None:
+            items = list_archive(archive, room)
+        elif len(items) > room:
+            raise FleetUploadError(f"🛑 Only {room} more vehicle(s) can be added to this fleet.")
+    except FleetUploadError as e:
+        await message.answer(str(e))
+        return
+
+    progress_msg = await message.answer(f"⏳ Recognizing {len(items)} vehicle document(s)...")
+    progress = ProgressMessage(progress_msg, "Recognizing vehicle documents", len(items))
+    await recognize_vehicles(items, bot, progress, archive, rate_limiter, message.from_user.id)
+
+    session.fleet_vehicles = merge_vehicles(session.fleet_vehicles, items)
+    await session.save(state)
+    failed = [item for item in items if item.error]
+    await progress_msg.edit_text(
+        get_fleet_text(session.passport_data, session.fleet_vehicles, failed),
+        parse_mode="HTML",
+        reply_markup=kb.fleet_confirm_kb if session.fleet_vehicles else None,
+    )
+
+
+# Fleet uploads are charged one "fleet" token per document by recognize_vehicles, not per update
+@router.message(FleetForm.waiting_for_vehicle_documents, F.photo)
+async def handle_fleet_photos(
+    message: Message, state: FSMContext, bot: Bot, rate_limiter: TokenBucketLimiter | None = None
+):
+    """
+    Collects vehicle document photos. A single photo is processed right away;
+    album photos arrive as separate updates, so the first one schedules processing of the whole album.
+    """
+    if message.media_group_id is None:
+        items = [FleetItem(label="photo 1", photo=message.photo[-1])]
+        _run_in_background(_process_fleet_batch(message, state, bot, items, rate_limiter=rate_limiter))
+    elif await media_groups.add(message.media_group_id, message.photo[-1]):
+        _run_in_background(_process_fleet_album(message, state, bot, rate_limiter))
+
+
+async def _process_fleet_album(
+    message: Message, state: FSMContext, bot: Bot, rate_limiter: TokenBucketLimiter | None = None
+):
+    photos = await media_groups.collect(message.media_group_id)
+    items = [FleetItem(label=f"photo {i}", photo=photo) for i, photo in enumerate(photos, 1)]
+    await _process_fleet_batch(message, state, bot, items, rate_limiter=rate_limiter)
+
+
+async def _process_fleet_batch(
+    message: Message,
+    state: FSMContext,
+    bot: Bot,
+    items: list[FleetItem] | None = None,
+    file=None,
+    rate_limiter: TokenBucketLimiter | None = None,
+):
+    """
+    Private helper that processes the photos or the downloaded ZIP `file` of one upload in the background.
+    A batch can take longer than an update may hold the chat lock, so it holds the lock itself and keeps renewing it.
+    """
+    try:
+        async with events_isolation.hold(state.key):
+            if await state.get_state() != FleetForm.waiting_for_vehicle_documents.state:
+                return  # The user has moved on in the meantime
+            if file is None:
+                await _process_fleet_upload(message, state, bot, items, rate_limiter=rate_limiter)
+                return
+            with open_archive(file) as archive:
+                await _process_fleet_upload(message, state, bot, archive=archive, rate_limiter=rate_limiter)
+    except FleetUploadError as e:
+        await message.answer(str(e))
+    finally:
+        if file is not None:
+            file.close()
+
+
+@router.message(FleetForm.waiting_for_vehicle_documents, F.document)
+async def handle_fleet_archive(
+    message: Message, state: FSMContext, bot: Bot, rate_limiter: TokenBucketLimiter | None = None
+):
+    """Downloads a ZIP file with vehicle document photos; the images are recognized in the background."""
+    document = message.document
+    if document.mime_type not in ZIP_MIME_TYPES and not (document.file_name or "").lower().endswith(".zip"):
+        await message.answer("🛑 Please send the vehicle documents as photos or as one ZIP file.")
+        return
+    if (document.file_size or 0) > s.fleet_max_zip_size:
+        await message.answer(f"🛑 The ZIP file must be smaller than {s.fleet_max_zip_size // 2**20} MB.")
+        return
+
+    file = await download_user_photo(document, bot, name=document.file_name or "fleet.zip")
+    _run_in_background(_process_fleet_batch(message, state, bot, file=file, rate_limiter=rate_limiter))
+
+
+@router.callback_query(F.data.in_(["fleet_issue", "fleet_cancel"]), FleetForm.waiting_for_vehicle_documents)
+async def process_fleet_confirmation(
+    callback: CallbackQuery, state: FSMContext, session: Session, rate_limiter: TokenBucketLimiter | None = None
+):
+    """Cancels the fleet, or issues a policy for every vehicle of it in the background."""
+    if callback.data == "fleet_cancel":
+        await callback.message.edit_text("❌ Fleet insurance canceled. To start over, use /fleet.", reply_markup=None)
+        session.clear()
+        await state.set_state(None)
+
+    elif session.fleet_vehicles:
+        await callback.message.edit_reply_markup(reply_markup=None)
+        _run_in_background(_issue_fleet_policies(callback.message, state, callback.from_user.id, rate_limiter))
+
+    await callback.answer()
+
+
+async def _issue_fleet_policies(
+    message: Message, state: FSMContext, user_id: int, rate_limiter: TokenBucketLimiter | None = None
+):
+    """
+    Private helper that issues the fleet's policies in one pass and sends them as one HTML file.
+    Each policy generated with OpenAI is charged to the "llm" budget separately, so issuing can take longer than
+    an update may hold the chat lock; it holds the lock itself and keeps renewing it.
+    Vehicles whose policy could not be generated or was throttled stay in the fleet, so the user can try again.
+    """
+    async with events_isolation.hold(state.key):
+        if await state.get_state() != FleetForm.waiting_for_vehicle_documents.state:
+            return  # The user has moved on in the meantime
+        session = await Session.load(state)
+        vehicles = session.fleet_vehicles
+        if not vehicles:
+            return
+
+        progress_msg = await message.answer(f"⏳ Issuing {len(vehicles)} policies...")
+        progress = ProgressMessage(progress_msg, "Issuing policies", len(vehicles))
+        document, failed = await issue_policies(session.passport_data, vehicles, progress, user_id, rate_limiter)
+
+        if len(failed) < len(vehicles):
+            await message.answer_document(
+                BufferedInputFile(document, filename="fleet_policies.html"),
+                caption=f"📄 {len(vehicles) - len(failed)} policies issued.",
+            )
+        if failed:
+            session.fleet_vehicles = failed
+            await session.save(state)
+            await progress_msg.edit_text(
+                f"🛑 {len(failed)} policies could not be issued:\n" + get_fleet_text(session.passport_data, failed, []),
+                parse_mode="HTML",
+                reply_markup=kb.fleet_confirm_kb,
+            )
+        else:
+            session.clear()
+            await session.save(state)
+            await state.set_state(None)
+            await progress_msg.edit_text("Thank you for using our service! 🎉")
+
+
 # --- CATCH-ALL HANDLER FOR UNHANDLED TEXT MESSAGES ---
 @router.message(F.text)
-async def handle_unhandled_text(message: Message):
+async def handle_unhandled_text(message: Message, rate_limiter: TokenBucketLimiter | None = None):
     """
     Handles any text messages from the user that are not part of the main FSM flow.
-    Uses OpenAI to generate a smart, conversational reply.
+    Answers common questions locally and uses OpenAI (with a reply cache) for the rest;
+    only a call to OpenAI takes from the "llm" rate limit.
     """
     if message.text.startswith("/"):
         await message.answer("🚫 Sorry, I don't understand this command. Please use /start to begin.")
         return
 
-    reply_text = await openai_service.generate_conversational_reply(message.text)
+    reply_text = await get_conversational_reply(message.text, rate_limiter, message.from_user.id)
     await message.answer(reply_text)
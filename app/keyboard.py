@@ -1,5 +1,9 @@
+from datetime import date
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
+from app.services.policy_store import StoredPolicy
+
 # --- Inline keyboard markup for various confirmation prompts ---
 confirm_kb = InlineKeyboardMarkup(
     inline_keyboard=[
@@ -33,3 +37,27 @@ change_photo_kb = InlineKeyboardMarkup(
 cancel_only_kb = InlineKeyboardMarkup(
     inline_keyboard=[[InlineKeyboardButton(text="⬅ Cancel changing", callback_data="cancel_changing")]]
 )
+
+
+# --- Inline keyboard markup for the fleet confirmation table ---
+fleet_confirm_kb = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="✅ Issue policies", callback_data="fleet_issue")],
+        [InlineKeyboardButton(text="❌ Cancel", callback_data="fleet_cancel")],
+    ]
+)
+
+
+# --- Inline keyboard markup with the stored policies of a user (/mypolicies) ---
+def my_policies_kb(policies: list[StoredPolicy]) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text=f"📄 {date.fromtimestamp(policy.created_at):%d.%m.%Y} · {policy.vehicle_model} · {policy.vin}",
+                    callback_data=f"policy:{policy.id}",
+                )
+            ]
+            for policy in policies
+        ]
+    )
@@ -2,11 +2,27 @@ import asyncio
 import logging
 
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.redis import Redis, RedisStorage
 from aiogram.types import BotCommand
+from aiohttp import web
 
 from app.config import s
-from app.handlers import router
+from app.handlers import drain_background_tasks, router
+from app.middlewares import (
+    DeduplicationMiddleware,
+    HandlerMetricsMiddleware,
+    RateLimit,
+    SessionMiddleware,
+    ThrottlingMiddleware,
+    TokenBucketLimiter,
+)
+from app.services.local_ocr import local_reader
+from app.services.mindee import mindee_registry
+from app.services.ocr_executor import ocr_executor
+from app.services.policy_store import policy_repository
+from app.services.preprocessing import image_preprocessor
+from app.services.session_sweeper import session_sweeper
+from app.storage import events_isolation, redis, storage
+from app.webhook import create_monitoring_app, create_webhook_app
 
 
 # --- Set up logging ---
@@ -15,32 +31,110 @@ async def set_commands(bot):
         BotCommand(command="start", description="Start the bot"),
         BotCommand(command="help", description="Get help"),
         BotCommand(command="info", description="Get information about the bot"),
+        BotCommand(command="fleet", description="Insure several vehicles of one owner"),
+        BotCommand(command="mypolicies", description="Get your policies again"),
         BotCommand(command="cancel", description="Cancel current operation"),
     ]
     await bot.set_my_commands(commands)
 
 
-# --- Initialize Redis storage ---
-redis = Redis.from_url(s.redis_url)
-storage = RedisStorage(redis=redis)
-
-
 # --- Initialize bot and dispatcher ---
 bot = Bot(token=s.telegram_bot_token)
-dp = Dispatcher(storage=storage)
+dp = Dispatcher(storage=storage, events_isolation=events_isolation)
+dp.update.outer_middleware(DeduplicationMiddleware(redis, ttl=s.update_dedup_ttl))
+dp.include_router(router)
+
+# --- Time every handler, registered before other router middlewares so they are included ---
+router.message.middleware(HandlerMetricsMiddleware())
+router.callback_query.middleware(HandlerMetricsMiddleware())
+
+# --- Limit OCR and LLM calls per user and globally ---
+throttling = ThrottlingMiddleware(
+    TokenBucketLimiter(
+        redis,
+        limits={
+            "ocr": (
+                RateLimit(s.ocr_user_burst, s.ocr_user_per_minute),
+                RateLimit(s.ocr_global_burst, s.ocr_global_per_minute),
+            ),
+            "llm": (
+                RateLimit(s.llm_user_burst, s.llm_user_per_minute),
+                RateLimit(s.llm_global_burst, s.llm_global_per_minute),
+            ),
+            "fleet": (
+                RateLimit(s.fleet_user_burst, s.fleet_user_per_minute),
+                RateLimit(s.fleet_global_burst, s.fleet_global_per_minute),
+            ),
+        },
+    )
+)
+router.message.middleware(throttling)
+router.callback_query.middleware(throttling)
+
+# --- Load the FSM data once per update and write back what the handler changed ---
+router.message.middleware(SessionMiddleware())
+router.callback_query.middleware(SessionMiddleware())
+
+
+# --- Startup and shutdown hooks, shared by polling and webhook mode ---
+@dp.startup()
+async def on_startup(bot: Bot):
+    mindee_registry.warm_up(
+        [
+            (s.mindee_passport_api_key, s.model_passport_id),
+            (s.mindee_vehicle_document_api_key, s.model_vehicle_document_id),
+        ]
+    )
+    await set_commands(bot)
+    session_sweeper.start()
+    if s.bot_mode == "webhook":
+        await bot.set_webhook(
+            f"{s.webhook_base_url.rstrip('/')}{s.webhook_path}",
+            secret_token=s.webhook_secret or None,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+
+
+@dp.shutdown()
+async def on_shutdown():
+    await drain_background_tasks()  # Before the pools they use are shut down
+    await session_sweeper.stop()
+    ocr_executor.shutdown()
+    image_preprocessor.shutdown()
+    local_reader.shutdown()
+    logging.info("Mindee client stats: %s", mindee_registry.stats())
+    mindee_registry.close()
+    await policy_repository.close()
 
 
 # --- Main function to start the bot ---
 async def main():
-    dp.include_router(router)
-    await set_commands(bot)
-    # Register handlers
-    await dp.start_polling(bot)
+    # Serve /health and /metrics next to long polling if a port is configured
+    runner = None
+    if s.monitoring_port:
+        runner = web.AppRunner(create_monitoring_app())
+        await runner.setup()
+        await web.TCPSite(runner, s.web_server_host, s.monitoring_port).start()
+    try:
+        await bot.delete_webhook()
+        await dp.start_polling(bot)
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+
+
+def run_webhook():
+    """Serve updates over HTTP, so several replicas can run behind a load balancer."""
+    app = create_webhook_app(dp, bot)
+    web.run_app(app, host=s.web_server_host, port=s.web_server_port)
 
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
-    try:
-        asyncio.run(main())
-    except KeyboardInterrupt:
-        print("Bot stopped")
+    if s.bot_mode == "webhook":
+        run_webhook()
+    else:
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            print("Bot stopped")
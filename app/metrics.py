@@ -0,0 +1,108 @@
+import time
+from contextlib import contextmanager
+from typing import AsyncIterable, Awaitable, Callable, TypeVar
+
+from aiohttp import web
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+T = TypeVar("T")
+
+# --- Handler metrics, labelled by handler function and FSM state ---
+HANDLER_LATENCY = Histogram(
+    "bot_handler_duration_seconds",
+    "Time spent in a Telegram update handler",
+    ["handler", "state"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Handlers that raised an exception", ["handler", "state"])
+
+# --- External calls: Telegram file download, Mindee inference, OpenAI completions ---
+EXTERNAL_CALL_LATENCY = Histogram(
+    "bot_external_call_duration_seconds",
+    "Latency of calls to external services",
+    ["service", "operation"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60),
+)
+EXTERNAL_CALL_ERRORS = Counter(
+    "bot_external_call_errors_total", "Failed calls to external services", ["service", "operation"]
+)
+OPENAI_TOKENS = Counter("bot_openai_tokens_total", "OpenAI tokens used", ["operation", "kind"])
+UPSTREAM_RETRIES = Counter("bot_upstream_retries_total", "Calls to external services that were retried", ["service"])
+CIRCUIT_BREAKER_STATE = Gauge(
+    "bot_circuit_breaker_state", "Circuit breaker of an external service: 0 closed, 1 half-open, 2 open", ["service"]
+)
+
+# --- OCR job queue ---
+OCR_JOB_WAIT = Histogram(
+    "bot_ocr_job_wait_seconds",
+    "Time an OCR job spent in the queue before a worker took it",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60, 300),
+)
+OCR_JOBS = Counter("bot_ocr_jobs_total", "OCR jobs finished by workers", ["doc_type", "outcome"])
+
+# --- Photo preprocessing before OCR ---
+PHOTO_BYTES = Counter("bot_photo_bytes_total", "Size of user photos before and after preprocessing", ["stage"])
+PHOTO_REJECTIONS = Counter("bot_photo_rejections_total", "Photos rejected locally before OCR", ["reason"])
+LOCAL_OCR = Counter(
+    "bot_local_ocr_total",
+    "Photos read with local OCR: hit skips Mindee, miss and error fall back",
+    ["doc_type", "outcome"],
+)
+
+# --- FSM sessions in Redis, reported by the session sweeper ---
+FSM_KEYS = Gauge("bot_fsm_keys", "FSM keys in Redis", ["kind"])
+FSM_MEMORY = Gauge("bot_fsm_memory_bytes", "Memory used by FSM keys in Redis")
+FSM_KEYS_WITHOUT_TTL = Counter("bot_fsm_keys_without_ttl_total", "FSM keys found without a TTL and given one")
+
+
+@contextmanager
+def track_call(service: str, operation: str):
+    """Time the wrapped call to an external service and count it as failed if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        EXTERNAL_CALL_ERRORS.labels(service, operation).inc()
+        raise
+    finally:
+        EXTERNAL_CALL_LATENCY.labels(service, operation).observe(time.perf_counter() - started)
+
+
+def record_openai_usage(operation: str, usage):
+    """Count the prompt and completion tokens reported by an OpenAI response."""
+    if usage is None:
+        return
+    OPENAI_TOKENS.labels(operation, "prompt").inc(usage.prompt_tokens)
+    OPENAI_TOKENS.labels(operation, "completion").inc(usage.completion_tokens)
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    """Prometheus scrape endpoint."""
+    return web.Response(body=generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
+async def track_stream(service: str, operation: str, open_stream: Callable[[], Awaitable[AsyncIterable[T]]]):
+    """
+    Yield the chunks of the stream returned by `await open_stream()`, like track_call for a streamed response.
+    Only the waits for the service are timed, not what the consumer does between chunks.
+    """
+    waited = 0.0
+    started = time.perf_counter()
+    try:
+        stream = await open_stream()
+        waited += time.perf_counter() - started
+        chunks = aiter(stream)
+        while True:
+            started = time.perf_counter()
+            try:
+                chunk = await anext(chunks)
+            except StopAsyncIteration:
+                break
+            finally:
+                waited += time.perf_counter() - started
+            yield chunk
+    except Exception:
+        EXTERNAL_CALL_ERRORS.labels(service, operation).inc()
+        raise
+    finally:
+        EXTERNAL_CALL_LATENCY.labels(service, operation).observe(waited)
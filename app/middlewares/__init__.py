@@ -0,0 +1,14 @@
+from app.middlewares.deduplication import DeduplicationMiddleware
+from app.middlewares.metrics import HandlerMetricsMiddleware
+from app.middlewares.session import SessionMiddleware
+from app.middlewares.throttling import THROTTLED_TEXTS, RateLimit, ThrottlingMiddleware, TokenBucketLimiter
+
+__all__ = [
+    "THROTTLED_TEXTS",
+    "DeduplicationMiddleware",
+    "HandlerMetricsMiddleware",
+    "RateLimit",
+    "SessionMiddleware",
+    "ThrottlingMiddleware",
+    "TokenBucketLimiter",
+]
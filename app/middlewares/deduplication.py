@@ -0,0 +1,28 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from redis.asyncio import Redis
+
+
+class DeduplicationMiddleware(BaseMiddleware):
+    """
+    Outer update middleware that drops updates already taken by this or another worker.
+    Telegram redelivers webhook updates after slow responses, and replicas may receive the same update.
+    """
+
+    def __init__(self, redis: Redis, ttl: int):
+        self.redis = redis
+        self.ttl = ttl
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        key = f"update:{data['bot'].id}:{event.update_id}"
+        first_seen = await self.redis.set(key, 1, nx=True, ex=self.ttl)
+        if not first_seen:
+            return None
+        return await handler(event, data)
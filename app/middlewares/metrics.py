@@ -0,0 +1,31 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.metrics import HANDLER_ERRORS, HANDLER_LATENCY
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Inner middleware timing every handler, labelled by handler name and the FSM state it ran in.
+    Registered first, so the time spent in other middlewares (e.g. throttling) is included.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_name = data["handler"].callback.__name__
+        state = data.get("raw_state") or "none"
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.labels(handler_name, state).inc()
+            raise
+        finally:
+            HANDLER_LATENCY.labels(handler_name, state).observe(time.perf_counter() - started)
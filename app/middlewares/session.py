@@ -0,0 +1,32 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.session import Session
+
+
+class SessionMiddleware(BaseMiddleware):
+    """
+    Inner middleware passing the chat's FSM data to handlers as a typed `session`.
+    The data is read once before the handler and the fields it changed are written in one call after it.
+    If the handler raises, none of its changes are saved, so the chat is not left half-updated.
+    Handlers without a `session` argument don't touch the data at all.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        state = data.get("state")
+        if state is None or "session" not in data["handler"].params:
+            return await handler(event, data)
+
+        session = await Session.load(state)
+        data["session"] = session
+        result = await handler(event, data)
+        # Still inside the chat's event lock, so nothing else has written the data in the meantime
+        await session.save(state)
+        return result
@@ -0,0 +1,111 @@
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, TelegramObject
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+# Takes one token from every bucket in KEYS, or from none of them if any bucket is empty.
+# ARGV holds (burst, tokens per second) for each key. Returns the 1-based index of the
+# first empty bucket, or 0 if the tokens were taken. Uses Redis time, so all workers share one clock.
+TOKEN_BUCKET_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local burst = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(bucket[1]) or burst
+    local updated_at = tonumber(bucket[2]) or now
+    available = math.min(burst, available + math.max(0, now - updated_at) * rate)
+    if available < 1 then
+        return i
+    end
+    tokens[i] = available
+end
+for i, key in ipairs(KEYS) do
+    local burst = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    redis.call('HSET', key, 'tokens', tokens[i] - 1, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(burst / rate) + 1)
+end
+return 0
+"""
+
+USER_THROTTLED_TEXT = "⏳ You're sending requests too fast. Please wait a moment and try again."
+GLOBAL_THROTTLED_TEXT = "⏳ The service is very busy right now. Please try again in a minute."
+THROTTLED_TEXTS = {"user": USER_THROTTLED_TEXT, "global": GLOBAL_THROTTLED_TEXT}
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Token bucket: up to `burst` calls at once, refilled at `per_minute` calls per minute."""
+
+    burst: int
+    per_minute: float
+
+
+class TokenBucketLimiter:
+    """
+    Per-user and global token buckets stored in Redis, so the limits hold across all workers.
+    Each budget (e.g. "ocr", "llm") has its own pair of buckets.
+    """
+
+    def __init__(self, redis: Redis, limits: dict[str, tuple[RateLimit, RateLimit]]):
+        self.redis = redis
+        self.limits = limits
+        self._script = redis.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def acquire(self, budget: str, user_id: int) -> str | None:
+        """
+        Take one call from the user's and the global bucket of `budget`.
+        :return: None if the call is allowed, otherwise the exhausted bucket ("user" or "global").
+        """
+        user_limit, global_limit = self.limits[budget]
+        keys = [f"throttle:{budget}:user:{user_id}", f"throttle:{budget}:global"]
+        args = [user_limit.burst, user_limit.per_minute / 60, global_limit.burst, global_limit.per_minute / 60]
+        try:
+            exhausted = await self._script(keys=keys, args=args)
+        except Exception as e:
+            logger.warning("Rate limiter is unavailable, letting the call through: %s", e)
+            return None
+        return {0: None, 1: "user", 2: "global"}[int(exhausted)]
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Inner middleware limiting handlers flagged with `rate_limit`, e.g. `flags={"rate_limit": "ocr"}`.
+    Throttled users get a polite reply instead of an OCR or LLM call.
+    Handlers that only sometimes make an expensive call get the limiter as `rate_limiter` and take tokens themselves.
+    """
+
+    def __init__(self, limiter: TokenBucketLimiter):
+        self.limiter = limiter
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        data["rate_limiter"] = self.limiter
+        budget = get_flag(data, "rate_limit")
+        user = data.get("event_from_user")
+        if budget is None or user is None:
+            return await handler(event, data)
+
+        exhausted = await self.limiter.acquire(budget, user.id)
+        if exhausted is None:
+            return await handler(event, data)
+
+        text = THROTTLED_TEXTS[exhausted]
+        if isinstance(event, CallbackQuery):
+            await event.answer(text, show_alert=True)
+        else:
+            await event.answer(text)
+        return None
@@ -17,8 +17,11 @@ class PassportData(BaseModel):
     passport_number: Optional[str] = Field(default="N/A", description="Passport series and number")
     date_of_issue: Optional[str] = Field(default="N/A", description="Date of issue of the passport")
     date_of_expiry: Optional[str] = Field(default="N/A", description="Date of expiry of the passport")
+    warnings: list[str] = Field(default_factory=list, description="What to double-check, set by validation")
 
-    @field_validator("*", mode="before")
+    @field_validator(
+        "given_names", "surnames", "date_of_birth", "passport_number", "date_of_issue", "date_of_expiry", mode="before"
+    )
     @classmethod
     def convert_to_string(cls, v: Any) -> str:
         """
@@ -46,8 +49,9 @@ class VehicleDocumentData(BaseModel):
     doc_number: Optional[str] = Field(
         alias="document_series_and_number", default="N/A", description="Document series and number"
     )
+    warnings: list[str] = Field(default_factory=list, description="What to double-check, set by validation")
 
-    @field_validator("*", mode="before")
+    @field_validator("vin", "model", "reg_number", "doc_number", mode="before")
     @classmethod
     def convert_to_string(cls, v: Any) -> str:
         """
@@ -1,15 +1,60 @@
+import asyncio
+import logging
+
 from aiogram import Bot
-from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
 
 from app.config import s
-from app.services.mindee import MindeeService
+from app.services.cache import ocr_cache
+from app.services.classifier import DocumentTypeMismatch, classify_document
+from app.services.local_ocr import local_reader
+from app.services.mindee import mindee_registry
+from app.services.ocr_executor import OCRTimeoutError
+from app.services.preprocessing import PhotoQualityError, image_preprocessor
+from app.services.resilience import CircuitOpenError
+from app.services.validation import InvalidDocument, validate_document
+from app.session import Session
 from app.utils.file_utils import (
     download_user_photo,
+    get_content_hash,
     get_passport_extracted_text,
+    get_summary_text,
     get_vehicle_extracted_text,
 )
 
+logger = logging.getLogger(__name__)
+
+WRONG_DOCUMENT_TEXTS = {
+    "vehicle": "🛑 This looks like a passport. Please send a photo of your vehicle document now.",
+}
+INVALID_DOCUMENT_TEXTS = {
+    "passport": "🛑 Passport photo is not valid. Please send a clear photo of your passport.",
+    "vehicle": "🛑 Vehicle document photo is not valid. Please send a clear photo of your vehicle document.",
+}
+REJECTED_DATA_TEXTS = {
+    "passport": "🛑 {reasons}\nPlease send a clear photo of your passport.",
+    "vehicle": "🛑 {reasons}\nPlease send a clear photo of your vehicle document.",
+}
+OCR_BUSY_TEXT = "⏳ Document recognition is temporarily unavailable. Please try again in a few minutes."
+POOR_QUALITY_TEXTS = {
+    "blurry": "🛑 The photo is too blurry to read. Please hold the camera steady and send a sharper photo.",
+    "dark": "🛑 The photo is too dark to read. Please take it in better light.",
+}
+
+
+def _count_valid(passport_data, vehicle_data) -> int:
+    """How many of the two recognized documents pass validation."""
+    count = 0
+    for doc_type, document in (("passport", passport_data), ("vehicle", vehicle_data)):
+        if document is None:
+            continue
+        try:
+            validate_document(doc_type, document)
+            count += 1
+        except InvalidDocument:
+            pass
+    return count
+
 
 class PhotoProcessor:
     """
@@ -17,50 +62,211 @@ class PhotoProcessor:
     Return (text_for_user, flag_of_success, data_obj)"""
 
     @staticmethod
-    async def process_photo(message: Message, state: FSMContext, bot: Bot, doc_type: str):
-        data = await state.get_data()
-        msg_to_edit_id = data.get("msg_to_edit_id")
-        if msg_to_edit_id:
-            try:
-                await bot.edit_message_reply_markup(
-                    chat_id=message.chat.id, message_id=msg_to_edit_id, reply_markup=None
-                )
-                await state.update_data(msg_to_edit_id=None)
-            except Exception as e:
-                print(f"Error editing message: {e}")
+    async def _recognize(photo, bot: Bot, doc_type: str, file=None, check_type: bool = True):
+        """
+        Return the recognized document for the photo, calling Mindee only when the OCR cache misses.
+        The cache is checked by file_unique_id first, which needs no download, then by content hash.
+        `photo` can be None for a `file` that didn't come from a Telegram photo, e.g. a ZIP entry.
+        A photo downloaded here is closed before returning, a `file` passed in is left to the caller.
+        """
+        file_unique_id = photo.file_unique_id if photo else None
+        cached = await ocr_cache.get(doc_type, file_unique_id=file_unique_id)
+        if cached:
+            return cached
 
-        processing_msg = await message.answer("✨ Photo received, processing...")
-        file = await download_user_photo(message.photo[-1], bot, name=f"{doc_type}.jpg")
-        mindee = None
-        extracted_text = ""
+        downloaded = file is None
+        if downloaded:
+            file = await download_user_photo(photo, bot, name=f"{doc_type}.jpg")
         try:
-            if doc_type == "passport":
-                mindee = MindeeService(api_key=s.mindee_passport_api_key, model_id=s.model_passport_id)
-                mindee_data = await mindee.process_passport_photo(file)
+            content_hash = get_content_hash(file)
+            cached = await ocr_cache.get(doc_type, content_hash=content_hash)
+            if cached:
+                await ocr_cache.set(doc_type, cached, file_unique_id=file_unique_id)
+                return cached
 
-                if not mindee_data:
-                    await processing_msg.edit_text(
-                        "🛑 Passport photo is not valid. Please send a clear photo of your passport."
-                    )
-                    return None, False, None
+            mindee_data = await PhotoProcessor.recognize_file(file, doc_type, check_type=check_type)
+        finally:
+            if downloaded:
+                file.close()  # Releases the temporary file of a download above `s.download_spool_size`
+        if mindee_data:
+            await ocr_cache.set(doc_type, mindee_data, file_unique_id=file_unique_id, content_hash=content_hash)
+        return mindee_data
 
-                extracted_text = await get_passport_extracted_text(mindee_data)
+    @staticmethod
+    async def recognize_file(file, doc_type: str, check_type: bool = True):
+        """
+        Return the document recognized in an image file, without the OCR cache, or None if Mindee can't read it.
+        The photo is downscaled before upload; blurry or dark photos raise PhotoQualityError.
+        With `check_type` and `s.document_classifier`, raise DocumentTypeMismatch instead of sending a photo
+        detected as the other document to Mindee; photos the classifier is not sure about are sent as they are.
+        With `s.local_ocr`, passports whose MRZ can be read locally with valid check digits skip Mindee.
+        """
+        file = await image_preprocessor.run(file)
+        if check_type and s.document_classifier:
+            detected = await classify_document(file)
+            if detected not in (doc_type, "unknown"):
+                raise DocumentTypeMismatch(doc_type, detected)
 
-            elif doc_type == "vehicle":
-                mindee = MindeeService(api_key=s.mindee_vehicle_document_api_key, model_id=s.model_vehicle_document_id)
-                mindee_data = await mindee.process_vehicle_document_photo(file)
+        mindee_data = await local_reader.read(file, doc_type) if s.local_ocr else None
+        if mindee_data is None and doc_type == "passport":
+            mindee = mindee_registry.get(s.mindee_passport_api_key, s.model_passport_id)
+            mindee_data = await mindee.process_passport_photo(file)
+        elif mindee_data is None:
+            mindee = mindee_registry.get(s.mindee_vehicle_document_api_key, s.model_vehicle_document_id)
+            mindee_data = await mindee.process_vehicle_document_photo(file)
+        return mindee_data
 
-                if not mindee_data:
-                    await processing_msg.edit_text(
-                        "🛑 Vehicle document photo is not valid. Please send a clear photo of your vehicle document."
-                    )
-                    return None, False, None
-                extracted_text = await get_vehicle_extracted_text(mindee_data)
+    @staticmethod
+    async def _recognize_pair(first_photo, second_photo, bot: Bot):
+        """
+        Recognize a passport and a vehicle document sent in any order, running Mindee calls concurrently.
+        The local classifier puts the photos in order before Mindee is called; if it can't tell them apart,
+        the other order is also tried when either document is not recognized or not valid,
+        and kept if it gives more valid documents.
+        Return (passport_data, vehicle_data), either of them None if it could not be recognized.
+        """
+        first_file, second_file = await asyncio.gather(
+            download_user_photo(first_photo, bot, name="document_1.jpg"),
+            download_user_photo(second_photo, bot, name="document_2.jpg"),
+        )
+        try:
+            ordered = False
+            if s.document_classifier:
+                detected = await asyncio.gather(classify_document(first_file), classify_document(second_file))
+                # Only a passport is detected with confidence, so exactly one of them must be one
+                if detected == ["unknown", "passport"]:
+                    first_photo, second_photo = second_photo, first_photo
+                    first_file, second_file = second_file, first_file
+                ordered = sorted(detected) == ["passport", "unknown"]
+
+            documents = await asyncio.gather(
+                PhotoProcessor._recognize(first_photo, bot, "passport", file=first_file, check_type=False),
+                PhotoProcessor._recognize(second_photo, bot, "vehicle", file=second_file, check_type=False),
+            )
+            if not ordered and _count_valid(*documents) < 2:
+                # The photos were probably sent in the other order
+                swapped = await asyncio.gather(
+                    PhotoProcessor._recognize(second_photo, bot, "passport", file=second_file, check_type=False),
+                    PhotoProcessor._recognize(first_photo, bot, "vehicle", file=first_file, check_type=False),
+                )
+                if _count_valid(*swapped) > _count_valid(*documents):
+                    documents = swapped
+            return tuple(documents)
+        finally:
+            first_file.close()
+            second_file.close()
 
+    @staticmethod
+    async def process_document_pair(message: Message, bot: Bot, photos: list):
+        """
+        Processing both documents sent at once (an album of two photos)
+        Return (text_for_user, flag_of_success, (passport_data, vehicle_data))"""
+        if len(photos) != 2:
+            return (
+                "🛑 Please send exactly two photos at once: your passport and your vehicle document.",
+                False,
+                None,
+            )
+
+        processing_msg = await message.answer("✨ Photos received, processing both documents...")
+        try:
+            passport_data, vehicle_data = await PhotoProcessor._recognize_pair(photos[0], photos[1], bot)
+            if not passport_data or not vehicle_data:
+                await processing_msg.edit_text(
+                    "🛑 Couldn't recognize both documents. "
+                    "Please send a clear photo of your passport first, then of your vehicle document."
+                )
+                return None, False, None
+
+            passport_data = validate_document("passport", passport_data)
+            vehicle_data = validate_document("vehicle", vehicle_data)
             await processing_msg.delete()
-            return extracted_text, True, mindee_data
+            return await get_summary_text(passport_data, vehicle_data), True, (passport_data, vehicle_data)
+
+        except InvalidDocument as e:
+            logger.info("Rejected recognized data: %s", e)
+            await processing_msg.edit_text(REJECTED_DATA_TEXTS[e.doc_type].format(reasons="\n".join(e.reasons)))
+            return None, False, None
+
+        except PhotoQualityError as e:
+            logger.info("Rejected photo: %s", e)
+            await processing_msg.edit_text(POOR_QUALITY_TEXTS[e.reason])
+            return None, False, None
+
+        except CircuitOpenError:
+            await processing_msg.edit_text(OCR_BUSY_TEXT)
+            return None, False, None
+
+        except OCRTimeoutError as e:
+            logger.warning("Timeout processing photos: %s", e)
+            await processing_msg.edit_text("⏳ Document recognition is taking too long. Please try again later.")
+            return None, False, None
 
         except Exception as e:
-            print(f"🛑 Error processing photo: {e}")
+            logger.exception("Error processing photos: %s", e)
             await processing_msg.edit_text("🛑 An unexpected error occurred. Please try again.")
             return None, False, None
+
+    @staticmethod
+    async def recognize_photo(photo, bot: Bot, doc_type: str, file=None):
+        """
+        Recognize one document photo without touching the chat, so it can also run in an OCR worker.
+        Pass `file` if the photo is already downloaded or doesn't come from Telegram (`photo` None).
+        Return (text_for_user, flag_of_success, data_obj); on failure the text explains what went wrong.
+        """
+        try:
+            mindee_data = await PhotoProcessor._recognize(photo, bot, doc_type, file=file)
+            if not mindee_data:
+                return INVALID_DOCUMENT_TEXTS[doc_type], False, None
+            mindee_data = validate_document(doc_type, mindee_data)
+            if doc_type == "passport":
+                return await get_passport_extracted_text(mindee_data), True, mindee_data
+            return await get_vehicle_extracted_text(mindee_data), True, mindee_data
+
+        except DocumentTypeMismatch as e:
+            logger.info("Wrong document type: %s", e)
+            return WRONG_DOCUMENT_TEXTS[doc_type], False, None
+
+        except InvalidDocument as e:
+            logger.info("Rejected recognized data: %s", e)
+            return REJECTED_DATA_TEXTS[doc_type].format(reasons="\n".join(e.reasons)), False, None
+
+        except PhotoQualityError as e:
+            logger.info("Rejected photo: %s", e)
+            return POOR_QUALITY_TEXTS[e.reason], False, None
+
+        except CircuitOpenError:
+            return OCR_BUSY_TEXT, False, None
+
+        except OCRTimeoutError as e:
+            logger.warning("Timeout processing photo: %s", e)
+            return "⏳ Document recognition is taking too long. Please try again later.", False, None
+
+        except Exception as e:
+            logger.exception("Error processing photo: %s", e)
+            return "🛑 An unexpected error occurred. Please try again.", False, None
+
+    @staticmethod
+    async def remove_previous_keyboard(message: Message, session: Session, bot: Bot):
+        """Remove the "Cancel" button from the message that asked for a new photo."""
+        if session.msg_to_edit_id:
+            try:
+                await bot.edit_message_reply_markup(
+                    chat_id=message.chat.id, message_id=session.msg_to_edit_id, reply_markup=None
+                )
+                session.msg_to_edit_id = None
+            except Exception as e:
+                logger.warning("Error editing message: %s", e)
+
+    @staticmethod
+    async def process_photo(message: Message, session: Session, bot: Bot, doc_type: str):
+        await PhotoProcessor.remove_previous_keyboard(message, session, bot)
+
+        processing_msg = await message.answer("✨ Photo received, processing...")
+        text, success, mindee_data = await PhotoProcessor.recognize_photo(message.photo[-1], bot, doc_type)
+        if not success:
+            await processing_msg.edit_text(text)
+            return None, False, None
+
+        await processing_msg.delete()
+        return text, True, mindee_data
@@ -0,0 +1,135 @@
+import hashlib
+import logging
+import time
+
+from redis.asyncio import Redis
+
+from app.config import s
+from app.models import PassportData, VehicleDocumentData
+from app.storage import redis
+
+logger = logging.getLogger(__name__)
+
+
+# --- RedisLRUCache Class ---
+class RedisLRUCache:
+    """
+    Size-bounded key/value cache stored in Redis.
+    Entries expire after `ttl` seconds, and once there are more than `max_entries`
+    the least recently used ones are evicted. Recency is tracked in a sorted set.
+    """
+
+    def __init__(self, redis: Redis, namespace: str, ttl: int, max_entries: int):
+        self.redis = redis
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.index_key = f"{namespace}:lru"
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> bytes | None:
+        value = await self.redis.get(self._key(key))
+        if value is None:
+            await self.redis.zrem(self.index_key, key)
+            return None
+        await self.redis.zadd(self.index_key, {key: time.time()})
+        return value
+
+    async def set(self, key: str, value: bytes | str):
+        now = time.time()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self._key(key), value, ex=self.ttl)
+            pipe.zadd(self.index_key, {key: now})
+            pipe.zremrangebyscore(self.index_key, 0, now - self.ttl)
+            pipe.zcard(self.index_key)
+            *_, size = await pipe.execute()
+
+        if size > self.max_entries:
+            evicted = await self.redis.zpopmin(self.index_key, size - self.max_entries)
+            await self.redis.delete(*(self._key(member.decode()) for member, _ in evicted))
+
+    async def size(self) -> int:
+        return await self.redis.zcard(self.index_key)
+
+
+# --- OCRResultCache Class ---
+class OCRResultCache:
+    """
+    Caches recognized documents so a resent photo doesn't go through Mindee again.
+    Results are stored under the Telegram file_unique_id and under the sha256 of the photo bytes,
+    so both a resent photo and a forwarded copy of the same image are found.
+    """
+
+    MODELS = {"passport": PassportData, "vehicle": VehicleDocumentData}
+
+    def __init__(self, cache: RedisLRUCache):
+        self.cache = cache
+
+    async def get(self, doc_type: str, file_unique_id: str | None = None, content_hash: str | None = None):
+        """Return the cached PassportData / VehicleDocumentData, or None on a miss."""
+        for key in self._keys(doc_type, file_unique_id, content_hash):
+            try:
+                value = await self.cache.get(key)
+            except Exception as e:
+                logger.warning("OCR cache is unavailable: %s", e)
+                return None
+            if value is not None:
+                return self.MODELS[doc_type].model_validate_json(value)
+        return None
+
+    async def set(self, doc_type: str, data_obj, file_unique_id: str | None = None, content_hash: str | None = None):
+        value = data_obj.model_dump_json(by_alias=True)
+        for key in self._keys(doc_type, file_unique_id, content_hash):
+            try:
+                await self.cache.set(key, value)
+            except Exception as e:
+                logger.warning("OCR cache is unavailable: %s", e)
+                return
+
+    @staticmethod
+    def _keys(doc_type: str, file_unique_id: str | None, content_hash: str | None) -> list[str]:
+        keys = []
+        if file_unique_id:
+            keys.append(f"{doc_type}:file:{file_unique_id}")
+        if content_hash:
+            keys.append(f"{doc_type}:sha256:{content_hash}")
+        return keys
+
+
+# --- ReplyCache Class ---
+class ReplyCache:
+    """
+    Caches conversational replies by normalized message text,
+    so "Hi!", "hi" and "  HI " are answered by the LLM only once.
+    """
+
+    def __init__(self, cache: RedisLRUCache):
+        self.cache = cache
+
+    async def get(self, normalized_text: str) -> str | None:
+        try:
+            value = await self.cache.get(self._key(normalized_text))
+        except Exception as e:
+            logger.warning("Reply cache is unavailable: %s", e)
+            return None
+        return value.decode() if value is not None else None
+
+    async def set(self, normalized_text: str, reply_text: str):
+        try:
+            await self.cache.set(self._key(normalized_text), reply_text)
+        except Exception as e:
+            logger.warning("Reply cache is unavailable: %s", e)
+
+    @staticmethod
+    def _key(normalized_text: str) -> str:
+        return hashlib.sha256(normalized_text.encode()).hexdigest()
+
+
+ocr_cache = OCRResultCache(
+    RedisLRUCache(redis, namespace="ocr", ttl=s.ocr_cache_ttl, max_entries=s.ocr_cache_max_entries)
+)
+reply_cache = ReplyCache(
+    RedisLRUCache(redis, namespace="reply", ttl=s.reply_cache_ttl, max_entries=s.reply_cache_max_entries)
+)
@@ -0,0 +1,127 @@
+import asyncio
+from io import BytesIO
+from typing import BinaryIO, Literal
+
+from PIL import Image, ImageChops, ImageFilter
+
+DocumentType = Literal["passport", "vehicle"]
+Detection = Literal["passport", "unknown"]
+
+# Tuned on benchmarks/document_fixtures.py, check `make bench-classifier` after changing any of these
+WORK_SIZE = 600  # Longest side of the image the classifier looks at, in pixels
+INK_CONTRAST = 35  # How much darker than its surroundings a pixel must be to count as print
+SKEW_ANGLES = [a / 2 for a in range(-8, 9)]  # Photos are rarely rotated more than 4 degrees
+MIN_LINE_TRANSITIONS = 6  # Pixel rows crossing fewer glyphs than this are not text
+MRZ_MIN_GLYPHS = 30  # An MRZ line has 44 (passport) or 36 characters with no spaces
+MRZ_MIN_ASPECT = 25  # ...and is much wider than tall: width / height of the line
+
+
+class DocumentTypeMismatch(Exception):
+    """The photo is a different document than the one the user was asked for."""
+
+    def __init__(self, expected: DocumentType, detected: Detection):
+        super().__init__(f"Expected {expected}, got {detected}")
+        self.expected = expected
+        self.detected = detected
+
+
+def _ink_mask(image: Image.Image) -> Image.Image:
+    """Grayscale thumbnail where print is 255 and everything else 0, independent of lighting and background."""
+    image.draft("L", (WORK_SIZE, WORK_SIZE))  # JPEG decoder downscales for free
+    gray = image.convert("L")
+    gray.thumbnail((WORK_SIZE, WORK_SIZE))
+    surroundings = gray.filter(ImageFilter.BoxBlur(10))
+    return ImageChops.subtract(surroundings, gray).point(lambda p: 255 if p > INK_CONTRAST else 0)
+
+
+def _deskew(mask: Image.Image) -> Image.Image:
+    """Rotate so that text lines are horizontal: the angle where the row profile is the most contrasted."""
+
+    def row_profile_variance(rotated: Image.Image) -> float:
+        profile = list(rotated.resize((1, rotated.height), Image.Resampling.BOX).tobytes())
+        mean = sum(profile) / len(profile)
+        return sum((p - mean) ** 2 for p in profile)
+
+    return max((mask.rotate(angle) for angle in SKEW_ANGLES), key=row_profile_variance)
+
+
+def _text_lines(mask: Image.Image) -> list[tuple[int, int]]:
+    """(top, bottom) rows of every horizontal band of text."""
+    pixels, width = mask.tobytes(), mask.width
+    lines, top, bottom = [], None, 0
+    for y in range(mask.height):
+        transitions = pixels[y * width : (y + 1) * width].count(b"\x00\xff")
+        if transitions >= MIN_LINE_TRANSITIONS:
+            if top is None:
+                top = y
+            bottom = y
+        elif top is not None and y - bottom > 1:
+            lines.append((top, bottom))
+            top = None
+    if top is not None:
+        lines.append((top, bottom))
+    return lines
+
+
+def _longest_word(mask: Image.Image, top: int, bottom: int) -> tuple[int, int]:
+    """
+    Glyph count and width of the longest run of glyphs in a text line without a word gap.
+    Gaps wider than the line height split words, while MRZ lines have no gaps at all.
+    """
+    height = bottom - top + 1
+    line = mask.crop((0, top, mask.width, bottom + 1)).resize((mask.width, 1), Image.Resampling.BOX).tobytes()
+
+    glyphs = []  # (start, end) columns with any ink
+    x = 0
+    while x < len(line):
+        if line[x]:
+            start = x
+            while x < len(line) and line[x]:
+                x += 1
+            glyphs.append((start, x))
+        x += 1
+
+    best_count, best_width, word = 0, 0, []
+    for glyph in glyphs:
+        if word and glyph[0] - word[-1][1] > height:
+            word = []
+        word.append(glyph)
+        if len(word) > best_count:
+            best_count, best_width = len(word), word[-1][1] - word[0][0]
+    return best_count, best_width
+
+
+def has_mrz(image: Image.Image) -> bool:
+    """True if the image has at least two stacked MRZ-like lines: long runs of glyphs without spaces."""
+    mask = _deskew(_ink_mask(image))
+    mrz_lines = []
+    for top, bottom in _text_lines(mask):
+        glyphs, width = _longest_word(mask, top, bottom)
+        if glyphs >= MRZ_MIN_GLYPHS and width >= MRZ_MIN_ASPECT * (bottom - top + 1):
+            mrz_lines.append((top, bottom))
+    return any(
+        next_top - bottom < 4 * (bottom - top + 1)
+        for (top, bottom), (next_top, _) in zip(mrz_lines, mrz_lines[1:], strict=False)
+    )
+
+
+def detect_document_type(data: bytes | BinaryIO) -> Detection:
+    """
+    Recognize a passport by its machine-readable zone (MRZ), locally in tens of milliseconds.
+    A photo without an MRZ is "unknown", not a vehicle document: the MRZ may be cut off, blurred or too small,
+    so only a passport can be detected with confidence and everything else is left to Mindee.
+    :param data: Image bytes or a binary file, which is read from the start and rewound afterwards.
+    """
+    if isinstance(data, bytes):
+        data = BytesIO(data)
+    data.seek(0)
+    try:
+        with Image.open(data) as image:
+            return "passport" if has_mrz(image) else "unknown"
+    finally:
+        data.seek(0)
+
+
+async def classify_document(file: BinaryIO) -> Detection:
+    """`detect_document_type` for a downloaded photo, run in a thread to keep the event loop free."""
+    return await asyncio.to_thread(detect_document_type, file)
@@ -0,0 +1,234 @@
+import asyncio
+import html
+import logging
+import time
+import zipfile
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import PurePosixPath
+from typing import Awaitable, Callable, TypeVar
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message, PhotoSize
+
+from app.config import s
+from app.middlewares import THROTTLED_TEXTS, TokenBucketLimiter
+from app.models import PassportData, VehicleDocumentData
+from app.processors import PhotoProcessor
+from app.services.openai import POLICY_BUSY_TEXT, POLICY_ERROR_TEXT, openai_service
+from app.services.policy_renderer import policy_renderer
+from app.services.policy_store import save_policies
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class FleetUploadError(Exception):
+    """The upload can't be processed at all; the message is shown to the user."""
+
+
+@dataclass
+class FleetItem:
+    """One vehicle document of a fleet upload: an album photo or an image in a ZIP file."""
+
+    label: str  # How the user can find the document: "photo 3" or the file name in the ZIP
+    photo: PhotoSize | None = None
+    archive_name: str | None = None
+    vehicle: VehicleDocumentData | None = None
+    error: str | None = None
+
+
+# --- Progress ---
+class ProgressMessage:
+    """
+    Edits one message with the progress of a batch, at most every `interval` seconds
+    because Telegram limits how often a message can be edited.
+    """
+
+    def __init__(self, message: Message, title: str, total: int, interval: float = s.fleet_progress_interval):
+        self.message = message
+        self.title = title
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self._edited_at = 0.0
+
+    @property
+    def text(self) -> str:
+        failed = f", {self.failed} failed" if self.failed else ""
+        return f"⏳ {self.title}: {self.done}/{self.total} done{failed}."
+
+    async def advance(self, failed: bool = False):
+        self.done += 1
+        self.failed += failed
+        if self.done < self.total and time.monotonic() - self._edited_at < self.interval:
+            return
+        self._edited_at = time.monotonic()
+        try:
+            await self.message.edit_text(self.text)
+        except TelegramBadRequest as e:
+            logger.warning("Error editing progress message: %s", e)
+
+
+async def run_bounded(items: list[T], worker: Callable[[T], Awaitable[R]], concurrency: int) -> list[R]:
+    """Run `worker` on every item, at most `concurrency` at a time, and return the results in order."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(item: T) -> R:
+        async with semaphore:
+            return await worker(item)
+
+    return await asyncio.gather(*(run(item) for item in items))
+
+
+# --- Intake ---
+def list_archive(archive: zipfile.ZipFile, max_items: int) -> list[FleetItem]:
+    """
+    The images in a ZIP file as fleet items, sorted by name.
+    :raises FleetUploadError: If there are no images, too many of them or one is too large.
+    """
+    items = []
+    for info in sorted(archive.infolist(), key=lambda info: info.filename):
+        path = PurePosixPath(info.filename)
+        if info.is_dir() or path.suffix.lower() not in IMAGE_SUFFIXES or path.name.startswith("."):
+            continue
+        if info.file_size > s.fleet_max_photo_size:
+            raise FleetUploadError(f"🛑 {path.name} is larger than {s.fleet_max_photo_size // 2**20} MB.")
+        items.append(FleetItem(label=path.name, archive_name=info.filename))
+    if not items:
+        raise FleetUploadError("🛑 The ZIP file has no photos (JPEG, PNG or WebP).")
+    if len(items) > max_items:
+        raise FleetUploadError(f"🛑 The ZIP file has {len(items)} photos, up to {max_items} more can be added.")
+    return items
+
+
+def open_archive(file) -> zipfile.ZipFile:
+    """:raises FleetUploadError: If the file is not a ZIP file."""
+    try:
+        return zipfile.ZipFile(file)
+    except zipfile.BadZipFile:
+        raise FleetUploadError("🛑 This file is not a valid ZIP archive.") from None
+
+
+async def recognize_vehicles(
+    items: list[FleetItem],
+    bot: Bot,
+    progress: ProgressMessage,
+    archive: zipfile.ZipFile | None = None,
+    rate_limiter: TokenBucketLimiter | None = None,
+    user_id: int | None = None,
+):
+    """
+    Recognize the vehicle documents with PhotoProcessor, `s.fleet_concurrency` at a time,
+    filling `vehicle` or `error` of every item. Images are read from the archive only when their turn comes.
+    Every document takes a "fleet" token of `user_id` from `rate_limiter`; throttled ones are reported as failed.
+    """
+
+    async def recognize(item: FleetItem):
+        if rate_limiter is not None and (exhausted := await rate_limiter.acquire("fleet", user_id)):
+            item.error = THROTTLED_TEXTS[exhausted]
+            await progress.advance(failed=True)
+            return
+        file = None
+        if archive is not None:
+            try:
+                file = BytesIO(archive.read(item.archive_name))
+            except (zipfile.BadZipFile, OSError, EOFError) as e:  # Also raised for bad CRC or a truncated entry
+                logger.info("Unreadable ZIP entry %s: %s", item.archive_name, e)
+                item.error = "🛑 The file can't be extracted from the ZIP archive."
+                await progress.advance(failed=True)
+                return
+            file.name = item.label
+        text, success, vehicle = await PhotoProcessor.recognize_photo(item.photo, bot, "vehicle", file=file)
+        if success and vehicle:
+            item.vehicle = vehicle
+        else:
+            item.error = text
+        await progress.advance(failed=not success)
+
+    await run_bounded(items, recognize, s.fleet_concurrency)
+
+
+def merge_vehicles(known: list[VehicleDocumentData], items: list[FleetItem]) -> list[VehicleDocumentData]:
+    """The fleet with the recognized items added; a VIN that is already in the fleet is reported as an error."""
+    vehicles = list(known)
+    vins = {vehicle.vin for vehicle in vehicles}
+    for item in items:
+        if item.vehicle is None:
+            continue
+        if item.vehicle.vin in vins:
+            item.vehicle, item.error = None, f"VIN {item.vehicle.vin} is already in the fleet."
+            continue
+        vins.add(item.vehicle.vin)
+        vehicles.append(item.vehicle)
+    return vehicles
+
+
+def get_fleet_text(passport: PassportData, vehicles: list[VehicleDocumentData], failed: list[FleetItem]) -> str:
+    """The confirmation table of the fleet (HTML) with the documents of the last upload that failed."""
+    rows = [f"{'#':>2} {'VIN':<17} {'Reg. number':<11} Model"]
+    rows += [
+        f"{i:>2} {vehicle.vin:<17} {vehicle.reg_number:<11} {vehicle.model}" for i, vehicle in enumerate(vehicles, 1)
+    ]
+    text = (
+        f"🚚 Fleet of <b>{html.escape(passport.given_names)} {html.escape(passport.surnames)}</b>, "
+        f"{len(vehicles)} vehicle(s):\n"
+        f"<pre>{html.escape(chr(10).join(rows))}</pre>\n"
+    )
+    if failed:
+        # First line only: the reason, without the request for another photo, keeps the table in one message
+        errors = "".join(
+            f"  - {html.escape(item.label)}: {html.escape(item.error.splitlines()[0])}\n" for item in failed
+        )
+        text += f"\n❌ Not added:\n{errors}"
+    text += (
+        f"\nTotal price: <b>{len(vehicles)} × {s.insurance_price} = {len(vehicles) * s.insurance_price} USD</b>\n"
+        f"Send more documents to add them, or issue the policies."
+    )
+    return text
+
+
+# --- Issuing ---
+async def issue_policies(
+    passport: PassportData,
+    vehicles: list[VehicleDocumentData],
+    progress: ProgressMessage,
+    user_id: int,
+    rate_limiter: TokenBucketLimiter | None = None,
+) -> tuple[bytes, list[VehicleDocumentData]]:
+    """
+    Issue a policy for every vehicle, rendered locally or generated with OpenAI depending on `s.policy_mode`,
+    and store them for /mypolicies of `user_id` in one insert.
+    Every policy generated with OpenAI takes an "llm" token of `user_id` from `rate_limiter`.
+    Return the policies as one HTML file and the vehicles whose policy could not be generated or was throttled.
+    """
+
+    async def issue(vehicle: VehicleDocumentData) -> str | None:
+        if s.policy_mode == "template":
+            policy = policy_renderer.render_policy(passport, vehicle)
+        elif rate_limiter is not None and await rate_limiter.acquire("llm", user_id):
+            policy = None
+        else:
+            policy = await openai_service.generate_policy_text(passport, vehicle)
+            if policy in (POLICY_BUSY_TEXT, POLICY_ERROR_TEXT):
+                policy = None
+        await progress.advance(failed=policy is None)
+        return policy
+
+    policies = await run_bounded(vehicles, issue, s.fleet_concurrency)
+    sections = "".join(
+        f'<section style="white-space: pre-wrap; border-bottom: 1px solid #999; padding: 1em 0">{policy}</section>\n'
+        for policy in policies
+        if policy is not None
+    )
+    document = f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Fleet policies</title></head>\n<body>\n{sections}</body></html>\n'
+    issued = [(vehicle, policy) for vehicle, policy in zip(vehicles, policies, strict=True) if policy is not None]
+    if issued:
+        await save_policies(user_id, passport, issued)
+    failed = [vehicle for vehicle, policy in zip(vehicles, policies, strict=True) if policy is None]
+    return document.encode(), failed
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from io import BytesIO
+from typing import BinaryIO
+
+from PIL import Image, ImageOps
+
+from app.config import s
+from app.metrics import LOCAL_OCR
+from app.models import PassportData
+from app.utils.checksums import mrz_check_digit
+
+try:
+    import pytesseract
+except ImportError:  # Optional: poetry install --extras local-ocr, plus the tesseract binary
+    pytesseract = None
+
+logger = logging.getLogger(__name__)
+
+MRZ_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789<"
+MRZ_TESSERACT_CONFIG = f"--psm 6 -c tessedit_char_whitelist={MRZ_ALPHABET}"
+MRZ_LINE_LENGTH = 44  # TD3, the passport format
+# Letters OCR reads in place of digits, fixed only where the MRZ must have a digit
+DIGIT_LOOKALIKES = str.maketrans("OQDIJLZSBG", "0000112586")
+
+
+# --- Text parsers ---
+def _mrz_date(yymmdd: str, future: bool) -> str | None:
+    """ISO date of an MRZ date; the century is the one that puts birth dates in the past and expiry in the future."""
+    year, month, day = int(yymmdd[:2]), int(yymmdd[2:4]), int(yymmdd[4:])
+    this_year = date.today().year % 100
+    century = 2000 if future or year <= this_year else 1900
+    try:
+        return date(century + year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+def _mrz_lines(text: str) -> list[str]:
+    """Candidate MRZ lines of the OCR text, without spaces; OCR often gets the count of trailing fillers wrong."""
+    lines = []
+    for line in text.upper().replace("«", "<").splitlines():
+        line = line.replace(" ", "")
+        if len(line) >= MRZ_LINE_LENGTH - 4 and set(line) <= set(MRZ_ALPHABET):
+            lines.append(line)
+    return lines
+
+
+def parse_mrz(text: str) -> PassportData | None:
+    """
+    Passport data from the TD3 machine-readable zone in `text`, or None unless every check digit is correct.
+    The MRZ has no date of issue, so it is "N/A".
+    """
+    lines = _mrz_lines(text)
+    for first, second in zip(lines, lines[1:], strict=False):
+        if not first.startswith("P") or len(second) != MRZ_LINE_LENGTH:
+            continue
+        first = first.rstrip("<").ljust(MRZ_LINE_LENGTH, "<")[:MRZ_LINE_LENGTH]
+        digits = second[9:10] + second[13:20] + second[21:28] + second[42:44]
+        fixed = digits.translate(DIGIT_LOOKALIKES)
+        second = (
+            second[:9] + fixed[0] + second[10:13] + fixed[1:8] + second[20] + fixed[8:15] + second[28:42] + fixed[15:]
+        )
+
+        number, dob, expiry = second[:9], second[13:19], second[21:27]
+        checks = [
+            (number, second[9]),
+            (dob, second[19]),
+            (expiry, second[27]),
+            (second[:10] + second[13:20] + second[21:43], second[43]),  # Composite of the whole line
+        ]
+        if second[28:42].strip("<"):
+            checks.append((second[28:42], second[42]))
+        try:
+            if any(mrz_check_digit(field) != check for field, check in checks):
+                continue
+        except KeyError:
+            continue
+
+        date_of_birth, date_of_expiry = _mrz_date(dob, future=False), _mrz_date(expiry, future=True)
+        surnames, _, given_names = first[5:].partition("<<")
+        if not date_of_birth or not date_of_expiry or not surnames.strip("<"):
+            continue
+        return PassportData(
+            given_names=given_names.replace("<", " ").strip() or None,
+            surnames=surnames.replace("<", " ").strip(),
+            date_of_birth=date_of_birth,
+            passport_number=number.rstrip("<"),
+            date_of_issue=None,
+            date_of_expiry=date_of_expiry,
+        )
+    return None
+
+
+# --- Tesseract ---
+def read_passport(data: bytes, timeout: float) -> PassportData | None:
+    """Run Tesseract on the passport photo and parse its MRZ; runs in a worker process."""
+    with Image.open(BytesIO(data)) as image:
+        gray = ImageOps.grayscale(image)
+    return parse_mrz(pytesseract.image_to_string(gray, config=MRZ_TESSERACT_CONFIG, timeout=timeout))
+
+
+# --- LocalDocumentReader Class ---
+class LocalDocumentReader:
+    """
+    Reads the passport MRZ with Tesseract in a process pool, a fast path before Mindee for the photos
+    that can be read with certainty: a result is returned only when every check digit matches,
+    otherwise None and the caller falls back to Mindee. The pool is started on first use.
+    Vehicle documents always go to Mindee, their layout differs too much between issuers to be parsed here.
+    """
+
+    def __init__(self, workers: int, timeout: float):
+        self.workers = workers
+        self.timeout = timeout
+        self._pool: ProcessPoolExecutor | None = None
+        self._available: bool | None = None
+
+    @property
+    def available(self) -> bool:
+        """True if pytesseract and the tesseract binary are installed."""
+        if self._available is None:
+            self._available = (
+                pytesseract is not None and shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+            )
+            if not self._available:
+                logger.warning("Tesseract is not installed, local OCR is off and every photo goes to Mindee")
+        return self._available
+
+    async def read(self, file: BinaryIO, doc_type: str) -> PassportData | None:
+        """Return the document read from the photo, or None if Mindee has to read it."""
+        if doc_type != "passport" or not self.available:
+            return None
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        file.seek(0)
+        data = file.read()
+        file.seek(0)
+        try:
+            document = await asyncio.get_running_loop().run_in_executor(self._pool, read_passport, data, self.timeout)
+        except Exception:
+            logger.exception("Local OCR failed for a %s photo", doc_type)
+            LOCAL_OCR.labels(doc_type, "error").inc()
+            return None
+        LOCAL_OCR.labels(doc_type, "hit" if document else "miss").inc()
+        return document
+
+    def shutdown(self):
+        """Stop the worker processes, dropping queued jobs."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+local_reader = LocalDocumentReader(s.local_ocr_workers, timeout=s.local_ocr_timeout)
@@ -0,0 +1,55 @@
+import asyncio
+import logging
+
+from aiogram.types import PhotoSize
+from redis.asyncio import Redis
+
+from app.config import s
+from app.storage import redis
+
+logger = logging.getLogger(__name__)
+
+
+# --- MediaGroupCollector Class ---
+class MediaGroupCollector:
+    """
+    Collects the photos of a Telegram album (media group), which arrive as separate updates,
+    possibly on different workers. Photos are gathered in a Redis list per media group.
+    """
+
+    def __init__(self, redis: Redis, wait: float, ttl: int = 60):
+        self.redis = redis
+        self.wait = wait
+        self.ttl = ttl
+
+    async def add(self, media_group_id: str, photo: PhotoSize) -> bool:
+        """
+        Add a photo to its album.
+        :return: True for the first photo of the album, whose handler should then call `collect`.
+            A photo arriving after the album was collected is dropped and False is returned,
+            so it doesn't start a second album of one photo.
+        """
+        key = f"album:{media_group_id}"
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.exists(f"{key}:collected")
+            pipe.rpush(key, photo.model_dump_json())
+            pipe.expire(key, self.ttl)
+            collected, size, _ = await pipe.execute()
+        if collected:
+            logger.info("Dropped a photo of album %s that arrived after it was collected", media_group_id)
+            return False
+        return size == 1
+
+    async def collect(self, media_group_id: str) -> list[PhotoSize]:
+        """Wait for the rest of the album to arrive and return all of its photos in order."""
+        await asyncio.sleep(self.wait)
+        key = f"album:{media_group_id}"
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrange(key, 0, -1)
+            pipe.delete(key)
+            pipe.set(f"{key}:collected", 1, ex=self.ttl)
+            items, *_ = await pipe.execute()
+        return [PhotoSize.model_validate_json(item) for item in items]
+
+
+media_groups = MediaGroupCollector(redis, wait=s.media_group_wait)
@@ -1,10 +1,52 @@
+import threading
+import time
+
+import requests
 from mindee import ClientV2, InferenceParameters
+from mindee.error.mindee_error import MindeeError
+from mindee.input.polling_options import PollingOptions
+from mindee.mindee_http import mindee_api_v2
+from mindee.parsing.v2.common_response import CommonStatus
+from mindee.parsing.v2.field.field_confidence import FieldConfidence
+from mindee.parsing.v2.inference_response import InferenceResponse
+from requests.adapters import HTTPAdapter
 
 from app.config import s
+from app.metrics import track_call
 from app.models import PassportData, VehicleDocumentData
+from app.services.ocr_executor import OCRTimeoutError, ocr_executor
+from app.services.resilience import CircuitBreaker, Resilience, RetryPolicy
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Connection problems, rate limiting and server errors are worth another try."""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    status = getattr(error, "status", None)  # MindeeHTTPErrorV2
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+def _confident_values(fields) -> dict:
+    """
+    Values of the Mindee fields, None where Mindee is less confident than `s.ocr_min_confidence`:
+    a value that is probably misread is treated as not read at all.
+    """
+    minimum = FieldConfidence(s.ocr_min_confidence)
+    values = {}
+    for name, field in fields.items():
+        confidence = getattr(field, "confidence", None)
+        values[name] = getattr(field, "value", None) if confidence is None or confidence >= minimum else None
+    return values
 
-# Initialize Mindee client with API key
-mindee_client = ClientV2(api_key=s.mindee_passport_api_key)
+
+mindee_resilience = Resilience(
+    "mindee",
+    _is_retryable,
+    RetryPolicy(s.upstream_retry_attempts, s.upstream_retry_base_delay, s.upstream_retry_max_delay),
+    CircuitBreaker("mindee", s.circuit_failure_threshold, s.circuit_reset_timeout),
+    # A job that ran out of time still occupies a worker thread, so it is not started again
+    failure_types=(OCRTimeoutError,),
+)
 
 
 # --- MindeeService Class ---
@@ -14,7 +56,51 @@ class MindeeService:
         Initialize the MindeeService with API key and model ID.
         """
         self.client = ClientV2(api_key=api_key)
-        self.params = InferenceParameters(model_id=model_id, rag=False)
+        self.client.mindee_api.request_timeout = s.mindee_http_timeout
+        # The file is read again on every retry, so Mindee must not close it after the first upload;
+        # it is the in-memory copy made by the preprocessor and is freed with it.
+        # Mindee reports field confidences only when asked, `_confident_values` needs them
+        self.params = InferenceParameters(
+            model_id=model_id, rag=False, confidence=True, close_file=False, polling_options=PollingOptions()
+        )
+
+    def _enqueue(self, file) -> str:
+        """
+        Blocking call: upload the file and return the id of the Mindee job.
+        Must only be called from the OCR executor thread pool.
+        """
+        with track_call("mindee", "enqueue"):
+            input_doc = self.client.source_from_file(file)
+            return self.client.enqueue_inference(input_doc, params=self.params).job.id
+
+    def _poll(self, job_id: str, delay: float):
+        """
+        Blocking call: wait `delay` seconds, then poll the job until its inference is ready and return it.
+        Must only be called from the OCR executor thread pool.
+        """
+        polling = self.params.polling_options
+        with track_call("mindee", "poll"):
+            time.sleep(delay)
+            for _ in range(polling.max_retries):
+                job = self.client.get_job(job_id).job
+                if job.status == CommonStatus.FAILED.value:
+                    raise MindeeError(f"Mindee job {job_id} failed: {job.error.detail if job.error else 'no detail'}")
+                if job.status == CommonStatus.PROCESSED.value:
+                    return self.client.get_result(InferenceResponse, job_id)
+                time.sleep(polling.delay_sec)
+        raise MindeeError(f"Mindee job {job_id} was not ready after {polling.max_retries} polls")
+
+    async def _run_inference(self, file):
+        """
+        Upload the file and wait for its inference. The two steps are retried separately,
+        so a document Mindee has accepted is never uploaded, and paid for, again.
+        """
+        job_id = await mindee_resilience.call(lambda: ocr_executor.run(self._enqueue, file))
+        polling = self.params.polling_options
+        delays = iter([polling.initial_delay_sec])  # A retried poll doesn't wait for the upload again
+        return await mindee_resilience.call(
+            lambda: ocr_executor.run(self._poll, job_id, next(delays, polling.delay_sec))
+        )
 
     async def process_passport_photo(self, file):
         """
@@ -22,15 +108,14 @@ class MindeeService:
         :param file: The file object containing the passport photo.
         :return: Extracted text or None if the photo is not valid.
         """
-        input_doc = self.client.source_from_file(file)
-        result = self.client.enqueue_and_get_inference(input_doc, params=self.params)
+        result = await self._run_inference(file)
 
-        passport_fields = result.inference.result.fields
+        passport_fields = _confident_values(result.inference.result.fields)
 
         if None in [
-            passport_fields.get("given_names").value,
-            passport_fields.get("surnames").value,
-            passport_fields.get("passport_number").value,
+            passport_fields.get("given_names"),
+            passport_fields.get("surnames"),
+            passport_fields.get("passport_number"),
         ]:
             return None
 
@@ -42,12 +127,102 @@ class MindeeService:
         :param file: The file object containing the vehicle document photo.
         :return: Extracted text or None if the photo is not valid.
         """
-        input_doc = self.client.source_from_file(file)
-        result = self.client.enqueue_and_get_inference(input_doc, params=self.params)
+        result = await self._run_inference(file)
 
-        vehicle_fields = result.inference.result.fields
+        vehicle_fields = _confident_values(result.inference.result.fields)
 
-        if vehicle_fields.get("vin").value == "null":
+        if vehicle_fields.get("vin") in (None, "null"):
             return None
 
         return VehicleDocumentData.model_validate(vehicle_fields)
+
+
+class _PooledRequests:
+    """
+    Stand-in for the `requests` module used by Mindee's HTTP layer, installed once when this module is imported.
+    Sends every call through one keep-alive session instead of a new connection per request.
+    Called from the OCR pool threads, so the counter is protected by a lock.
+    """
+
+    def __init__(self, pool_size: int):
+        self.session = requests.Session()
+        self.requests_sent = 0
+        self._lock = threading.Lock()
+        self.resize(pool_size)
+
+    def resize(self, pool_size: int):
+        """Keep up to `pool_size` connections open, one per OCR thread."""
+        self.pool_size = pool_size
+        self.adapter = HTTPAdapter(pool_maxsize=pool_size)
+        self.session.mount("https://", self.adapter)
+
+    def _count(self):
+        with self._lock:
+            self.requests_sent += 1
+
+    def get(self, url, **kwargs):
+        self._count()
+        return self.session.get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        self._count()
+        return self.session.post(url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+
+_transport = _PooledRequests(pool_size=s.ocr_max_concurrency)
+mindee_api_v2.requests = _transport
+
+
+# --- MindeeClientRegistry Class ---
+class MindeeClientRegistry:
+    """
+    Long-lived MindeeService instances keyed by (api_key, model_id).
+    All clients share the module's HTTP connection pool, so TLS connections are reused between documents.
+    """
+
+    def __init__(self, transport: _PooledRequests = _transport):
+        self._services: dict[tuple[str, str], MindeeService] = {}
+        self.transport = transport
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, api_key: str, model_id: str) -> MindeeService:
+        """Return the service for this key and model, creating it on first use."""
+        key = (api_key, model_id)
+        service = self._services.get(key)
+        if service is None:
+            self.misses += 1
+            service = self._services[key] = MindeeService(api_key=api_key, model_id=model_id)
+        else:
+            self.hits += 1
+        return service
+
+    def warm_up(self, keys: list[tuple[str, str]]):
+        """Create the clients up front, so the first documents don't pay for it."""
+        for api_key, model_id in keys:
+            if (api_key, model_id) not in self._services:
+                self._services[(api_key, model_id)] = MindeeService(api_key=api_key, model_id=model_id)
+
+    def stats(self) -> dict:
+        """Pool size and reuse counters, for logging and monitoring."""
+        pools = self.transport.adapter.poolmanager.pools
+        connections_opened = sum(pools[key].num_connections for key in pools.keys())  # noqa: SIM118 (container is not iterable)
+        requests_sent = self.transport.requests_sent
+        return {
+            "clients": len(self._services),
+            "pool_size": self.transport.pool_size,
+            "client_hits": self.hits,
+            "client_misses": self.misses,
+            "requests_sent": requests_sent,
+            "connections_opened": connections_opened,
+            "connections_reused": max(requests_sent - connections_opened, 0),
+        }
+
+    def close(self):
+        self.transport.session.close()
+
+
+mindee_registry = MindeeClientRegistry()
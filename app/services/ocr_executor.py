@@ -0,0 +1,67 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from functools import partial
+
+from app.config import s
+
+
+class OCRTimeoutError(Exception):
+    """Raised when an OCR job does not finish within its deadline."""
+
+
+# --- OCRExecutor Class ---
+class OCRExecutor:
+    """
+    Runs blocking OCR calls in a bounded thread pool so the event loop stays responsive.
+    At most `max_concurrency` jobs run at once, the rest wait for a free slot.
+    """
+
+    def __init__(self, max_concurrency: int, timeout: float):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="ocr")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(self, func, *args, timeout: float | None = None):
+        """
+        Run `func(*args)` in the pool and wait for the result.
+        The slot is held until the thread finishes, even after a timeout, and the deadline starts
+        only once the job has a slot, so a job never waits in the pool behind an abandoned one.
+        :param timeout: Per-job deadline in seconds, defaults to the executor timeout.
+        :raises OCRTimeoutError: If the job does not finish in time.
+        """
+        timeout = timeout or self.timeout
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphore
+        await semaphore.acquire()
+        try:
+            future = self._pool.submit(partial(func, *args))
+        except BaseException:
+            semaphore.release()
+            raise
+        future.add_done_callback(lambda _: self._release(loop, semaphore))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except TimeoutError as e:
+            raise OCRTimeoutError(f"OCR job did not finish in {timeout} seconds") from e
+
+    @staticmethod
+    def _release(loop: asyncio.AbstractEventLoop, semaphore: asyncio.Semaphore):
+        """Called from the pool thread when a job is done or cancelled."""
+        with suppress(RuntimeError):  # The loop is closed, nothing waits for the slot anymore
+            loop.call_soon_threadsafe(semaphore.release)
+
+    def resize(self, max_concurrency: int):
+        """Change the number of concurrent jobs, before the first job is run (e.g. by `python -m app.cli`)."""
+        self._pool.shutdown(wait=False)
+        self.max_concurrency = max_concurrency
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="ocr")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def shutdown(self):
+        """Stop accepting jobs and drop the ones still waiting in the pool."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+ocr_executor = OCRExecutor(s.ocr_max_concurrency, s.ocr_timeout)
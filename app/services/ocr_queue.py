@@ -0,0 +1,99 @@
+import logging
+import time
+import uuid
+
+from aiogram.types import PhotoSize
+from pydantic import BaseModel, Field
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from app.config import s
+from app.storage import redis
+
+logger = logging.getLogger(__name__)
+
+
+class OCRJob(BaseModel):
+    """A photo waiting for recognition and the chat message its result goes to."""
+
+    job_id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    chat_id: int
+    user_id: int
+    message_id: int  # The "processing" message that is edited with the result
+    doc_type: str
+    photo: PhotoSize
+    enqueued_at: float = Field(default_factory=time.time)
+
+
+# --- OCRQueue Class ---
+class OCRQueue:
+    """
+    OCR jobs in a Redis stream, consumed by `python -m app.worker` processes through a consumer group.
+    A job stays pending until a worker acknowledges it, so jobs of a crashed worker are claimed by another one.
+    """
+
+    def __init__(self, redis: Redis, stream: str = "ocr:jobs", group: str = "ocr-workers", max_length: int = 10_000):
+        self.redis = redis
+        self.stream = stream
+        self.group = group
+        self.max_length = max_length
+        self.dead_stream = f"{stream}:dead"
+
+    async def enqueue(self, job: OCRJob) -> str:
+        """Add a job to the stream and return its entry id."""
+        entry_id = await self.redis.xadd(
+            self.stream, {"job": job.model_dump_json()}, maxlen=self.max_length, approximate=True
+        )
+        return entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+
+    async def ensure_group(self):
+        """Create the stream and the consumer group if they don't exist yet."""
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def read(self, consumer: str, count: int, block: int) -> list[tuple[str, OCRJob]]:
+        """
+        Take up to `count` new jobs for `consumer`, waiting up to `block` milliseconds for the first one.
+        :return: [(entry_id, job)]
+        """
+        response = await self.redis.xreadgroup(self.group, consumer, {self.stream: ">"}, count=count, block=block)
+        return [self._parse(entry) for _, entries in response or [] for entry in entries]
+
+    async def claim_stale(self, consumer: str, min_idle: int, count: int) -> list[tuple[str, OCRJob]]:
+        """Take over jobs that another consumer has held for more than `min_idle` milliseconds without finishing."""
+        _, entries, _ = await self.redis.xautoclaim(
+            self.stream, self.group, consumer, min_idle_time=min_idle, start_id="0-0", count=count
+        )
+        return [self._parse(entry) for entry in entries if entry[1]]  # Trimmed entries come back empty
+
+    async def ack(self, entry_id: str):
+        """Mark the job as done and remove it from the stream."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xack(self.stream, self.group, entry_id)
+            pipe.xdel(self.stream, entry_id)
+            await pipe.execute()
+
+    async def deliveries(self, entry_id: str) -> int:
+        """How many times the job has been handed to a consumer, the current delivery included."""
+        pending = await self.redis.xpending_range(self.stream, self.group, min=entry_id, max=entry_id, count=1)
+        return pending[0]["times_delivered"] if pending else 0
+
+    async def dead_letter(self, entry_id: str, job: OCRJob):
+        """Move a job that keeps failing to the dead-letter stream, where it can be inspected, and acknowledge it."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xadd(self.dead_stream, {"job": job.model_dump_json()}, maxlen=self.max_length, approximate=True)
+            pipe.xack(self.stream, self.group, entry_id)
+            pipe.xdel(self.stream, entry_id)
+            await pipe.execute()
+
+    @staticmethod
+    def _parse(entry) -> tuple[str, OCRJob]:
+        entry_id, fields = entry
+        entry_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+        return entry_id, OCRJob.model_validate_json(fields[b"job"])
+
+
+ocr_queue = OCRQueue(redis, max_length=s.ocr_queue_max_length)
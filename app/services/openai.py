@@ -1,17 +1,38 @@
-from openai import AsyncOpenAI
+import logging
+
+from openai import APIConnectionError, AsyncOpenAI, InternalServerError, RateLimitError
 
 from app.config import s
+from app.metrics import record_openai_usage, track_call, track_stream
 from app.models import PassportData, VehicleDocumentData
+from app.services.resilience import CircuitBreaker, CircuitOpenError, Resilience, RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_ERROR_REPLY = "I'm having a little trouble right now. Please try starting over with /start."
+SERVICE_BUSY_REPLY = "⏳ I'm very busy right now. Please try again in a few minutes."
+POLICY_ERROR_TEXT = "An error occurred while generating the policy text. Please try again later."
+POLICY_BUSY_TEXT = "⏳ The policy service is busy right now. Please try again in a few minutes."
+
+openai_resilience = Resilience(
+    "openai",
+    # Connection errors include timeouts; 429 and 5xx are transient as well
+    lambda error: isinstance(error, (APIConnectionError, RateLimitError, InternalServerError)),
+    RetryPolicy(s.upstream_retry_attempts, s.upstream_retry_base_delay, s.upstream_retry_max_delay),
+    CircuitBreaker("openai", s.circuit_failure_threshold, s.circuit_reset_timeout),
+)
 
 
 class OpenAIService:
     def __init__(self, api_key, model: str):
         self.api_key = api_key
-        self.client = AsyncOpenAI(api_key=self.api_key)
+        # Retries are done by openai_resilience, so they share its backoff and circuit breaker
+        self.client = AsyncOpenAI(api_key=self.api_key, max_retries=0, timeout=s.openai_timeout)
         self.model = model
 
-    async def generate_policy_text(self, passport: PassportData, vehicle: VehicleDocumentData):
-        """Generates a dummy insurance policy text using OpenAI."""
+    @staticmethod
+    def _policy_messages(passport: PassportData, vehicle: VehicleDocumentData) -> list[dict]:
+        """Builds the chat messages asking the model for a policy document."""
         system_prompt = (
             "You are an automated system that generates car insurance policies in simple HTML format for a Telegram bot. "
             "Your task is to generate ONLY the HTML body of the policy. "
@@ -37,22 +58,77 @@ class OpenAIService:
             f"  - Customer Service: 1-800-555-0199\n"
             f"  - Email: support@autoinsure.com"
         )
+        return [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}]
+
+    @staticmethod
+    def _clean_policy_html(policy_content: str) -> str:
+        """Removes the tags Telegram doesn't support from the generated policy."""
+        safe_content = policy_content.replace("<br>", "\n").replace("<br/>", "\n")
+        safe_content = safe_content.replace("<div>", "").replace("</div>", "")
+        return safe_content.strip()
+
+    async def generate_policy_text(self, passport: PassportData, vehicle: VehicleDocumentData):
+        """Generates a dummy insurance policy text using OpenAI."""
+        try:
+            with track_call("openai", "policy"):
+                response = await openai_resilience.call(
+                    lambda: self.client.chat.completions.create(
+                        model=self.model,
+                        messages=self._policy_messages(passport, vehicle),
+                        max_tokens=500,
+                        temperature=0.4,
+                    )
+                )
+            record_openai_usage("policy", response.usage)
+            policy_content = response.choices[0].message.content
+            return self._clean_policy_html(policy_content)
+
+        except CircuitOpenError:
+            return POLICY_BUSY_TEXT
+
+        except Exception as e:
+            logger.error("Error generating policy text: %r", e)
+            return POLICY_ERROR_TEXT
 
+    async def stream_policy_text(self, passport: PassportData, vehicle: VehicleDocumentData):
+        """
+        Streams the policy as it is generated.
+        Yields the whole text received so far after every chunk, the last value is the complete policy.
+        """
+        policy_content = ""
+        error_text = POLICY_ERROR_TEXT
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
-                max_tokens=500,
-                temperature=0.4,
+            # Only opening the stream is retried: a retry after the first chunks would repeat them
+            stream = track_stream(
+                "openai",
+                "policy_stream",
+                lambda: openai_resilience.call(
+                    lambda: self.client.chat.completions.create(
+                        model=self.model,
+                        messages=self._policy_messages(passport, vehicle),
+                        max_tokens=500,
+                        temperature=0.4,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                    )
+                ),
             )
-            policy_content = response.choices[0].message.content
-            safe_content = policy_content.replace("<br>", "\n").replace("<br/>", "\n")
-            safe_content = safe_content.replace("<div>", "").replace("</div>", "")
-            return safe_content.strip()
+            async for chunk in stream:
+                record_openai_usage("policy_stream", getattr(chunk, "usage", None))
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                policy_content += chunk.choices[0].delta.content
+                yield self._clean_policy_html(policy_content)
+
+        except CircuitOpenError:
+            error_text = POLICY_BUSY_TEXT
 
         except Exception as e:
-            print(f"Error generating policy text: {e}")
-            return "An error occurred while generating the policy text. Please try again later."
+            logger.error("Error streaming policy text: %r", e)
+            policy_content = ""
+
+        if not policy_content:
+            yield error_text
 
     async def generate_conversational_reply(self, user_message: str) -> str:
         """Generates a conversational reply for unhandled user messages."""
@@ -69,16 +145,25 @@ class OpenAIService:
         )
 
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_message}],
-                max_tokens=100,
-                temperature=0.7,
-            )
+            with track_call("openai", "conversation"):
+                response = await openai_resilience.call(
+                    lambda: self.client.chat.completions.create(
+                        model=self.model,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": user_message},
+                        ],
+                        max_tokens=100,
+                        temperature=0.7,
+                    )
+                )
+            record_openai_usage("conversation", response.usage)
             return response.choices[0].message.content.strip()
+        except CircuitOpenError:
+            return SERVICE_BUSY_REPLY
         except Exception as e:
-            print(f"Error in conversational reply: {e}")
-            return "I'm having a little trouble right now. Please try starting over with /start."
+            logger.error("Error in conversational reply: %r", e)
+            return CONVERSATION_ERROR_REPLY
 
 
 openai_service = OpenAIService(
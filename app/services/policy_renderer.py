@@ -0,0 +1,42 @@
+from datetime import date
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader
+
+from app.config import s
+from app.models import PassportData, VehicleDocumentData
+
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates"
+
+
+# --- PolicyRenderer Class ---
+class PolicyRenderer:
+    """
+    Renders insurance policies from local Jinja2 templates without calling the LLM.
+    Templates are compiled once on creation and all document values are HTML-escaped for Telegram.
+    """
+
+    def __init__(self, templates_dir: Path = TEMPLATES_DIR):
+        self.env = Environment(loader=FileSystemLoader(templates_dir), autoescape=True, keep_trailing_newline=False)
+        self.policy_template = self.env.get_template("policy.html.j2")
+
+    def render_policy(self, passport: PassportData, vehicle: VehicleDocumentData, issued_on: date | None = None) -> str:
+        """Renders the policy HTML, valid for one year from `issued_on` (today by default)."""
+        valid_from = issued_on or date.today()
+        return self.policy_template.render(
+            passport=passport,
+            vehicle=vehicle,
+            price=s.insurance_price,
+            valid_from=valid_from.strftime("%d.%m.%Y"),
+            valid_until=_one_year_later(valid_from).strftime("%d.%m.%Y"),
+        )
+
+
+def _one_year_later(day: date) -> date:
+    try:
+        return day.replace(year=day.year + 1)
+    except ValueError:  # February 29th
+        return day.replace(year=day.year + 1, day=28)
+
+
+policy_renderer = PolicyRenderer()
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from dataclasses import astuple, dataclass, field
+from pathlib import Path
+
+import aiosqlite
+
+from app.config import s
+from app.metrics import track_call
+from app.models import PassportData, VehicleDocumentData
+
+try:
+    import asyncpg
+except ImportError:  # Optional: poetry install --extras postgres, for a POLICY_DB_URL starting with postgresql://
+    asyncpg = None
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = "user_id, passport_number, vin, holder, vehicle_model, policy_html, created_at"
+# Lookups are by user (newest first), passport number and VIN; the id breaks ties between policies of one batch
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS policies (
+        id {id_type} PRIMARY KEY,
+        user_id BIGINT NOT NULL,
+        passport_number TEXT NOT NULL,
+        vin TEXT NOT NULL,
+        holder TEXT NOT NULL,
+        vehicle_model TEXT NOT NULL,
+        policy_html TEXT NOT NULL,
+        created_at DOUBLE PRECISION NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS policies_user_id_idx ON policies (user_id, id DESC)",
+    "CREATE INDEX IF NOT EXISTS policies_passport_number_idx ON policies (passport_number)",
+    "CREATE INDEX IF NOT EXISTS policies_vin_idx ON policies (vin)",
+]
+
+
+@dataclass
+class StoredPolicy:
+    """An issued policy with the fields it is looked up by; `id` is assigned by the database."""
+
+    user_id: int
+    passport_number: str
+    vin: str
+    holder: str
+    vehicle_model: str
+    policy_html: str
+    created_at: float = field(default_factory=time.time)
+    id: int | None = None
+
+    @classmethod
+    def issue(cls, user_id: int, passport: PassportData, vehicle: VehicleDocumentData, policy_html: str):
+        return cls(
+            user_id=user_id,
+            passport_number=passport.passport_number,
+            vin=vehicle.vin,
+            holder=f"{passport.given_names} {passport.surnames}",
+            vehicle_model=vehicle.model,
+            policy_html=policy_html,
+        )
+
+
+# --- PolicyRepository Class ---
+class PolicyRepository(ABC):
+    """
+    Issued policies, so they can be sent again without OCR or generation.
+    Subclasses run the queries, written with "?" placeholders, on SQLite or PostgreSQL.
+    The connection is opened and the schema created on first use.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self._connect_lock = asyncio.Lock()
+        self._connected = False
+
+    async def _ensure_connected(self):
+        async with self._connect_lock:
+            if not self._connected:
+                await self._connect()
+                self._connected = True
+
+    async def add(self, policy: StoredPolicy):
+        await self.add_many([policy])
+
+    async def add_many(self, policies: list[StoredPolicy]):
+        """Insert the policies in one transaction."""
+        await self._ensure_connected()
+        with track_call("policy_db", "insert"):
+            await self._insert([astuple(policy)[:-1] for policy in policies])
+
+    async def get(self, policy_id: int) -> StoredPolicy | None:
+        policies = await self._select("id = ?", policy_id, limit=1)
+        return policies[0] if policies else None
+
+    async def find_by_user(self, user_id: int, limit: int = 10) -> list[StoredPolicy]:
+        return await self._select("user_id = ?", user_id, limit=limit)
+
+    async def find_by_passport_number(self, passport_number: str, limit: int = 10) -> list[StoredPolicy]:
+        return await self._select("passport_number = ?", passport_number, limit=limit)
+
+    async def find_by_vin(self, vin: str, limit: int = 10) -> list[StoredPolicy]:
+        return await self._select("vin = ?", vin, limit=limit)
+
+    async def _select(self, condition: str, value, limit: int) -> list[StoredPolicy]:
+        """The policies matching `condition`, newest first."""
+        await self._ensure_connected()
+        sql = f"SELECT {COLUMNS}, id FROM policies WHERE {condition} ORDER BY id DESC LIMIT ?"
+        with track_call("policy_db", "select"):
+            rows = await self._fetch(sql, value, limit)
+        return [StoredPolicy(*row) for row in rows]
+
+    @abstractmethod
+    async def _connect(self):
+        """Open the connection and create the schema."""
+
+    @abstractmethod
+    async def _insert(self, rows: list[tuple]):
+        """Insert the rows, in COLUMNS order, in one transaction."""
+
+    @abstractmethod
+    async def _fetch(self, sql: str, *args) -> list[tuple]:
+        """Run a query written with "?" placeholders and return its rows."""
+
+    @abstractmethod
+    async def close(self):
+        """Close the connection; the next query opens it again."""
+
+
+class SQLitePolicyRepository(PolicyRepository):
+    """A local SQLite file, the default; writes are serialized because there is a single connection."""
+
+    def __init__(self, url: str):
+        super().__init__(url)
+        self.path = url.removeprefix("sqlite://").removeprefix("/")
+        self._db: aiosqlite.Connection | None = None
+        self._write_lock = asyncio.Lock()
+
+    async def _connect(self):
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = await aiosqlite.connect(self.path)
+        await self._db.execute("PRAGMA journal_mode=WAL")  # Readers don't wait for a write
+        for statement in SCHEMA:
+            await self._db.execute(statement.format(id_type="INTEGER"))
+        await self._db.commit()
+
+    async def _insert(self, rows: list[tuple]):
+        async with self._write_lock:
+            await self._db.executemany(f"INSERT INTO policies ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            await self._db.commit()
+
+    async def _fetch(self, sql: str, *args) -> list[tuple]:
+        async with self._db.execute(sql, args) as cursor:
+            return await cursor.fetchall()
+
+    async def close(self):
+        if self._db is not None:
+            await self._db.close()
+            self._db, self._connected = None, False
+
+
+class PostgresPolicyRepository(PolicyRepository):
+    """PostgreSQL through an asyncpg connection pool, for several bot replicas."""
+
+    def __init__(self, url: str):
+        if asyncpg is None:
+            raise RuntimeError("POLICY_DB_URL is a PostgreSQL URL but asyncpg is not installed (--extras postgres)")
+        super().__init__(url)
+        self._pool = None
+
+    @staticmethod
+    def _numbered(sql: str) -> str:
+        """Replace the "?" placeholders with asyncpg's $1, $2, ..."""
+        parts = sql.split("?")
+        return parts[0] + "".join(f"${i}{part}" for i, part in enumerate(parts[1:], 1))
+
+    async def _connect(self):
+        self._pool = await asyncpg.create_pool(self.url, min_size=1, max_size=s.policy_db_pool_size)
+        async with self._pool.acquire() as connection:
+            for statement in SCHEMA:
+                await connection.execute(statement.format(id_type="BIGINT GENERATED ALWAYS AS IDENTITY"))
+
+    async def _insert(self, rows: list[tuple]):
+        sql = self._numbered(f"INSERT INTO policies ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)")
+        async with self._pool.acquire() as connection, connection.transaction():
+            await connection.executemany(sql, rows)
+
+    async def _fetch(self, sql: str, *args) -> list[tuple]:
+        return [tuple(record) for record in await self._pool.fetch(self._numbered(sql), *args)]
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool, self._connected = None, False
+
+
+def create_policy_repository(url: str) -> PolicyRepository:
+    if url.startswith(("postgresql://", "postgres://")):
+        return PostgresPolicyRepository(url)
+    if url.startswith("sqlite://"):
+        return SQLitePolicyRepository(url)
+    raise ValueError(f"Unsupported POLICY_DB_URL: {url}")
+
+
+async def save_policies(user_id: int, passport: PassportData, issued: list[tuple[VehicleDocumentData, str]]):
+    """
+    Store policies that were just sent, for /mypolicies.
+    The user already has them, so a database error is only logged.
+    """
+    try:
+        await policy_repository.add_many(
+            [StoredPolicy.issue(user_id, passport, vehicle, policy_html) for vehicle, policy_html in issued]
+        )
+    except Exception as e:
+        logger.warning("Policy store is unavailable, %d policies not saved: %r", len(issued), e)
+
+
+policy_repository = create_policy_repository(s.policy_db_url)
@@ -0,0 +1,109 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from io import BytesIO
+from typing import BinaryIO
+
+from PIL import ExifTags, Image, ImageFilter, ImageOps, ImageStat
+
+from app.config import s
+from app.metrics import PHOTO_BYTES, PHOTO_REJECTIONS
+
+QUALITY_CHECK_SIZE = 1000  # Sharpness and brightness are measured at this size, so they don't depend on resolution
+
+
+class PhotoQualityError(Exception):
+    """Raised when a photo is too blurry or too dark to be worth sending to OCR."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)  # The only argument, so the error survives pickling back from the pool
+        self.reason = reason
+
+    def __str__(self):
+        return f"Photo is too {self.reason}"
+
+
+def preprocess_photo(data: bytes, max_side: int, quality: int, min_sharpness: float, min_brightness: float) -> bytes:
+    """
+    Rotate the photo upright, check that it is readable, downscale it to `max_side` and recompress it as JPEG.
+    Returns the original bytes if recompressing would not make the file smaller.
+    :raises PhotoQualityError: If the photo is too dark or too blurry.
+    """
+    with Image.open(BytesIO(data)) as image:
+        orientation = image.getexif().get(ExifTags.Base.Orientation, 1)
+        rotated = ImageOps.exif_transpose(image)
+
+        gray = rotated.convert("L")
+        gray.thumbnail((QUALITY_CHECK_SIZE, QUALITY_CHECK_SIZE))
+        if ImageStat.Stat(gray).mean[0] < min_brightness:
+            raise PhotoQualityError("dark")
+        # Sharp print has strong edges, so the edge map varies a lot; blur flattens it.
+        # The filter leaves the 1px border unprocessed, it is cropped so it doesn't count as edges.
+        edges = gray.filter(ImageFilter.FIND_EDGES).crop((1, 1, gray.width - 1, gray.height - 1))
+        if ImageStat.Stat(edges).var[0] < min_sharpness:
+            raise PhotoQualityError("blurry")
+
+        if orientation == 1 and max(image.size) <= max_side and image.format == "JPEG":
+            return data  # Already upright, small enough and compressed
+        resized = rotated.convert("RGB")
+        resized.thumbnail((max_side, max_side))
+        buffer = BytesIO()
+        resized.save(buffer, format="JPEG", quality=quality, optimize=True)
+
+    processed = buffer.getvalue()
+    return processed if len(processed) < len(data) else data
+
+
+# --- ImagePreprocessor Class ---
+class ImagePreprocessor:
+    """
+    Runs `preprocess_photo` in a process pool: decoding and resizing are CPU-bound and would stall the event loop.
+    The pool is started on first use.
+    """
+
+    def __init__(self, workers: int, max_side: int, quality: int, min_sharpness: float, min_brightness: float):
+        self.workers = workers
+        self._preprocess = partial(
+            preprocess_photo,
+            max_side=max_side,
+            quality=quality,
+            min_sharpness=min_sharpness,
+            min_brightness=min_brightness,
+        )
+        self._pool: ProcessPoolExecutor | None = None
+
+    async def run(self, file: BinaryIO) -> BytesIO:
+        """
+        Return the preprocessed photo as a new file with the same name.
+        :raises PhotoQualityError: If the photo is too dark or too blurry.
+        """
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        file.seek(0)
+        data = file.read()  # The one copy the worker process needs
+        try:
+            processed = await asyncio.get_running_loop().run_in_executor(self._pool, self._preprocess, data)
+        except PhotoQualityError as e:
+            PHOTO_REJECTIONS.labels(e.reason).inc()
+            raise
+        PHOTO_BYTES.labels("downloaded").inc(len(data))
+        PHOTO_BYTES.labels("preprocessed").inc(len(processed))
+
+        result = BytesIO(processed)
+        result.name = getattr(file, "name", "photo.jpg")
+        return result
+
+    def shutdown(self):
+        """Stop the worker processes, dropping queued jobs."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+image_preprocessor = ImagePreprocessor(
+    s.preprocess_workers,
+    max_side=s.preprocess_max_side,
+    quality=s.preprocess_jpeg_quality,
+    min_sharpness=s.photo_min_sharpness,
+    min_brightness=s.photo_min_brightness,
+)
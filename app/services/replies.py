@@ -0,0 +1,72 @@
+import re
+import unicodedata
+
+from app.config import s
+from app.middlewares import THROTTLED_TEXTS, TokenBucketLimiter
+from app.services.cache import reply_cache
+from app.services.openai import CONVERSATION_ERROR_REPLY, SERVICE_BUSY_REPLY, openai_service
+
+PUNCTUATION_RE = re.compile(r"[^\w\s]")
+WHITESPACE_RE = re.compile(r"\s+")
+
+# --- Top FAQ intents, answered without calling OpenAI. Checked in this order. ---
+INTENT_PATTERNS = {
+    "cancel": re.compile(r"\b(cancel|stop|restart|start over|скасувати|відміна|отмена|отменить)\b"),
+    "price": re.compile(r"\b(price|cost|costs|how much|ціна|вартість|скільки|цена|стоимость|сколько)\b"),
+    "help": re.compile(r"^(help|help me|what can you do|допомога|помощь)$"),
+    "start": re.compile(r"^(hi|hello|hey|hi there|hello there|start|begin|привіт|привет|вітаю|здравствуйте)$"),
+}
+
+INTENT_REPLIES = {
+    "cancel": "To stop the current process, send /cancel. You can always begin again with /start.",
+    "price": f"The insurance price is fixed at {s.insurance_price} USD. Send /start to get your policy.",
+    "help": (
+        "I help you buy car insurance in a few steps: send a photo of your passport, "
+        "then of your vehicle document, confirm the data and get your policy. Send /start to begin."
+    ),
+    "start": "Hello! 👋 I'm your car insurance assistant. Send /start to begin and I'll guide you step by step.",
+}
+
+
+def normalize_message(text: str) -> str:
+    """Fold case, punctuation and whitespace, so equivalent messages share one cache entry."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = PUNCTUATION_RE.sub(" ", text)
+    return WHITESPACE_RE.sub(" ", text).strip()
+
+
+def match_intent(normalized_text: str) -> str | None:
+    """Return the FAQ intent of a normalized message, or None if it needs a real answer."""
+    for intent, pattern in INTENT_PATTERNS.items():
+        if pattern.search(normalized_text):
+            return intent
+    return None
+
+
+async def get_conversational_reply(
+    text: str, rate_limiter: TokenBucketLimiter | None = None, user_id: int | None = None
+) -> str:
+    """
+    Answer a free-text message: from a local FAQ intent if one matches,
+    then from the reply cache, and only then from OpenAI.
+    Only a call to OpenAI takes a token from the user's "llm" budget.
+    """
+    normalized_text = normalize_message(text)
+    intent = match_intent(normalized_text)
+    if intent:
+        return INTENT_REPLIES[intent]
+
+    if normalized_text:
+        cached_reply = await reply_cache.get(normalized_text)
+        if cached_reply:
+            return cached_reply
+
+    if rate_limiter is not None:
+        exhausted = await rate_limiter.acquire("llm", user_id)
+        if exhausted is not None:
+            return THROTTLED_TEXTS[exhausted]
+
+    reply_text = await openai_service.generate_conversational_reply(text)
+    if normalized_text and reply_text not in (CONVERSATION_ERROR_REPLY, SERVICE_BUSY_REPLY):
+        await reply_cache.set(normalized_text, reply_text)
+    return reply_text
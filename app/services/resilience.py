@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
+
+from app.metrics import CIRCUIT_BREAKER_STATE, UPSTREAM_RETRIES
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream service whose circuit breaker is open."""
+
+    def __init__(self, service: str):
+        super().__init__(f"{service} is unavailable, circuit breaker is open")
+        self.service = service
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter: before retry n, sleep a random time up to `base_delay * 2**n`,
+    capped at `max_delay`. At most `attempts` calls are made in total.
+    """
+
+    attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+
+    def backoff(self, retry: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**retry))
+
+
+# --- CircuitBreaker Class ---
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` failures in a row and then rejects calls for `reset_timeout` seconds.
+    After that one trial call is let through (half-open): it closes the breaker on success or opens it again.
+    The state is kept per process and exported as the `bot_circuit_breaker_state` gauge.
+    """
+
+    def __init__(self, service: str, failure_threshold: int, reset_timeout: float):
+        self.service = service
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._set_state("closed")
+
+    def _set_state(self, state: str):
+        self.state = state
+        CIRCUIT_BREAKER_STATE.labels(self.service).set(CIRCUIT_STATES[state])
+
+    def before_call(self):
+        """:raises CircuitOpenError: If the call must not be made."""
+        if self.state == "closed":
+            return
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._set_state("half_open")
+        if self.state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return
+        raise CircuitOpenError(self.service)
+
+    def release(self):
+        """Give up the trial call without a verdict, e.g. when the call was cancelled."""
+        self._trial_running = False
+
+    def record_success(self):
+        self.failures = 0
+        self._trial_running = False
+        if self.state != "closed":
+            logger.info("Circuit breaker for %s closed", self.service)
+            self._set_state("closed")
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_running = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning("Circuit breaker for %s opened after %d failures", self.service, self.failures)
+            self.opened_at = time.monotonic()
+            self._set_state("open")
+
+
+# --- Resilience Class ---
+class Resilience:
+    """
+    Calls an upstream service with a deadline per attempt, jittered retries of transient errors
+    and a circuit breaker, so a degraded service fails fast instead of making every user wait.
+    """
+
+    def __init__(
+        self,
+        service: str,
+        is_retryable: Callable[[Exception], bool],
+        policy: RetryPolicy,
+        breaker: CircuitBreaker,
+        failure_types: tuple[type[Exception], ...] = (),
+    ):
+        """
+        :param is_retryable: Whether an error is transient (timeouts, connection errors, 429, 5xx).
+        :param failure_types: Errors that count against the breaker without being retried, e.g. a timeout
+            of a job that is expensive to repeat. Any other non-retryable error means the service is up.
+        """
+        self.service = service
+        self.is_retryable = is_retryable
+        self.policy = policy
+        self.breaker = breaker
+        self.failure_types = failure_types
+
+    async def call(self, func: Callable[[], Awaitable[T]], timeout: float | None = None) -> T:
+        """
+        Await `func()` until it succeeds, a non-retryable error is raised or the attempts run out.
+        :param timeout: Deadline of one attempt in seconds; a timed out attempt is retried.
+        :raises CircuitOpenError: If the breaker is open, without calling `func`.
+        """
+        for retry in range(self.policy.attempts):
+            self.breaker.before_call()
+            try:
+                result = await asyncio.wait_for(func(), timeout)
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                retryable = isinstance(e, TimeoutError) or self.is_retryable(e)
+                if not retryable and not isinstance(e, self.failure_types):
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if not retryable or retry == self.policy.attempts - 1 or self.breaker.state == "open":
+                    raise
+                delay = self.policy.backoff(retry)
+                logger.warning("%s call failed (%r), retrying in %.1fs", self.service, e, delay)
+                UPSTREAM_RETRIES.labels(self.service).inc()
+                await asyncio.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+
+from redis.asyncio import Redis
+
+from app.config import s
+from app.metrics import FSM_KEYS, FSM_KEYS_WITHOUT_TTL, FSM_MEMORY
+from app.storage import redis
+
+logger = logging.getLogger(__name__)
+
+KEY_KINDS = ("state", "session", "data", "lock")  # The last part of an FSM key; "data" is the pre-session format
+
+
+@dataclass
+class SweepReport:
+    keys: Counter = field(default_factory=Counter)  # Key count by kind
+    memory_bytes: int | None = None  # None if the server doesn't support MEMORY USAGE
+    ttl_added: int = 0
+
+
+# --- SessionSweeper Class ---
+class SessionSweeper:
+    """
+    Scans the FSM keys in the background and reports their count and memory as metrics.
+    Redis expires abandoned sessions by itself; the sweeper gives `default_ttl` to keys that have no TTL,
+    e.g. ones written before TTLs were configured, so they can't keep personal data forever.
+    """
+
+    def __init__(self, redis: Redis, default_ttl: int, interval: float, prefix: str = "fsm", batch_size: int = 500):
+        self.redis = redis
+        self.default_ttl = default_ttl
+        self.interval = interval
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self._task: asyncio.Task | None = None
+
+    async def sweep(self) -> SweepReport:
+        report = SweepReport(memory_bytes=0)
+        batch = []
+        async for key in self.redis.scan_iter(match=f"{self.prefix}:*", count=self.batch_size):
+            batch.append(key)
+            if len(batch) >= self.batch_size:
+                await self._sweep_batch(batch, report)
+                batch = []
+        if batch:
+            await self._sweep_batch(batch, report)
+
+        for kind in KEY_KINDS:
+            FSM_KEYS.labels(kind).set(report.keys[kind])
+        if report.memory_bytes is not None:
+            FSM_MEMORY.set(report.memory_bytes)
+        FSM_KEYS_WITHOUT_TTL.inc(report.ttl_added)
+        return report
+
+    async def _sweep_batch(self, keys: list[bytes], report: SweepReport):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.ttl(key)
+                pipe.memory_usage(key)
+            results = await pipe.execute(raise_on_error=False)
+
+        without_ttl = []
+        for key, ttl, memory in zip(keys, results[::2], results[1::2], strict=True):
+            if ttl == -2:
+                continue  # Expired between SCAN and TTL
+            report.keys[key.decode().rsplit(":", 1)[-1]] += 1
+            if ttl == -1:
+                without_ttl.append(key)
+            if isinstance(memory, int) and report.memory_bytes is not None:
+                report.memory_bytes += memory
+            else:
+                report.memory_bytes = None
+
+        if without_ttl:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key in without_ttl:
+                    pipe.expire(key, self.default_ttl, nx=True)
+                await pipe.execute()
+            report.ttl_added += len(without_ttl)
+
+    async def run(self):
+        while True:
+            try:
+                report = await self.sweep()
+                logger.info(
+                    "FSM keys: %s, memory: %s bytes, TTL added to %d",
+                    dict(report.keys),
+                    report.memory_bytes,
+                    report.ttl_added,
+                )
+            except Exception as e:
+                logger.warning("Error sweeping FSM keys: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+session_sweeper = SessionSweeper(redis, s.session_ttl, s.session_sweep_interval)
@@ -0,0 +1,163 @@
+import re
+from datetime import date, datetime
+
+from app.models import PassportData, VehicleDocumentData
+from app.utils.checksums import is_valid_vin
+
+NOT_AVAILABLE = "N/A"
+DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%d/%m/%Y", "%d-%m-%Y", "%d %m %Y", "%Y.%m.%d", "%Y/%m/%d", "%d %b %Y")
+MAX_AGE_YEARS = 120
+PASSPORT_NUMBER_RE = re.compile(r"^[A-Z0-9]{6,10}$")
+VIN_RE = re.compile(r"^[A-HJ-NPR-Z0-9]{17}$")
+# I, O and Q are not used in VINs, so they can only be misread 1 and 0
+VIN_LOOKALIKES = str.maketrans("IOQ", "100")
+
+PASSPORT_LABELS = {
+    "given_names": "name",
+    "surnames": "surname",
+    "date_of_birth": "date of birth",
+    "passport_number": "passport number",
+    "date_of_issue": "date of issue",
+    "date_of_expiry": "date of expiry",
+}
+REQUIRED_PASSPORT_FIELDS = ("given_names", "surnames", "passport_number")
+VEHICLE_LABELS = {
+    "vin": "VIN",
+    "model": "make and model",
+    "reg_number": "registration number",
+    "doc_number": "document number",
+}
+
+
+class InvalidDocument(Exception):
+    """The recognized data can't be right or can't be used, so the user is asked for another photo."""
+
+    def __init__(self, doc_type: str, reasons: list[str]):
+        super().__init__(f"Invalid {doc_type}: {'; '.join(reasons)}")
+        self.doc_type = doc_type
+        self.reasons = reasons
+
+
+# --- Normalization ---
+def _is_missing(value: str | None) -> bool:
+    return value is None or value.strip().lower() in ("", "n/a", "null", "none")
+
+
+def _clean(value: str | None) -> str:
+    """Collapse whitespace; empty and "null"-like values become "N/A"."""
+    return NOT_AVAILABLE if _is_missing(value) else " ".join(value.split())
+
+
+def parse_date(value: str | None) -> date | None:
+    """The date in any of DATE_FORMATS, or None if it is missing or can't be parsed."""
+    if _is_missing(value):
+        return None
+    value = " ".join(value.split())
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def normalize_date(value: str | None) -> str:
+    """ISO 8601 date; a value that can't be parsed is kept as it is, so the user can still see and fix it."""
+    parsed = parse_date(value)
+    return parsed.isoformat() if parsed else _clean(value)
+
+
+def normalize_vin(value: str | None) -> str:
+    if _is_missing(value):
+        return NOT_AVAILABLE
+    return "".join(value.upper().split()).translate(VIN_LOOKALIKES)
+
+
+def normalize_passport(passport: PassportData) -> PassportData:
+    return PassportData(
+        given_names=_clean(passport.given_names),
+        surnames=_clean(passport.surnames),
+        date_of_birth=normalize_date(passport.date_of_birth),
+        passport_number=_clean(passport.passport_number).upper().replace(" ", ""),
+        date_of_issue=normalize_date(passport.date_of_issue),
+        date_of_expiry=normalize_date(passport.date_of_expiry),
+    )
+
+
+def normalize_vehicle_document(vehicle_document: VehicleDocumentData) -> VehicleDocumentData:
+    return VehicleDocumentData(
+        vin=normalize_vin(vehicle_document.vin),
+        vehicle_make_and_model=_clean(vehicle_document.model),
+        registration_number=_clean(vehicle_document.reg_number).upper().replace(" ", ""),
+        document_series_and_number=_clean(vehicle_document.doc_number).upper(),
+    )
+
+
+# --- Checks ---
+def check_passport(passport: PassportData, today: date | None = None) -> tuple[list[str], list[str]]:
+    """
+    Return (errors, warnings) of normalized passport data.
+    Errors reject the photo before the user is asked to confirm, warnings are shown with the data.
+    """
+    today = today or date.today()
+    errors, warnings = [], []
+
+    missing = {field for field in PASSPORT_LABELS if _is_missing(getattr(passport, field))}
+    if unread := [PASSPORT_LABELS[field] for field in REQUIRED_PASSPORT_FIELDS if field in missing]:
+        errors.append(f"Couldn't read the {' and '.join(unread)}.")
+
+    birth = parse_date(passport.date_of_birth)
+    issue = parse_date(passport.date_of_issue)
+    expiry = parse_date(passport.date_of_expiry)
+    if birth and (birth > today or birth.year < today.year - MAX_AGE_YEARS):
+        errors.append(f"The date of birth {birth.isoformat()} can't be right.")
+    if expiry and expiry < today:
+        errors.append(f"The passport expired on {expiry.isoformat()}, a valid passport is needed for the policy.")
+
+    for field, parsed in (("date_of_birth", birth), ("date_of_issue", issue), ("date_of_expiry", expiry)):
+        if field in missing:
+            warnings.append(f"The {PASSPORT_LABELS[field]} wasn't recognized.")
+        elif parsed is None:
+            warnings.append(f"The {PASSPORT_LABELS[field]} isn't a valid date.")
+    if issue and (issue > today or (expiry and issue > expiry) or (birth and issue < birth)):
+        warnings.append("The date of issue doesn't match the other dates.")
+    if "passport_number" not in missing and not PASSPORT_NUMBER_RE.match(passport.passport_number):
+        warnings.append("The passport number looks unusual.")
+    return errors, warnings
+
+
+def check_vehicle_document(vehicle_document: VehicleDocumentData) -> tuple[list[str], list[str]]:
+    """
+    Return (errors, warnings) of normalized vehicle document data.
+    A VIN check digit is mandatory in North America only, so a wrong one is a warning, not an error.
+    """
+    errors, warnings = [], []
+    vin = vehicle_document.vin
+    if _is_missing(vin):
+        errors.append("Couldn't read the VIN.")
+    elif not VIN_RE.match(vin):
+        errors.append(f"The VIN {vin} isn't valid: it has 17 letters and digits, without I, O and Q.")
+    elif not is_valid_vin(vin):
+        warnings.append("The VIN check digit doesn't match, please check the VIN carefully.")
+
+    for field in ("model", "reg_number", "doc_number"):
+        if _is_missing(getattr(vehicle_document, field)):
+            warnings.append(f"The {VEHICLE_LABELS[field]} wasn't recognized.")
+    return errors, warnings
+
+
+def validate_document(doc_type: str, document: PassportData | VehicleDocumentData, today: date | None = None):
+    """
+    Return the normalized "passport" or "vehicle" document, with the warnings to show with it.
+    :raises InvalidDocument: If the data has errors, so the user doesn't have to reject it.
+    """
+    if doc_type == "passport":
+        document = normalize_passport(document)
+        errors, warnings = check_passport(document, today)
+    else:
+        document = normalize_vehicle_document(document)
+        errors, warnings = check_vehicle_document(document)
+    if errors:
+        raise InvalidDocument(doc_type, errors)
+    document.warnings = warnings
+    return document
@@ -0,0 +1,63 @@
+from typing import Any
+
+from aiogram.fsm.context import FSMContext
+from pydantic import BaseModel, ConfigDict, PrivateAttr
+
+from app.models import PassportData, VehicleDocumentData
+
+
+# --- Session Class ---
+class Session(BaseModel):
+    """
+    Typed FSM data of one chat, loaded once per update by SessionMiddleware and passed to handlers as `session`.
+    Assigning a field marks it dirty and only dirty fields are written back.
+    Texts shown to the user are not stored: they are rendered from the documents when needed.
+    """
+
+    model_config = ConfigDict(extra="ignore")
+
+    passport_data: PassportData | None = None
+    vehicle_document_data: VehicleDocumentData | None = None
+    is_changing: bool = False
+    msg_to_edit_id: int | None = None  # The message whose "Cancel" button is removed on the next photo
+    ocr_job_id: str | None = None  # The queued OCR job the chat is waiting for
+    fleet_vehicles: list[VehicleDocumentData] = []  # Recognized vehicles of a /fleet batch
+
+    _dirty: set[str] = PrivateAttr(default_factory=set)
+    _cleared: bool = PrivateAttr(default=False)
+
+    def __setattr__(self, name: str, value: Any):
+        if name in type(self).model_fields:
+            self._dirty.add(name)
+        super().__setattr__(name, value)
+
+    @property
+    def is_dirty(self) -> bool:
+        return bool(self._dirty) or self._cleared
+
+    def store_document(self, doc_type: str, document: PassportData | VehicleDocumentData):
+        """Keep a recognized "passport" or "vehicle" document."""
+        if doc_type == "passport":
+            self.passport_data = document
+        else:
+            self.vehicle_document_data = document
+
+    def clear(self):
+        """Forget all data, the storage is emptied on `save`."""
+        for name, field in type(self).model_fields.items():
+            super().__setattr__(name, field.get_default(call_default_factory=True))
+        self._dirty.clear()
+        self._cleared = True
+
+    @classmethod
+    async def load(cls, state: FSMContext) -> "Session":
+        return cls.model_validate(await state.get_data())
+
+    async def save(self, state: FSMContext):
+        """Write the fields changed since `load` in one round trip; `state` must use SessionStorage."""
+        if not self.is_dirty:
+            return
+        fields = self.model_dump(include=self._dirty, by_alias=True, mode="json")
+        await state.storage.save_fields(state.key, fields, replace=self._cleared)
+        self._dirty.clear()
+        self._cleared = False
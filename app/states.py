@@ -7,3 +7,8 @@ class Form(StatesGroup):
     waiting_for_summary_confirmation = State()
     waiting_for_price_confirmation = State()
     waiting_for_change_choice = State()
+
+
+class FleetForm(StatesGroup):
+    waiting_for_passport = State()
+    waiting_for_vehicle_documents = State()
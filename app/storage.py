@@ -0,0 +1,150 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import Any, AsyncGenerator, Mapping
+
+import orjson
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StateType, StorageKey
+from aiogram.fsm.storage.redis import Redis, RedisEventIsolation, RedisStorage
+from redis.asyncio.lock import Lock
+
+from app.config import s
+
+# Writes FSM data fields and gives the hash the remaining TTL of the chat's state, so the data never outlives it.
+# KEYS: data hash, state key. ARGV: 1 to drop the other fields, TTL in ms if there is no state (0: none), fields.
+SAVE_FIELDS_SCRIPT = """
+if ARGV[1] == '1' then
+    redis.call('DEL', KEYS[1])
+end
+if #ARGV > 2 then
+    redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+    local ttl = redis.call('PTTL', KEYS[2])
+    if ttl < 0 then
+        ttl = tonumber(ARGV[2])
+    end
+    if ttl > 0 then
+        redis.call('PEXPIRE', KEYS[1], ttl)
+    end
+end
+return 0
+"""
+
+
+def _decode(value: bytes | str) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _milliseconds(ttl: int | float | timedelta | None) -> int:
+    if isinstance(ttl, timedelta):
+        ttl = ttl.total_seconds()
+    return int(ttl * 1000) if ttl else 0
+
+
+# --- SessionStorage Class ---
+class SessionStorage(RedisStorage):
+    """
+    RedisStorage that keeps the FSM data of a chat in a hash with one orjson-encoded field per key,
+    so a handler's changes are written with a single HSET instead of re-serializing the whole dict.
+
+    State and data expire together: entering a state gives both keys the TTL of that state from `state_ttls`
+    (`state_ttl` for the others), and data written later inherits the remaining TTL of the state.
+    """
+
+    def __init__(
+        self, redis: Redis, state_ttls: Mapping[str, int | float | timedelta] | None = None, **kwargs: Any
+    ) -> None:
+        super().__init__(redis, **kwargs)
+        self.state_ttls = dict(state_ttls or {})
+        self._save_fields_script = redis.register_script(SAVE_FIELDS_SCRIPT)
+
+    def _session_key(self, key: StorageKey) -> str:
+        return self.key_builder.build(key, "session")
+
+    def _save_fields(self, key: StorageKey, fields: Mapping[str, Any], replace: bool, client=None):
+        args = [int(replace), _milliseconds(self.data_ttl)]
+        for name, value in fields.items():
+            args += [name, orjson.dumps(value)]
+        return self._save_fields_script(
+            keys=[self._session_key(key), self.key_builder.build(key, "state")], args=args, client=client
+        )
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        """Set the state and restart the TTL of the state and the data with the TTL of the new state."""
+        if state is None:
+            await self.redis.delete(self.key_builder.build(key, "state"))
+            return
+
+        state_name = state.state if isinstance(state, State) else state
+        ttl = _milliseconds(self.state_ttls.get(state_name, self.state_ttl))
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self.key_builder.build(key, "state"), state_name, px=ttl or None)
+            if ttl:
+                pipe.pexpire(self._session_key(key), ttl)
+            await pipe.execute()
+
+    @staticmethod
+    def _load_fields(fields: Mapping) -> dict[str, Any]:
+        return {_decode(name): orjson.loads(value) for name, value in fields.items()}
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return self._load_fields(await self.redis.hgetall(self._session_key(key)))
+
+    async def get_value(self, storage_key: StorageKey, dict_key: str, default: Any | None = None) -> Any | None:
+        value = await self.redis.hget(self._session_key(storage_key), dict_key)
+        return default if value is None else orjson.loads(value)
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await self.save_fields(key, data, replace=True)
+
+    async def update_data(self, key: StorageKey, data: Mapping[str, Any]) -> dict[str, Any]:
+        """Merge `data` into the stored data and read the result back in one round trip."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if data:
+                await self._save_fields(key, data, replace=False, client=pipe)  # Queued in the pipeline
+            pipe.hgetall(self._session_key(key))
+            *_, fields = await pipe.execute()
+        return self._load_fields(fields)
+
+    async def save_fields(self, key: StorageKey, fields: Mapping[str, Any], replace: bool = False) -> None:
+        """
+        Write `fields` without reading anything back, in one round trip.
+        :param replace: Drop the fields that are not in `fields`.
+        """
+        await self._save_fields(key, fields, replace)
+
+
+# --- ChatEventIsolation Class ---
+class ChatEventIsolation(RedisEventIsolation):
+    """
+    RedisEventIsolation that can also hold a chat's lock for background work of any length, e.g. a fleet upload.
+    Updates keep the lock timeout, so a stuck handler can't block its chat for good.
+    """
+
+    @asynccontextmanager
+    async def hold(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        """Take the same lock as the chat's updates and renew its timeout until the block is left."""
+        redis_key = self.key_builder.build(key, "lock")
+        async with self.redis.lock(name=redis_key, **self.lock_kwargs, lock_class=Lock) as lock:
+            renewal = asyncio.create_task(self._renew(lock))
+            try:
+                yield None
+            finally:
+                renewal.cancel()
+
+    @staticmethod
+    async def _renew(lock: Lock):
+        """Restart the lock timeout every third of it."""
+        if lock.timeout is None:
+            return
+        while True:
+            await asyncio.sleep(lock.timeout / 3)
+            await lock.reacquire()
+
+
+# --- Shared Redis connection for FSM storage and caches ---
+redis = Redis.from_url(s.redis_url)
+storage = SessionStorage(redis=redis, state_ttls=s.session_state_ttls, state_ttl=s.session_ttl, data_ttl=s.session_ttl)
+
+# --- Serialize updates of one chat across all workers ---
+events_isolation = ChatEventIsolation(redis=redis, lock_kwargs={"timeout": s.event_lock_timeout})
@@ -0,0 +1,42 @@
+import string
+
+# --- Machine-readable zone (ICAO 9303) ---
+MRZ_WEIGHTS = (7, 3, 1)
+MRZ_VALUES = {char: value for value, char in enumerate(string.digits + string.ascii_uppercase)} | {"<": 0}
+
+
+def mrz_check_digit(field: str) -> str:
+    """
+    Check digit of an MRZ field: characters weighted 7, 3, 1 in turn, summed modulo 10.
+    :raises KeyError: If the field has a character the MRZ doesn't use.
+    """
+    return str(sum(MRZ_VALUES[char] * MRZ_WEIGHTS[i % 3] for i, char in enumerate(field)) % 10)
+
+
+# --- Vehicle identification number (ISO 3779, North American check digit) ---
+VIN_WEIGHTS = (8, 7, 6, 5, 4, 3, 2, 10, 0, 9, 8, 7, 6, 5, 4, 3, 2)
+VIN_VALUES = dict(zip(string.digits, range(10), strict=True)) | {
+    char: value
+    for chars, start in (("ABCDEFGH", 1), ("JKLMN", 1), ("PR", 7), ("STUVWXYZ", 2))
+    for value, char in enumerate(chars, start)
+}
+
+
+def vin_check_digit(vin: str) -> str:
+    """
+    Check digit of a 17-character VIN, "0"-"9" or "X" for 10.
+    :raises KeyError: If the VIN has a character VINs don't use (I, O, Q or not alphanumeric).
+    """
+    remainder = sum(VIN_VALUES[char] * weight for char, weight in zip(vin, VIN_WEIGHTS, strict=True)) % 11
+    return "X" if remainder == 10 else str(remainder)
+
+
+def is_valid_vin(vin: str) -> bool:
+    """
+    True if `vin` is 17 VIN characters with a correct check digit in position 9.
+    The check digit is mandatory in North America only, so a False doesn't mean the VIN is fake.
+    """
+    try:
+        return len(vin) == 17 and vin[8] == vin_check_digit(vin)
+    except KeyError:
+        return False
@@ -1,18 +1,79 @@
+import hashlib
+import re
+from tempfile import SpooledTemporaryFile
+
+from app.config import s
+from app.metrics import track_call
 from app.models import PassportData, VehicleDocumentData
 
+HTML_TAG_RE = re.compile(r"<(/?)([a-zA-Z-]+)[^<>]*>")
+PARTIAL_TAG_RE = re.compile(r"<[^<>]*$")
+PARTIAL_ENTITY_RE = re.compile(r"&#?\w*$")
+
+
+class DownloadedFile(SpooledTemporaryFile):
+    """
+    Download destination that is kept in memory up to `max_size` bytes and moved to a temporary file above it.
+    The sha256 of the contents is computed from the chunks as they are written, so the file is never read twice.
+    """
+
+    def __init__(self, name: str, max_size: int):
+        super().__init__(max_size=max_size)
+        self._name = name
+        self._sha256 = hashlib.sha256()
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def content_hash(self) -> str:
+        return self._sha256.hexdigest()
+
+    def write(self, data):
+        self._sha256.update(data)
+        return super().write(data)
+
 
 async def download_user_photo(photo, bot, name: str):
     """
     Download the user's photo from the message and return it as a file-like object.
     The file will be saved with the provided name.
+    Telegram sends it in chunks that are written straight into a DownloadedFile, without an intermediate buffer.
     """
-    file_info = await bot.get_file(photo.file_id)
-    downloaded = await bot.download_file(file_info.file_path)
+    destination = DownloadedFile(name, max_size=s.download_spool_size)
+    with track_call("telegram", "download_file"):
+        file_info = await bot.get_file(photo.file_id)
+        await bot.download_file(file_info.file_path, destination=destination)
+    return destination
+
+
+# --- Function to hash downloaded file contents ---
+def get_content_hash(file) -> str:
+    """Return the sha256 hex digest of the file, reusing the one computed during the download if there is one."""
+    if isinstance(file, DownloadedFile):
+        return file.content_hash
+    file.seek(0)
+    content_hash = hashlib.file_digest(file, "sha256").hexdigest()
+    file.seek(0)
+    return content_hash
 
-    if not hasattr(downloaded, "name"):
-        downloaded.name = name
 
-    return downloaded
+# --- Function to make a partially received HTML text valid ---
+def get_html_safe_prefix(text: str) -> str:
+    """
+    Cut an unfinished tag or entity at the end of the text and close the tags left open,
+    so a policy that is still being generated can be shown with parse_mode="HTML".
+    """
+    text = PARTIAL_ENTITY_RE.sub("", PARTIAL_TAG_RE.sub("", text))
+    open_tags = []
+    for match in HTML_TAG_RE.finditer(text):
+        is_closing, tag = match.group(1), match.group(2).lower()
+        if not is_closing:
+            open_tags.append(tag)
+        elif tag in open_tags:
+            del open_tags[len(open_tags) - 1 - open_tags[::-1].index(tag)]
+    return text + "".join(f"</{tag}>" for tag in reversed(open_tags))
 
 
 # --- Function to clean text by removing the confirmation question ---
@@ -20,6 +81,15 @@ def get_clean_text(original_text: str) -> str:
     return original_text.rsplit("\n\n🟩 Is this data correct?")[0]
 
 
+# --- Function to list what the user should double-check ---
+def get_warnings_text(*documents: PassportData | VehicleDocumentData) -> str:
+    """Warning lines of the validated documents, preceded by an empty line, or "" if there are none."""
+    warnings = [warning for document in documents for warning in document.warnings]
+    if not warnings:
+        return ""
+    return "\n" + "".join(f"⚠️ {warning}\n" for warning in warnings)
+
+
 # --- Function to get passport extracted text ---
 async def get_passport_extracted_text(mindee_data: PassportData | None) -> str:
     extracted_text = (
@@ -29,7 +99,8 @@ async def get_passport_extracted_text(mindee_data: PassportData | None) -> str:
         f"Date of birth: {mindee_data.date_of_birth}\n"
         f"Passport series/number: {mindee_data.passport_number}\n"
         f"Date of issue: {mindee_data.date_of_issue}\n"
-        f"Date of expiry: {mindee_data.date_of_expiry}\n\n"
+        f"Date of expiry: {mindee_data.date_of_expiry}\n"
+        f"{get_warnings_text(mindee_data)}\n"
         f"🟩 Is this data correct?"
     )
 
@@ -43,6 +114,7 @@ async def get_vehicle_extracted_text(mindee_data: VehicleDocumentData | None) ->
         f"Model: {mindee_data.model}\n"
         f"Registration Number: {mindee_data.reg_number}\n"
         f"Document Number: {mindee_data.doc_number}\n"
+        f"{get_warnings_text(mindee_data)}"
         f"\n🟩 Is this data correct?"
     )
     return extracted_text
@@ -61,7 +133,8 @@ async def get_summary_text(passport_data, vehicle_data):
         f"🚗 Vehicle data:\n"
         f"  - VIN: {vehicle_data.vin}\n"
         f"  - Model: {vehicle_data.model}\n"
-        f"  - Registration Number: {vehicle_data.reg_number}\n\n"
+        f"  - Registration Number: {vehicle_data.reg_number}\n"
+        f"{get_warnings_text(passport_data, vehicle_data)}\n"
         f"🟩 Is this data correct?"
     )
     return summary_text
@@ -0,0 +1,51 @@
+import asyncio
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from app.config import s
+from app.metrics import handle_metrics
+
+
+class DrainingRequestHandler(SimpleRequestHandler):
+    """
+    Webhook handler that answers Telegram immediately and processes the update in the background.
+    On shutdown it waits for in-flight updates to finish before the bot session is closed.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: str | None = None):
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, secret_token=secret_token)
+
+    async def close(self) -> None:
+        if self._background_feed_update_tasks:
+            await asyncio.wait(self._background_feed_update_tasks, timeout=s.webhook_shutdown_timeout)
+        await super().close()
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    """Liveness probe for the load balancer."""
+    return web.json_response({"status": "ok"})
+
+
+def create_monitoring_app() -> web.Application:
+    """Application with only `/health` and `/metrics`, served next to long polling."""
+    app = web.Application()
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    return app
+
+
+def create_webhook_app(
+    dispatcher: Dispatcher, bot: Bot, path: str = s.webhook_path, secret: str = s.webhook_secret
+) -> web.Application:
+    """
+    Build the aiohttp application serving Telegram updates on `path`, `/health` and `/metrics`.
+    Dispatcher startup and shutdown hooks run together with the application.
+    """
+    app = web.Application()
+    DrainingRequestHandler(dispatcher, bot, secret_token=secret or None).register(app, path=path)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    setup_application(app, dispatcher, bot=bot)
+    return app
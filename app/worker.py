@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import BaseEventIsolation, StorageKey
+from prometheus_client import start_http_server
+
+import app.keyboard as kb
+from app.config import s
+from app.metrics import OCR_JOB_WAIT, OCR_JOBS
+from app.processors import PhotoProcessor
+from app.services.local_ocr import local_reader
+from app.services.mindee import mindee_registry
+from app.services.ocr_executor import ocr_executor
+from app.services.ocr_queue import OCRJob, OCRQueue, ocr_queue
+from app.services.preprocessing import image_preprocessor
+from app.session import Session
+from app.storage import SessionStorage, events_isolation, storage
+
+logger = logging.getLogger(__name__)
+
+FAILED_TEXT = "🛑 An unexpected error occurred. Please try again."
+# The user blocked the bot or the message is gone: showing the outcome again would fail the same way
+UNDELIVERABLE_ERRORS = (TelegramBadRequest, TelegramForbiddenError)
+
+
+# --- OCRWorker Class ---
+class OCRWorker:
+    """
+    Takes OCR jobs from the queue and delivers each result by editing the job's "processing" message.
+    Runs up to `concurrency` jobs at once; Mindee calls are additionally limited by the OCR executor.
+    """
+
+    def __init__(
+        self,
+        queue: OCRQueue,
+        bot: Bot,
+        storage: SessionStorage,
+        events_isolation: BaseEventIsolation,
+        concurrency: int,
+        consumer: str | None = None,
+    ):
+        self.queue = queue
+        self.bot = bot
+        self.storage = storage
+        self.events_isolation = events_isolation
+        self.concurrency = concurrency
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self._tasks: set[asyncio.Task] = set()
+
+    async def run(self):
+        """Process jobs until cancelled. Unfinished jobs stay pending and are claimed by another worker."""
+        await self.queue.ensure_group()
+        logger.info("OCR worker %s started", self.consumer)
+        while True:
+            await self.poll()
+
+    async def poll(self, block: int = 5000):
+        """Start jobs for the free slots, waiting up to `block` milliseconds for new jobs to arrive."""
+        free_slots = self.concurrency - len(self._tasks)
+        if free_slots <= 0:
+            await asyncio.wait(self._tasks, return_when=asyncio.FIRST_COMPLETED)
+            return
+
+        jobs = await self.queue.claim_stale(self.consumer, s.ocr_job_claim_idle * 1000, free_slots)
+        if not jobs:
+            jobs = await self.queue.read(self.consumer, free_slots, block)
+        for entry_id, job in jobs:
+            task = asyncio.create_task(self._run_job(entry_id, job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def drain(self, timeout: float | None = None):
+        """Wait for the jobs that are already running, at most `timeout` seconds."""
+        if self._tasks:
+            await asyncio.wait(self._tasks, timeout=timeout)
+
+    async def _run_job(self, entry_id: str, job: OCRJob):
+        """
+        Acknowledge the job only once the user has its result or an error message.
+        A job that was cancelled, or whose outcome could not be shown, stays pending and is claimed again,
+        up to `s.ocr_job_max_deliveries` times; then it is moved to the dead-letter stream without another OCR call.
+        """
+        deliveries = await self.queue.deliveries(entry_id)
+        if deliveries > s.ocr_job_max_deliveries:
+            logger.error(
+                "OCR job %s was delivered %d times, moving it to %s", job.job_id, deliveries, self.queue.dead_stream
+            )
+            await self.queue.dead_letter(entry_id, job)
+            OCR_JOBS.labels(job.doc_type, "dead").inc()
+            return
+
+        OCR_JOB_WAIT.observe(max(0.0, time.time() - job.enqueued_at))
+        try:
+            await self.process(job)
+        except Exception as e:
+            logger.exception("Error processing OCR job %s: %s", job.job_id, e)
+            try:
+                await self.fail(job)
+            except Exception as e:
+                logger.exception("Error reporting failed OCR job %s: %s", job.job_id, e)
+                return
+        await self.queue.ack(entry_id)
+
+    async def process(self, job: OCRJob):
+        """
+        Recognize the photo, store the result in the user's FSM data and show it.
+        The result is dropped if the chat no longer waits for this job, e.g. after /cancel or a newer photo.
+        """
+        text, success, data_obj = await PhotoProcessor.recognize_photo(job.photo, self.bot, job.doc_type)
+
+        key = StorageKey(bot_id=self.bot.id, chat_id=job.chat_id, user_id=job.user_id)
+        state = FSMContext(storage=self.storage, key=key)
+        # Same lock as the chat's updates, so the result can't interleave with a handler of this chat
+        async with self.events_isolation.lock(key):
+            session = await Session.load(state)
+            if session.ocr_job_id != job.job_id:
+                OCR_JOBS.labels(job.doc_type, "superseded").inc()
+                await self._deliver(job, self.bot.delete_message)
+                return
+
+            session.ocr_job_id = None
+            if success:
+                session.store_document(job.doc_type, data_obj)
+            await session.save(state)
+            await self._deliver(
+                job, self.bot.edit_message_text, text, reply_markup=kb.document_confirm_kb if success else None
+            )
+        OCR_JOBS.labels(job.doc_type, "recognized" if success else "failed").inc()
+
+    async def fail(self, job: OCRJob):
+        """Tell the user the photo could not be processed and stop waiting for this job."""
+        key = StorageKey(bot_id=self.bot.id, chat_id=job.chat_id, user_id=job.user_id)
+        state = FSMContext(storage=self.storage, key=key)
+        async with self.events_isolation.lock(key):
+            session = await Session.load(state)
+            if session.ocr_job_id != job.job_id:
+                await self._deliver(job, self.bot.delete_message)
+                return
+            session.ocr_job_id = None
+            await session.save(state)
+            await self._deliver(job, self.bot.edit_message_text, FAILED_TEXT)
+        OCR_JOBS.labels(job.doc_type, "error").inc()
+
+    @staticmethod
+    async def _deliver(job: OCRJob, method, *args, **kwargs):
+        """Call a Bot method on the job's message; errors that would repeat on every retry are only logged."""
+        try:
+            await method(*args, chat_id=job.chat_id, message_id=job.message_id, **kwargs)
+        except UNDELIVERABLE_ERRORS as e:
+            logger.warning("OCR job %s can't be delivered: %s", job.job_id, e)
+
+
+async def main():
+    bot = Bot(token=s.telegram_bot_token)
+    worker = OCRWorker(ocr_queue, bot, storage, events_isolation, s.ocr_worker_concurrency)
+    start_http_server(s.worker_metrics_port)
+    mindee_registry.warm_up(
+        [
+            (s.mindee_passport_api_key, s.model_passport_id),
+            (s.mindee_vehicle_document_api_key, s.model_vehicle_document_id),
+        ]
+    )
+    # `docker stop` sends SIGTERM: stop taking jobs and finish the running ones, like on Ctrl+C
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    try:
+        await worker.run()
+    finally:
+        # Jobs still running after the timeout are cancelled unacknowledged and claimed by another worker
+        await worker.drain(timeout=s.ocr_worker_shutdown_timeout)
+        ocr_executor.shutdown()
+        image_preprocessor.shutdown()
+        local_reader.shutdown()
+        mindee_registry.close()
+        await bot.session.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("OCR worker stopped")
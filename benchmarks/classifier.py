@@ -0,0 +1,68 @@
+"""
+Accuracy and latency of the local document-type classifier.
+
+Usage:
+    python -m benchmarks.classifier [--per-class 100] [--seed 0] [--fixtures DIR]
+
+Without --fixtures the photos are generated by benchmarks.document_fixtures.
+A real fixture set is laid out as DIR/passport/* and DIR/vehicle/*.
+Only passports are detected with confidence, other photos are "unknown" and go to Mindee as they are:
+what matters is passport recall and that no vehicle document is ever taken for a passport.
+"""
+
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from app.services.classifier import detect_document_type
+from benchmarks.document_fixtures import generate_documents, load_documents
+
+LABELS = ("passport", "vehicle")
+PREDICTIONS = ("passport", "unknown")
+
+
+def classify_all(documents: list[tuple[str, bytes]]) -> tuple[dict, list[float]]:
+    """Return the confusion matrix {(actual, predicted): count} and the time spent on each photo."""
+    confusion = {(actual, predicted): 0 for actual in LABELS for predicted in PREDICTIONS}
+    timings = []
+    for label, data in documents:
+        started = time.perf_counter()
+        predicted = detect_document_type(data)
+        timings.append(time.perf_counter() - started)
+        confusion[label, predicted] += 1
+    return confusion, timings
+
+
+def report(confusion: dict, timings: list[float]):
+    print(f"{'actual / predicted':<20}" + "".join(f"{label:>10}" for label in PREDICTIONS))
+    for actual in LABELS:
+        print(f"{actual:<20}" + "".join(f"{confusion[actual, predicted]:>10}" for predicted in PREDICTIONS))
+
+    passports = sum(confusion["passport", predicted] for predicted in PREDICTIONS)
+    vehicles = sum(confusion["vehicle", predicted] for predicted in PREDICTIONS)
+    recall = confusion["passport", "passport"] / passports if passports else 0.0
+    false_passports = confusion["vehicle", "passport"] / vehicles if vehicles else 0.0
+    print(f"\npassport recall={recall:.3f}  vehicle documents taken for passports={false_passports:.3f}")
+
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) >= 20 else timings[-1]
+    print(
+        f"\nlatency    mean={statistics.mean(timings) * 1e3:.1f} ms  "
+        f"p50={statistics.median(timings) * 1e3:.1f} ms  p95={p95 * 1e3:.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--per-class", type=int, default=100, help="synthetic photos of each document type")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic photos")
+    parser.add_argument("--fixtures", type=Path, help="directory with real passport/ and vehicle/ photos")
+    args = parser.parse_args()
+
+    documents = load_documents(args.fixtures) if args.fixtures else generate_documents(args.per_class, args.seed)
+    report(*classify_all(documents))
+
+
+if __name__ == "__main__":
+    main()
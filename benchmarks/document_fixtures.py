@@ -0,0 +1,163 @@
+"""
+Synthetic document photos for benchmarks that have no real fixture set at hand.
+
+Passports are drawn as a data page with a two-line machine-readable zone (MRZ),
+vehicle documents as a registration certificate with labelled fields and a table.
+MRZ and VIN check digits are correct, so the data passes validation and the MRZ can be read by the local OCR.
+Each image is then "photographed": placed on a background, slightly rotated, blurred and JPEG-compressed.
+"""
+
+import random
+import string
+from datetime import date
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from app.models import PassportData, VehicleDocumentData
+from app.utils.checksums import mrz_check_digit, vin_check_digit
+
+SURNAMES = ["DOE", "SHEVCHENKO", "KOVALENKO", "SMITH", "BONDARENKO", "MELNYK", "GARCIA"]
+GIVEN_NAMES = ["JOHN", "OLENA", "TARAS", "MARIA", "ANDRII", "SOFIA", "IVAN"]
+MAKES = ["TOYOTA COROLLA", "TESLA MODEL S", "VOLKSWAGEN PASSAT", "SKODA OCTAVIA", "BMW X5", "RENAULT MEGANE"]
+VIN_ALPHABET = "ABCDEFGHJKLMNPRSTUVWXYZ0123456789"
+
+
+def _font(size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.load_default(size=size)
+
+
+def _fit_font(draw: ImageDraw.ImageDraw, text: str, width: int) -> ImageFont.FreeTypeFont:
+    """Largest font at which `text` fits in `width` pixels."""
+    size = 10
+    while draw.textlength(text, font=_font(size + 1)) <= width:
+        size += 1
+    return _font(size)
+
+
+def make_vin(rng: random.Random) -> str:
+    """Random VIN with a correct check digit."""
+    vin = "".join(rng.choice(VIN_ALPHABET) for _ in range(17))
+    return vin[:8] + vin_check_digit(vin) + vin[9:]
+
+
+def _random_date(rng: random.Random, first_year: int, last_year: int) -> date:
+    return date(rng.randint(first_year, last_year), rng.randint(1, 12), rng.randint(1, 28))
+
+
+def make_passport(rng: random.Random) -> tuple[Image.Image, PassportData]:
+    """A passport data page and the data its MRZ holds (the MRZ has no date of issue)."""
+    surname, given_name = rng.choice(SURNAMES), rng.choice(GIVEN_NAMES)
+    number = "".join(rng.choice(string.ascii_uppercase) for _ in range(2)) + str(rng.randint(100000, 999999))
+    birth, expiry = _random_date(rng, 1950, 2005), _random_date(rng, 2027, 2035)
+    page = Image.new("RGB", (1250, 880), (rng.randint(225, 245), rng.randint(225, 240), rng.randint(200, 230)))
+    draw = ImageDraw.Draw(page)
+
+    draw.rectangle((60, 140, 360, 540), fill=(150, 150, 150))  # holder photo
+    draw.text((60, 50), "PASSPORT / ПАСПОРТ", font=_font(40), fill=(40, 40, 90))
+    fields = [
+        ("Surname", surname),
+        ("Given names", given_name),
+        ("Date of birth", birth.strftime("%d %m %Y")),
+        ("Passport No.", number),
+        ("Date of expiry", expiry.strftime("%d %m %Y")),
+    ]
+    for i, (label, value) in enumerate(fields):
+        draw.text((420, 150 + i * 75), label, font=_font(20), fill=(90, 90, 90))
+        draw.text((420, 175 + i * 75), value, font=_font(30), fill=(20, 20, 20))
+
+    line_1 = f"P<UKR{surname}<<{given_name}".ljust(44, "<")
+    mrz_number, mrz_birth, mrz_expiry = number.ljust(9, "<"), birth.strftime("%y%m%d"), expiry.strftime("%y%m%d")
+    line_2 = (
+        f"{mrz_number}{mrz_check_digit(mrz_number)}UKR{mrz_birth}{mrz_check_digit(mrz_birth)}"
+        f"M{mrz_expiry}{mrz_check_digit(mrz_expiry)}{'<' * 14}<"
+    )
+    line_2 += mrz_check_digit(line_2[:10] + line_2[13:20] + line_2[21:43])
+    font = _fit_font(draw, line_1, 1130)
+    draw.text((60, 690), line_1, font=font, fill=(15, 15, 15))
+    draw.text((60, 770), line_2, font=font, fill=(15, 15, 15))
+
+    passport = PassportData(
+        given_names=given_name,
+        surnames=surname,
+        date_of_birth=birth.isoformat(),
+        passport_number=number,
+        date_of_expiry=expiry.isoformat(),
+    )
+    return page, passport
+
+
+def make_passport_page(rng: random.Random) -> Image.Image:
+    return make_passport(rng)[0]
+
+
+def make_vehicle_document(rng: random.Random) -> tuple[Image.Image, VehicleDocumentData]:
+    """A vehicle registration certificate and the data printed on it."""
+    page = Image.new("RGB", (1250, 880), (rng.randint(215, 240), rng.randint(225, 245), rng.randint(215, 240)))
+    draw = ImageDraw.Draw(page)
+
+    draw.text((60, 40), "CERTIFICATE OF VEHICLE REGISTRATION", font=_font(38), fill=(30, 60, 30))
+    fields = [
+        ("Registration number", f"AA{rng.randint(1000, 9999)}BB"),
+        ("VIN", make_vin(rng)),
+        ("Make and model", rng.choice(MAKES)),
+        ("Year", str(rng.randint(2000, 2024))),
+        ("Colour", rng.choice(["BLACK", "WHITE", "GREY", "BLUE"])),
+        ("Owner", f"{rng.choice(SURNAMES)} {rng.choice(GIVEN_NAMES)}"),
+        ("Document No.", f"CXE {rng.randint(100000, 999999)}"),
+    ]
+    for i, (label, value) in enumerate(fields):
+        y = 140 + i * 90
+        draw.rectangle((60, y, 1190, y + 80), outline=(60, 60, 60), width=2)
+        draw.text((80, y + 10), label, font=_font(22), fill=(90, 90, 90))
+        draw.text((520, y + 25), value, font=_font(34), fill=(20, 20, 20))
+
+    values = dict(fields)
+    vehicle_document = VehicleDocumentData(
+        vin=values["VIN"],
+        vehicle_make_and_model=values["Make and model"],
+        registration_number=values["Registration number"],
+        document_series_and_number=values["Document No."],
+    )
+    return page, vehicle_document
+
+
+def make_vehicle_document_page(rng: random.Random) -> Image.Image:
+    return make_vehicle_document(rng)[0]
+
+
+def photograph(page: Image.Image, rng: random.Random) -> Image.Image:
+    """Place the page on a background and add rotation, blur and uneven lighting like a phone photo."""
+    background = Image.new("RGB", (1600, 1200), tuple(rng.randint(60, 140) for _ in range(3)))
+    rotated = page.rotate(rng.uniform(-3, 3), expand=True, fillcolor=background.getpixel((0, 0)))
+    background.paste(rotated, (rng.randint(20, 300), rng.randint(20, 250)))
+    photo = background.filter(ImageFilter.GaussianBlur(rng.uniform(0, 1.2)))
+    exposure = rng.uniform(0.85, 1.1)
+    return photo.point(lambda p: min(255, int(p * exposure)))
+
+
+def to_jpeg(image: Image.Image, quality: int = 85) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def generate_documents(per_class: int, seed: int = 0) -> list[tuple[str, bytes]]:
+    """Return [(label, jpeg_bytes)], `per_class` passports and vehicle documents."""
+    rng = random.Random(seed)
+    documents = []
+    for _ in range(per_class):
+        documents.append(("passport", to_jpeg(photograph(make_passport_page(rng), rng))))
+        documents.append(("vehicle", to_jpeg(photograph(make_vehicle_document_page(rng), rng))))
+    return documents
+
+
+def load_documents(directory: Path) -> list[tuple[str, bytes]]:
+    """Load a real fixture set laid out as `directory/passport/*` and `directory/vehicle/*`."""
+    documents = []
+    for label in ("passport", "vehicle"):
+        for path in sorted((directory / label).glob("*")):
+            if path.is_file():
+                documents.append((label, path.read_bytes()))
+    return documents
@@ -0,0 +1,117 @@
+"""
+Peak memory of concurrent photo downloads, from Telegram to the bytes handed to the OCR upload.
+
+Usage:
+    python -m benchmarks.download_memory [--size-kb 2048] [--concurrency 16] [--spool-kb 512]
+
+"buffered" is the previous path: the whole file in a BytesIO, hashed in a second pass.
+"streamed" is download_user_photo: chunks written to a spooled file and hashed on the way.
+Every scenario runs in its own process, so the peak RSS of one doesn't hide the other.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tracemalloc
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetFile
+from aiogram.types import File, PhotoSize
+
+from app.utils.file_utils import download_user_photo, get_content_hash
+
+SCENARIOS = ("buffered", "streamed")
+UPLOAD_TIME = 0.05  # Seconds every upload stays in flight, so that all of them overlap
+
+
+class FakeFileSession(BaseSession):
+    """Telegram session that serves a file of `file_size` random bytes without network access."""
+
+    def __init__(self, file_size: int):
+        super().__init__()
+        self.file_size = file_size
+
+    async def make_request(self, bot, method, timeout=None):
+        assert isinstance(method, GetFile)
+        return File(file_id=method.file_id, file_unique_id=method.file_id, file_size=self.file_size, file_path="p.jpg")
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        for offset in range(0, self.file_size, chunk_size):
+            await asyncio.sleep(0)  # Let the other downloads interleave, like a real network would
+            yield os.urandom(min(chunk_size, self.file_size - offset))
+
+    async def close(self):
+        pass
+
+
+async def buffered(bot: Bot, photo: PhotoSize) -> int:
+    file_info = await bot.get_file(photo.file_id)
+    file = await bot.download_file(file_info.file_path)
+    hashlib.sha256(file.getbuffer()).hexdigest()
+    upload_body = file.read()
+    await asyncio.sleep(UPLOAD_TIME)
+    return len(upload_body)
+
+
+async def streamed(bot: Bot, photo: PhotoSize) -> int:
+    file = await download_user_photo(photo, bot, name="photo.jpg")
+    get_content_hash(file)
+    upload_body = file.read()
+    await asyncio.sleep(UPLOAD_TIME)
+    return len(upload_body)
+
+
+async def run_scenario(scenario: str, size: int, concurrency: int) -> dict:
+    bot = Bot("123:fake", session=FakeFileSession(size))
+    photos = [
+        PhotoSize(file_id=f"photo-{i}", file_unique_id=f"p{i}", width=1280, height=960) for i in range(concurrency)
+    ]
+    download = buffered if scenario == "buffered" else streamed
+
+    tracemalloc.start()
+    sizes = await asyncio.gather(*(download(bot, photo) for photo in photos))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert sizes == [size] * concurrency
+    return {"peak": peak, "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-kb", type=int, default=2048, help="size of every downloaded file")
+    parser.add_argument("--concurrency", type=int, default=16, help="downloads in flight at the same time")
+    parser.add_argument("--spool-kb", type=int, default=512, help="files above this size are spooled to disk")
+    parser.add_argument("--scenario", choices=SCENARIOS, help=argparse.SUPPRESS)  # Set in the child processes
+    args = parser.parse_args()
+
+    if args.scenario:
+        result = asyncio.run(run_scenario(args.scenario, args.size_kb * 1024, args.concurrency))
+        print(json.dumps(result))
+        return
+
+    print(f"{args.concurrency} concurrent downloads of {args.size_kb} KiB, spooled above {args.spool_kb} KiB")
+    for scenario in SCENARIOS:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.download_memory", "--scenario", scenario, *sys.argv[1:]],
+            env={**os.environ, "DOWNLOAD_SPOOL_SIZE": str(args.spool_kb * 1024)},
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        result = json.loads(output)
+        print(
+            f"{scenario:<10} peak traced={result['peak'] / 2**20:>8.1f} MiB  "
+            f"per upload={result['peak'] / args.concurrency / 2**10:>8.0f} KiB  "
+            f"max RSS={result['max_rss'] / 2**20:>8.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
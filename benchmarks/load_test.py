@@ -0,0 +1,344 @@
+"""
+End-to-end load test: virtual users go through the whole conversation against the Dispatcher of app.main,
+with local fakes of the Telegram Bot API, Mindee and OpenAI.
+
+Usage:
+    python -m benchmarks.load_test [--users 100] [--ramp-up 10] [--think-time 0.5,2]
+        [--telegram-latency lognormal:0.05,0.5] [--mindee-latency lognormal:1.5,0.4]
+        [--openai-latency lognormal:0.8,0.5] [--text-ratio 0.3] [--redis-url URL] [--seed 0]
+
+Every user sends /start, a passport photo, confirms it, sends a vehicle document photo, confirms it and the
+summary and buys the policy; some also write free text in between. The photos are generated by
+benchmarks.document_fixtures and go through the real download, preprocessing, classifier and OCR executor;
+only the Mindee HTTP calls are replaced, by a sleep in the OCR thread. Latencies are "const:S",
+"uniform:MIN,MAX" or "lognormal:MEDIAN,SIGMA" in seconds.
+
+Redis is fakeredis unless --redis-url is given. Global rate limits are lifted, otherwise the test would
+only measure the limiter; per-user limits stay. The issued policies are stored in an in-memory SQLite database.
+
+Reported: throughput, p50/p95/p99 of the time from feeding an update to the Dispatcher until it is
+handled, per handler, and the event loop lag, sampled every 10 ms.
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import random
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import patch
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import EditMessageReplyMarkup, EditMessageText, GetFile, SendMessage
+from aiogram.types import Chat, File, Message, Update
+from fakeredis import FakeAsyncRedis
+from redis.asyncio import Redis
+
+from app.config import s
+from benchmarks.document_fixtures import make_passport_page, make_vehicle_document_page, photograph, to_jpeg
+
+LAG_INTERVAL = 0.01  # Seconds between event loop lag samples
+FREE_TEXTS = [
+    "How much does the insurance cost?",
+    "Can I insure a motorcycle too?",
+    "What happens with my passport data?",
+    "Do you cover accidents abroad?",
+]
+
+
+# --- Latency distributions ---
+@dataclass(frozen=True)
+class Latency:
+    kind: str
+    a: float
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        kind, _, params = spec.partition(":")
+        values = [float(value) for value in params.split(",")]
+        if kind not in ("const", "uniform", "lognormal") or len(values) != (1 if kind == "const" else 2):
+            raise argparse.ArgumentTypeError(f"Unknown latency {spec!r}")
+        return cls(kind, *values)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "const":
+            return self.a
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        return rng.lognormvariate(math.log(self.a), self.b)
+
+
+# --- Fakes of the external services ---
+class FakeTelegramSession(BaseSession):
+    """Bot API stand-in: answers every method after a sampled latency and serves the users' photos."""
+
+    def __init__(self, latency: Latency, photos: dict[str, bytes], rng: random.Random):
+        super().__init__()
+        self.latency = latency
+        self.photos = photos
+        self.rng = rng
+        self.calls = Counter()
+        self._message_ids = iter(range(1_000_000, 10**9))
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls[type(method).__name__] += 1
+        await asyncio.sleep(self.latency.sample(self.rng))
+        if isinstance(method, GetFile):
+            size = len(self.photos[method.file_id])
+            return File(file_id=method.file_id, file_unique_id=method.file_id, file_size=size, file_path=method.file_id)
+        if isinstance(method, (SendMessage, EditMessageText, EditMessageReplyMarkup)):
+            message_id = getattr(method, "message_id", None) or next(self._message_ids)
+            chat = Chat(id=method.chat_id, type="private")
+            return Message(
+                message_id=message_id, date=datetime.now(), chat=chat, text=getattr(method, "text", None)
+            ).as_(bot)
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        data = self.photos[url.rsplit("/", 1)[-1]]
+        await asyncio.sleep(self.latency.sample(self.rng))
+        for offset in range(0, len(data), chunk_size):
+            yield data[offset : offset + chunk_size]
+
+    async def close(self):
+        pass
+
+
+class FakeField(str):
+    """A Mindee field: the value as a string, like Mindee's own fields."""
+
+    @property
+    def value(self) -> str:
+        return str(self)
+
+
+def fake_poll(latency: Latency, rng: random.Random):
+    """
+    Replacement of MindeeService._poll: blocks the OCR thread like the upload and polling would together.
+    MindeeService._enqueue is replaced by a job id, so the whole latency is spent here.
+    """
+    passport = {"given_names": "John", "surnames": "Doe", "passport_number": "AB123456", "date_of_birth": "1990-01-01"}
+    vehicle = {"vin": "1HGCM82633A004352", "vehicle_make_and_model": "Tesla Model S", "registration_number": "AA0000BB"}
+
+    def poll(service, job_id, delay):
+        time.sleep(latency.sample(rng))
+        fields = passport if service.params.model_id == s.model_passport_id else vehicle
+        fields = {name: FakeField(value) for name, value in fields.items()}
+        return SimpleNamespace(inference=SimpleNamespace(result=SimpleNamespace(fields=fields)))
+
+    return poll
+
+
+def fake_completion(latency: Latency, rng: random.Random):
+    """Replacement of chat.completions.create for conversational replies and the enhanced policy."""
+
+    async def create(**kwargs):
+        await asyncio.sleep(latency.sample(rng))
+        message = SimpleNamespace(content="📜 <b>Car Insurance Policy</b>\nAll good, see you on the road!")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    return create
+
+
+# --- Synthetic updates ---
+class UpdateFactory:
+    def __init__(self):
+        self._update_ids = iter(range(1, 10**9))
+
+    def _message(self, user_id: int, **fields) -> dict:
+        return {
+            "message_id": next(self._update_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+            **fields,
+        }
+
+    def text(self, user_id: int, text: str) -> Update:
+        return Update(update_id=next(self._update_ids), message=self._message(user_id, text=text))
+
+    def photo(self, user_id: int, file_id: str) -> Update:
+        photo = [{"file_id": file_id, "file_unique_id": file_id, "width": 1600, "height": 1200}]
+        return Update(update_id=next(self._update_ids), message=self._message(user_id, photo=photo))
+
+    def callback(self, user_id: int, data: str) -> Update:
+        callback_query = {
+            "id": str(next(self._update_ids)),
+            "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": self._message(user_id, text="Recognized data\n\n🟩 Is this data correct?"),
+        }
+        return Update(update_id=next(self._update_ids), callback_query=callback_query)
+
+
+class HandlerNames(BaseMiddleware):
+    """Innermost middleware remembering which handler took each update."""
+
+    def __init__(self):
+        self.by_update: dict[int, str] = {}
+
+    async def __call__(self, handler, event, data: dict[str, Any]) -> Any:
+        self.by_update[data["event_update"].update_id] = data["handler"].callback.__name__
+        return await handler(event, data)
+
+
+# --- The load test ---
+class LoadTest:
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, names: HandlerNames, args: argparse.Namespace):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.names = names
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.updates = UpdateFactory()
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.loop_lag: list[float] = []
+        self.completed = 0
+
+    async def feed(self, update: Update):
+        started = time.perf_counter()
+        await self.dispatcher.feed_update(self.bot, update)
+        elapsed = time.perf_counter() - started
+        self.latencies[self.names.by_update.pop(update.update_id, "unhandled")].append(elapsed)
+
+    async def think(self):
+        await asyncio.sleep(self.rng.uniform(*self.args.think_time))
+
+    async def run_user(self, user_id: int):
+        steps = [
+            self.updates.text(user_id, "/start"),
+            self.updates.photo(user_id, f"passport-{user_id}"),
+            self.updates.callback(user_id, "data_ok"),
+            self.updates.photo(user_id, f"vehicle-{user_id}"),
+            self.updates.callback(user_id, "data_ok"),
+            self.updates.callback(user_id, "data_ok"),
+            self.updates.callback(user_id, "confirm_yes"),
+        ]
+        for step in steps:
+            if self.rng.random() < self.args.text_ratio:
+                await self.feed(self.updates.text(user_id, self.rng.choice(FREE_TEXTS)))
+                await self.think()
+            await self.feed(step)
+            await self.think()
+        self.completed += 1
+
+    async def monitor_loop_lag(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(LAG_INTERVAL)
+            self.loop_lag.append(time.perf_counter() - started - LAG_INTERVAL)
+
+    async def run(self) -> float:
+        monitor = asyncio.create_task(self.monitor_loop_lag())
+        started = time.perf_counter()
+        users = []
+        for index in range(self.args.users):
+            users.append(asyncio.create_task(self.run_user(self.args.first_user_id + index)))
+            await asyncio.sleep(self.args.ramp_up / self.args.users)
+        await asyncio.gather(*users)
+        duration = time.perf_counter() - started
+        monitor.cancel()
+        return duration
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def print_report(test: LoadTest, session: FakeTelegramSession, duration: float):
+    updates = sum(len(values) for values in test.latencies.values())
+    print(f"{test.args.users} users, {test.completed} conversations completed in {duration:.1f}s")
+    print(f"{updates} updates, {updates / duration:.1f} updates/s\n")
+    print(f"{'handler':<28} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, values in sorted(test.latencies.items()):
+        row = [percentile(values, q) * 1000 for q in (50, 95, 99, 100)]
+        print(f"{name:<28} {len(values):>6} " + " ".join(f"{value:>8.0f}" for value in row))
+    lag = [percentile(test.loop_lag, q) * 1000 for q in (50, 99, 100)]
+    print(f"\nevent loop lag: p50 {lag[0]:.1f} ms, p99 {lag[1]:.1f} ms, max {lag[2]:.1f} ms")
+    print(f"Bot API calls: {dict(session.calls.most_common())}")
+
+
+async def main(args: argparse.Namespace):
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)  # One line per update otherwise
+    # Lifted before app.main builds the rate limiter from the settings
+    for name in ("ocr_global_burst", "ocr_global_per_minute", "llm_global_burst", "llm_global_per_minute"):
+        setattr(s, name, 10**9)
+    # The policies bought by the virtual users are kept in memory, not in the bot's own database
+    s.policy_db_url = "sqlite:///:memory:"
+
+    import app.storage
+
+    redis = Redis.from_url(args.redis_url) if args.redis_url else FakeAsyncRedis()
+    app.storage.redis.connection_pool = redis.connection_pool  # Shared by the storage, caches and limiter
+
+    from app.handlers import router
+    from app.main import dp
+    from app.services.mindee import MindeeService
+    from app.services.ocr_executor import ocr_executor
+    from app.services.openai import openai_service
+    from app.services.policy_store import policy_repository
+    from app.services.preprocessing import image_preprocessor
+
+    rng = random.Random(args.seed)
+    passport, vehicle = (
+        to_jpeg(photograph(make_passport_page(rng), rng)),
+        to_jpeg(photograph(make_vehicle_document_page(rng), rng)),
+    )
+    photos = {}
+    for user_id in range(args.first_user_id, args.first_user_id + args.users):
+        # A unique tail per user, so photos are not served from the OCR cache by content hash
+        photos[f"passport-{user_id}"] = passport + str(user_id).encode()
+        photos[f"vehicle-{user_id}"] = vehicle + str(user_id).encode()
+
+    session = FakeTelegramSession(args.telegram_latency, photos, random.Random(args.seed + 1))
+    bot = Bot(token="42:LOAD-TEST", session=session)
+    names = HandlerNames()
+    router.message.middleware(names)
+    router.callback_query.middleware(names)
+
+    test = LoadTest(dp, bot, names, args)
+    with (
+        patch.object(MindeeService, "_enqueue", lambda service, file: "job"),
+        patch.object(MindeeService, "_poll", fake_poll(args.mindee_latency, random.Random(args.seed + 2))),
+        patch.object(
+            openai_service.client.chat.completions,
+            "create",
+            fake_completion(args.openai_latency, random.Random(args.seed + 3)),
+        ),
+    ):
+        try:
+            duration = await test.run()
+        finally:
+            ocr_executor.shutdown()
+            image_preprocessor.shutdown()
+            await policy_repository.close()  # Its connection thread would keep the process alive
+    print_report(test, session, duration)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="Seconds over which the users arrive")
+    parser.add_argument(
+        "--think-time",
+        type=lambda value: tuple(float(part) for part in value.split(",")),
+        default=(0.5, 2.0),
+        help="MIN,MAX seconds a user waits between two updates",
+    )
+    parser.add_argument("--text-ratio", type=float, default=0.3, help="Chance of a free text message before a step")
+    parser.add_argument("--telegram-latency", type=Latency.parse, default=Latency.parse("lognormal:0.05,0.5"))
+    parser.add_argument("--mindee-latency", type=Latency.parse, default=Latency.parse("lognormal:1.5,0.4"))
+    parser.add_argument("--openai-latency", type=Latency.parse, default=Latency.parse("lognormal:0.8,0.5"))
+    parser.add_argument("--redis-url", help="Run against a real Redis instead of fakeredis")
+    parser.add_argument("--first-user-id", type=int, default=1_000_000, help="Keeps the keys apart on a real Redis")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,110 @@
+"""
+Accuracy and latency of the local MRZ reader, the fast path before Mindee for passports.
+
+Usage:
+    python -m benchmarks.local_ocr [--per-class 50] [--seed 0] [--fixtures DIR]
+
+Needs pytesseract and the tesseract binary (`poetry install --extras local-ocr`, `apt install tesseract-ocr`).
+Without --fixtures the photos are generated by benchmarks.document_fixtures, with their data as ground truth.
+A real fixture set is laid out as DIR/passport/*; the expected data of a photo is read
+from a JSON file next to it with the same name (Mindee field names), without one only hit rate and latency
+are reported. Photos are preprocessed the way the bot does before reading them.
+
+"hit" is a photo read locally, which skips Mindee; "wrong" is a hit that differs from the expected data,
+the number that has to stay at zero.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from app.config import s
+from app.models import PassportData
+from app.services.local_ocr import local_reader, read_passport
+from app.services.preprocessing import PhotoQualityError, preprocess_photo
+from benchmarks.document_fixtures import make_passport, photograph, to_jpeg
+
+LABELS = ("passport",)
+MODELS = {"passport": PassportData}
+
+
+def generate_documents(per_class: int, seed: int) -> list[tuple[str, bytes, object]]:
+    """Return [(label, jpeg_bytes, expected_data)]."""
+    rng = random.Random(seed)
+    documents = []
+    for _ in range(per_class):
+        page, expected = make_passport(rng)
+        documents.append(("passport", to_jpeg(photograph(page, rng)), expected))
+    return documents
+
+
+def load_documents(directory: Path) -> list[tuple[str, bytes, object]]:
+    documents = []
+    for label in LABELS:
+        for path in sorted((directory / label).glob("*")):
+            if path.is_file() and path.suffix != ".json":
+                expected_path = path.with_suffix(".json")
+                expected = None
+                if expected_path.exists():
+                    expected = MODELS[label].model_validate(json.loads(expected_path.read_text()))
+                documents.append((label, path.read_bytes(), expected))
+    return documents
+
+
+def read_all(documents: list[tuple[str, bytes, object]]) -> dict:
+    results = {label: {"total": 0, "hit": 0, "wrong": 0, "timings": []} for label in LABELS}
+    for label, data, expected in documents:
+        result = results[label]
+        result["total"] += 1
+        try:
+            data = preprocess_photo(
+                data,
+                max_side=s.preprocess_max_side,
+                quality=s.preprocess_jpeg_quality,
+                min_sharpness=s.photo_min_sharpness,
+                min_brightness=s.photo_min_brightness,
+            )
+        except PhotoQualityError:
+            continue  # Rejected before OCR, in the bot as well
+        started = time.perf_counter()
+        document = read_passport(data, s.local_ocr_timeout)
+        result["timings"].append(time.perf_counter() - started)
+        if document is not None:
+            result["hit"] += 1
+            if expected is not None and document != expected:
+                result["wrong"] += 1
+                print(f"wrong {label}: read {document!r}, expected {expected!r}")
+    return results
+
+
+def report(results: dict):
+    print(f"{'document':<10} {'photos':>7} {'hit rate':>9} {'wrong':>6} {'mean ms':>8} {'p50 ms':>7} {'p95 ms':>7}")
+    for label, result in results.items():
+        timings = sorted(result["timings"]) or [0.0]
+        p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) >= 20 else timings[-1]
+        hit_rate = result["hit"] / result["total"] if result["total"] else 0.0
+        print(
+            f"{label:<10} {result['total']:>7} {hit_rate:>9.3f} {result['wrong']:>6} "
+            f"{statistics.mean(timings) * 1e3:>8.0f} {statistics.median(timings) * 1e3:>7.0f} {p95 * 1e3:>7.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--per-class", type=int, default=50, help="synthetic passport photos")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic photos")
+    parser.add_argument("--fixtures", type=Path, help="directory with real passport/ photos")
+    args = parser.parse_args()
+
+    if not local_reader.available:
+        sys.exit("Tesseract is not installed, see the usage above")
+    documents = load_documents(args.fixtures) if args.fixtures else generate_documents(args.per_class, args.seed)
+    report(read_all(documents))
+
+
+if __name__ == "__main__":
+    main()
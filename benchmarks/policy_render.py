@@ -0,0 +1,64 @@
+"""
+Compares the local template renderer with the LLM policy generation.
+
+Usage:
+    python -m benchmarks.policy_render [--runs 10000] [--llm-runs 0]
+
+The LLM path calls the real OpenAI API, so it only runs when --llm-runs is set.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.models import PassportData, VehicleDocumentData
+from app.services.openai import openai_service
+from app.services.policy_renderer import policy_renderer
+
+PASSPORT = PassportData(given_names="John", surnames="Doe", passport_number="AB123456")
+VEHICLE = VehicleDocumentData(
+    vin="1HGCM82633A004352", vehicle_make_and_model="Tesla Model S", registration_number="AA0000BB"
+)
+
+
+def report(name: str, timings: list[float]):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) >= 20 else timings[-1]
+    print(
+        f"{name:<10} runs={len(timings):<6} mean={statistics.mean(timings) * 1e6:>12.1f} us  "
+        f"p50={statistics.median(timings) * 1e6:>12.1f} us  p95={p95 * 1e6:>12.1f} us"
+    )
+
+
+def bench_template(runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        policy_renderer.render_policy(PASSPORT, VEHICLE)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def bench_llm(runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await openai_service.generate_policy_text(PASSPORT, VEHICLE)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10_000, help="template renders to time")
+    parser.add_argument("--llm-runs", type=int, default=0, help="OpenAI completions to time (real API calls)")
+    args = parser.parse_args()
+
+    report("template", bench_template(args.runs))
+    if args.llm_runs:
+        report("llm", asyncio.run(bench_llm(args.llm_runs)))
+
+
+if __name__ == "__main__":
+    main()
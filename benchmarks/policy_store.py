@@ -0,0 +1,112 @@
+"""
+Bulk inserts and indexed lookups of the policy store behind /mypolicies.
+
+Usage:
+    python -m benchmarks.policy_store [--policies 100000] [--batch 1000] [--lookups 1000] [--url URL]
+
+The store is filled with synthetic policies of `--policies / 3` users, inserted `--batch` at a time
+(a fleet of 30 vehicles is one batch of 30 in the bot). Then `--lookups` random users, passport numbers
+and VINs are looked up. Without --url a fresh SQLite file in a temporary directory is used; a PostgreSQL
+URL needs `poetry install --extras postgres` and an empty database, the table is created if needed.
+"unindexed" repeats the SQLite lookups after dropping the indexes, which is what they save.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import string
+import tempfile
+import time
+
+from app.models import PassportData, VehicleDocumentData
+from app.services.policy_store import PolicyRepository, StoredPolicy, create_policy_repository
+from app.utils.checksums import vin_check_digit
+
+POLICY_HTML = "<b>Insurance policy</b>\n" + "Terms and conditions of the policy.\n" * 40  # ~1.5 KB, like a real one
+VIN_ALPHABET = "ABCDEFGHJKLMNPRSTUVWXYZ0123456789"
+
+
+def make_policies(count: int, rng: random.Random) -> list[StoredPolicy]:
+    users = max(count // 3, 1)
+    passports = {}
+    policies = []
+    for _ in range(count):
+        user_id = rng.randrange(users)
+        if user_id not in passports:
+            number = "".join(rng.choices(string.ascii_uppercase, k=2)) + f"{rng.randrange(10**6):06d}"
+            passports[user_id] = PassportData(given_names="John", surnames="Doe", passport_number=number)
+        vin = "".join(rng.choices(VIN_ALPHABET, k=17))
+        vin = vin[:8] + vin_check_digit(vin) + vin[9:]
+        vehicle = VehicleDocumentData(vin=vin, vehicle_make_and_model="Tesla Model S")
+        policies.append(StoredPolicy.issue(1_000_000 + user_id, passports[user_id], vehicle, POLICY_HTML))
+    return policies
+
+
+async def insert(repository: PolicyRepository, policies: list[StoredPolicy], batch: int) -> float:
+    started = time.perf_counter()
+    for start in range(0, len(policies), batch):
+        await repository.add_many(policies[start : start + batch])
+    return time.perf_counter() - started
+
+
+async def lookup(repository: PolicyRepository, policies: list[StoredPolicy], count: int, rng: random.Random) -> dict:
+    samples = rng.sample(policies, min(count, len(policies)))
+    queries = {
+        "user": (repository.find_by_user, "user_id"),
+        "passport": (repository.find_by_passport_number, "passport_number"),
+        "vin": (repository.find_by_vin, "vin"),
+    }
+    timings = {}
+    for name, (find, attribute) in queries.items():
+        timings[name] = []
+        for policy in samples:
+            started = time.perf_counter()
+            assert await find(getattr(policy, attribute))
+            timings[name].append(time.perf_counter() - started)
+    return timings
+
+
+def report_lookups(label: str, timings: dict):
+    for name, values in timings.items():
+        values = sorted(values)
+        p95 = values[int(len(values) * 0.95) - 1] if len(values) >= 20 else values[-1]
+        print(
+            f"{label:<10} {name:<9} {len(values):>8} {statistics.mean(values) * 1e3:>8.2f} "
+            f"{statistics.median(values) * 1e3:>7.2f} {p95 * 1e3:>7.2f}"
+        )
+
+
+async def run(url: str, count: int, batch: int, lookups: int, seed: int):
+    rng = random.Random(seed)
+    policies = make_policies(count, rng)
+    repository = create_policy_repository(url)
+    try:
+        seconds = await insert(repository, policies, batch)
+        print(f"inserted {count} policies in batches of {batch}: {seconds:.2f}s, {count / seconds:,.0f} policies/s")
+        print(f"{'':<10} {'lookup':<9} {'queries':>8} {'mean ms':>8} {'p50 ms':>7} {'p95 ms':>7}")
+        report_lookups("indexed", await lookup(repository, policies, lookups, rng))
+        if url.startswith("sqlite://"):
+            for index in ("policies_user_id_idx", "policies_passport_number_idx", "policies_vin_idx"):
+                await repository._db.execute(f"DROP INDEX {index}")
+            report_lookups("unindexed", await lookup(repository, policies, min(lookups, 100), rng))
+    finally:
+        await repository.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--policies", type=int, default=100_000, help="policies inserted")
+    parser.add_argument("--batch", type=int, default=1000, help="policies per insert")
+    parser.add_argument("--lookups", type=int, default=1000, help="lookups of each kind")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", help="POLICY_DB_URL to benchmark, a temporary SQLite file by default")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = args.url or f"sqlite:///{directory}/policies.db"
+        asyncio.run(run(url, args.policies, args.batch, args.lookups, args.seed))
+
+
+if __name__ == "__main__":
+    main()
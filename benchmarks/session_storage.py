@@ -0,0 +1,194 @@
+"""
+Redis round trips and bytes of the FSM data over one conversation.
+
+Usage:
+    python -m benchmarks.session_storage [--conversations 100]
+
+The conversation is /start, both documents, a correction of the passport from the summary and the purchase.
+"legacy" replays the storage calls the handlers made before the session layer: JSON data in RedisStorage,
+read with get_data wherever it was needed and written with update_data, display texts included.
+"session" is SessionMiddleware: the data is read once per update and the changed fields written in one call.
+Both include the FSM state read aiogram makes for every update. Redis is fakeredis, so times are not reported.
+"""
+
+import argparse
+import asyncio
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+from fakeredis import FakeAsyncRedis
+from fakeredis.aioredis import FakeAsyncRedisConnection
+
+from app.models import PassportData, VehicleDocumentData
+from app.session import Session
+from app.states import Form
+from app.storage import SessionStorage
+from app.utils.file_utils import get_passport_extracted_text, get_summary_text, get_vehicle_extracted_text
+
+PASSPORT = PassportData(
+    given_names="John",
+    surnames="Doe",
+    date_of_birth="1990-01-01",
+    passport_number="AB123456",
+    date_of_issue="2020-01-01",
+    date_of_expiry="2030-01-01",
+)
+VEHICLE = VehicleDocumentData(
+    vin="1HGCM82633A004352",
+    vehicle_make_and_model="Tesla Model S",
+    registration_number="AA0000BB",
+    document_series_and_number="CXX123456",
+)
+
+# (update, next state) of the conversation, the same for both scenarios
+CONVERSATION = [
+    ("start", Form.waiting_for_passport),
+    ("passport_photo", None),
+    ("passport_ok", Form.waiting_for_vehicle_document),
+    ("vehicle_photo", None),
+    ("vehicle_ok", Form.waiting_for_summary_confirmation),
+    ("summary_wrong", Form.waiting_for_change_choice),
+    ("change_passport", Form.waiting_for_passport),
+    ("passport_photo", None),
+    ("passport_ok", Form.waiting_for_summary_confirmation),
+    ("summary_ok", Form.waiting_for_price_confirmation),
+    ("price_yes", None),
+]
+
+
+class RedisTraffic:
+    """Counts what the fakeredis connections send: one call per round trip, pipelines included."""
+
+    def __init__(self):
+        self.round_trips = 0
+        self.bytes_sent = 0
+        self.enabled = True
+
+    @contextmanager
+    def record(self):
+        original = FakeAsyncRedisConnection.send_packed_command
+        traffic = self
+
+        async def send_packed_command(self, command, check_health=True):
+            if traffic.enabled:
+                traffic.round_trips += 1
+                chunks = [command] if isinstance(command, (bytes, str, memoryview)) else command
+                traffic.bytes_sent += sum(len(chunk) for chunk in chunks)
+            return await original(self, command, check_health)
+
+        with patch.object(FakeAsyncRedisConnection, "send_packed_command", send_packed_command):
+            yield self
+
+
+async def stored_bytes(redis: FakeAsyncRedis) -> int:
+    """Size of the keys and values of everything in Redis."""
+    size = 0
+    async for key in redis.scan_iter():
+        size += len(key)
+        if await redis.type(key) == b"hash":
+            size += sum(len(name) + len(value) for name, value in (await redis.hgetall(key)).items())
+        else:
+            size += await redis.strlen(key)
+    return size
+
+
+async def legacy_update(state: FSMContext, update: str):
+    """The storage calls of the handlers before the session layer."""
+    if update == "start":
+        await state.clear()
+    elif update == "passport_photo":
+        await state.get_data()  # remove_previous_keyboard
+        await state.update_data(
+            passport_data=PASSPORT.model_dump(by_alias=True),
+            passport_confirm_text=await get_passport_extracted_text(PASSPORT),
+        )
+    elif update == "vehicle_photo":
+        await state.get_data()
+        await state.update_data(
+            vehicle_document_data=VEHICLE.model_dump(by_alias=True),
+            vehicle_confirm_text=await get_vehicle_extracted_text(VEHICLE),
+        )
+    elif update in ("passport_ok", "vehicle_ok"):
+        data = await state.get_data()
+        if data.get("is_changing"):
+            await state.update_data(is_changing=False)
+        if update == "vehicle_ok" or data.get("is_changing"):
+            data = await state.get_data()  # _show_summary
+            summary_text = await get_summary_text(
+                PassportData.model_validate(data.get("passport_data")),
+                VehicleDocumentData.model_validate(data.get("vehicle_document_data")),
+            )
+            await state.update_data(summary_text_message=summary_text)
+    elif update in ("summary_ok", "summary_wrong"):
+        await state.get_data()
+    elif update == "change_passport":
+        await state.update_data(is_changing=True)
+    elif update == "price_yes":
+        data = await state.get_data()
+        PassportData.model_validate(data.get("passport_data"))
+        await state.clear()
+
+
+async def session_update(state: FSMContext, update: str):
+    """The same updates through SessionMiddleware; /start doesn't take a session and clears the state."""
+    if update == "start":
+        await state.clear()
+        return
+
+    session = await Session.load(state)
+    if update == "passport_photo":
+        session.store_document("passport", PASSPORT)
+    elif update == "vehicle_photo":
+        session.store_document("vehicle", VEHICLE)
+    elif update == "passport_ok" and session.is_changing:
+        session.is_changing = False
+        await get_summary_text(session.passport_data, session.vehicle_document_data)
+    elif update == "change_passport":
+        session.is_changing = True
+    elif update == "price_yes":
+        session.clear()
+        await state.set_state(None)
+    await session.save(state)
+
+
+async def run_scenario(name: str, conversations: int) -> dict:
+    redis = FakeAsyncRedis()
+    storage = SessionStorage(redis=redis) if name == "session" else RedisStorage(redis=redis)
+    run_update = session_update if name == "session" else legacy_update
+    peak_stored = 0
+
+    with RedisTraffic().record() as traffic:
+        for chat_id in range(conversations):
+            state = FSMContext(storage=storage, key=StorageKey(bot_id=42, chat_id=chat_id, user_id=chat_id))
+            for update, next_state in CONVERSATION:
+                await state.get_state()  # FSMContextMiddleware, before every handler
+                await run_update(state, update)
+                if next_state:
+                    await state.set_state(next_state)
+                traffic.enabled = False
+                peak_stored = max(peak_stored, await stored_bytes(redis))
+                traffic.enabled = True
+
+    return {
+        "round_trips": traffic.round_trips / conversations,
+        "bytes_sent": traffic.bytes_sent / conversations,
+        "peak_stored": peak_stored,  # Conversations run one after another and end with a clear
+    }
+
+
+async def main(conversations: int):
+    print(f"{conversations} conversations of {len(CONVERSATION)} updates, per conversation:")
+    print(f"{'scenario':>10} {'round trips':>12} {'bytes sent':>11} {'peak stored':>12}")
+    for name in ("legacy", "session"):
+        result = await run_scenario(name, conversations)
+        print(f"{name:>10} {result['round_trips']:>12.1f} {result['bytes_sent']:>11.0f} {result['peak_stored']:>12.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.conversations))
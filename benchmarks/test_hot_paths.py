@@ -0,0 +1,130 @@
+"""
+Micro-benchmarks of the code every conversation runs: document models, FSM round trips, texts and keyboards.
+
+Usage:
+    make bench           # Compare with the checked-in baseline in benchmarks/baseline
+    make bench-baseline  # Save a new baseline after an intended change
+
+Not collected by the test suite (testpaths = tests); needs pytest-benchmark.
+"""
+
+import orjson
+import pytest
+from aiogram import Bot
+from mindee.parsing.v2.field.inference_fields import InferenceFields
+
+import app.keyboard as kb
+from app.models import PassportData, VehicleDocumentData
+from app.services.policy_renderer import policy_renderer
+from app.services.validation import validate_document
+from app.session import Session
+from app.utils.file_utils import (
+    get_clean_text,
+    get_html_safe_prefix,
+    get_passport_extracted_text,
+    get_summary_text,
+    get_vehicle_extracted_text,
+)
+
+
+def _field(value) -> dict:
+    return {"value": value, "confidence": "High", "locations": []}
+
+
+PASSPORT_FIELDS = InferenceFields(
+    {
+        "given_names": _field("John"),
+        "surnames": _field("Doe"),
+        "date_of_birth": _field("1990-01-01"),
+        "passport_number": _field("AB123456"),
+        "date_of_issue": _field("2020-01-01"),
+        "date_of_expiry": _field(None),
+    }
+)
+VEHICLE_FIELDS = InferenceFields(
+    {
+        "vin": _field("1HGCM82633A004352"),
+        "vehicle_make_and_model": _field("Tesla Model S"),
+        "registration_number": _field("AA0000BB"),
+        "document_series_and_number": _field("CXX123456"),
+    }
+)
+# Validated like every document the bot shows, so the texts include their warnings
+PASSPORT = validate_document("passport", PassportData.model_validate(PASSPORT_FIELDS))
+VEHICLE = validate_document("vehicle", VehicleDocumentData.model_validate(VEHICLE_FIELDS))
+POLICY_HTML = policy_renderer.render_policy(PASSPORT, VEHICLE)
+
+
+def run_sync(coroutine):
+    """Run a coroutine that never awaits, without the cost of an event loop."""
+    try:
+        coroutine.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("The coroutine is not synchronous")
+
+
+# --- Document models ---
+@pytest.mark.parametrize(
+    ("model", "fields"),
+    [(PassportData, PASSPORT_FIELDS), (VehicleDocumentData, VEHICLE_FIELDS)],
+    ids=["passport", "vehicle"],
+)
+def test_validate_mindee_fields(benchmark, model, fields):
+    benchmark(model.model_validate, fields)
+
+
+@pytest.mark.parametrize("document", [PASSPORT, VEHICLE], ids=["passport", "vehicle"])
+def test_document_dump_round_trip(benchmark, document):
+    """What storing a document in the FSM data and reading it back costs besides Redis."""
+
+    def round_trip():
+        return type(document).model_validate(orjson.loads(orjson.dumps(document.model_dump(by_alias=True))))
+
+    assert benchmark(round_trip) == document
+
+
+def test_session_round_trip(benchmark):
+    session = Session(passport_data=PASSPORT, vehicle_document_data=VEHICLE, msg_to_edit_id=1)
+
+    def round_trip():
+        fields = session.model_dump(by_alias=True, mode="json")
+        return Session.model_validate({name: orjson.loads(orjson.dumps(value)) for name, value in fields.items()})
+
+    assert benchmark(round_trip).passport_data == PASSPORT
+
+
+# --- Texts ---
+def test_passport_text(benchmark):
+    benchmark(lambda: run_sync(get_passport_extracted_text(PASSPORT)))
+
+
+def test_vehicle_text(benchmark):
+    benchmark(lambda: run_sync(get_vehicle_extracted_text(VEHICLE)))
+
+
+def test_summary_text(benchmark):
+    benchmark(lambda: run_sync(get_summary_text(PASSPORT, VEHICLE)))
+
+
+def test_clean_text(benchmark):
+    summary = run_sync(get_summary_text(PASSPORT, VEHICLE))
+    benchmark(get_clean_text, summary)
+
+
+def test_html_safe_prefix(benchmark):
+    """Run on every streamed policy edit, with the text cut in the middle of a tag."""
+    partial_policy = POLICY_HTML[: len(POLICY_HTML) * 2 // 3] + "<b"
+    benchmark(get_html_safe_prefix, partial_policy)
+
+
+def test_render_policy(benchmark):
+    benchmark(policy_renderer.render_policy, PASSPORT, VEHICLE)
+
+
+# --- Keyboards ---
+@pytest.mark.parametrize("keyboard", ["document_confirm_kb", "change_photo_kb", "confirm_kb"])
+def test_keyboard_serialization(benchmark, keyboard):
+    """The reply_markup of a Bot API request, serialized on every message that carries it."""
+    bot = Bot(token="42:BENCH")
+    benchmark(bot.session.prepare_value, getattr(kb, keyboard), bot=bot, files={})
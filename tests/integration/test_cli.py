@@ -0,0 +1,93 @@
+import csv
+import json
+from unittest.mock import patch
+
+import pytest
+
+from app.cli import run
+from app.models import PassportData, VehicleDocumentData
+from app.services.ocr_executor import OCRTimeoutError
+
+DOCUMENTS = {
+    "passport.jpg": PassportData(given_names="John", surnames="Doe", passport_number="AB123456"),
+    "car.jpg": VehicleDocumentData(vin="1HGCM82633A004352", vehicle_make_and_model="Tesla Model S"),
+    "blurry.jpg": None,
+    "bad_vin.png": VehicleDocumentData(vin="12345"),
+}
+
+
+def make_directory(tmp_path):
+    directory = tmp_path / "archive"
+    (directory / "2024").mkdir(parents=True)
+    for name in DOCUMENTS:
+        (directory / "2024" / name).write_bytes(name.encode())
+    (directory / "notes.txt").write_text("not an image")
+    return directory
+
+
+async def fake_recognize_file(file, doc_type, check_type=False):
+    """Recognizes the document named by the file content; timeout.jpg times out."""
+    name = file.read().decode()
+    if name == "timeout.jpg":
+        raise OCRTimeoutError("OCR took too long")
+    return DOCUMENTS[name]
+
+
+async def fake_classify_document(file) -> str:
+    doc_type = "passport" if file.read().startswith(b"passport") else "unknown"
+    file.seek(0)
+    return doc_type
+
+
+@pytest.mark.asyncio
+async def test_cli_writes_results_and_resumes(tmp_path):
+    """
+    Every image gets a JSON line; a second run skips processed files and retries the ones that failed,
+    including the ones whose type --type auto could not detect.
+    """
+    directory = make_directory(tmp_path)
+    (directory / "timeout.jpg").write_bytes(b"timeout.jpg")
+    output, manifest = tmp_path / "results.jsonl", tmp_path / "results.jsonl.manifest"
+
+    with (
+        patch("app.processors.PhotoProcessor.recognize_file", side_effect=fake_recognize_file) as recognize_file,
+        patch("app.cli.classify_document", side_effect=fake_classify_document),
+    ):
+        stats = await run(directory, output, "auto", concurrency=2, manifest_path=manifest)
+    assert stats["statuses"] == {"ok": 1, "error": 4}
+    assert recognize_file.call_count == 1
+
+    with patch("app.processors.PhotoProcessor.recognize_file", side_effect=fake_recognize_file) as recognize_file:
+        stats = await run(directory, output, "vehicle", concurrency=2, manifest_path=manifest)
+    results = {result["file"]: result for result in map(json.loads, output.read_text().splitlines())}
+    assert stats["statuses"] == {"skipped": 1, "ok": 1, "unrecognized": 1, "rejected": 1, "error": 1}
+    assert set(results) == {f"2024/{name}" for name in DOCUMENTS} | {"timeout.jpg"}
+    assert results["2024/passport.jpg"]["doc_type"] == "passport"
+    assert results["2024/car.jpg"]["data"]["vin"] == "1HGCM82633A004352"
+    assert "🚗 Check the recognized vehicle document data" in results["2024/car.jpg"]["text"]
+    assert results["2024/bad_vin.png"]["status"] == "rejected"
+    assert "OCRTimeoutError" in results["timeout.jpg"]["error"]
+
+    with patch("app.processors.PhotoProcessor.recognize_file", side_effect=fake_recognize_file) as recognize_file:
+        stats = await run(directory, output, "vehicle", concurrency=2, manifest_path=manifest)
+    assert stats["statuses"] == {"skipped": 4, "error": 1}
+    assert recognize_file.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_cli_writes_csv(tmp_path):
+    directory = make_directory(tmp_path)
+    output = tmp_path / "results.csv"
+
+    with (
+        patch("app.processors.PhotoProcessor.recognize_file", side_effect=fake_recognize_file),
+        patch("app.cli.classify_document", side_effect=fake_classify_document),
+    ):
+        await run(directory, output, "auto", concurrency=4, manifest_path=tmp_path / "manifest")
+        await run(directory, output, "vehicle", concurrency=4, manifest_path=tmp_path / "manifest")
+    with output.open() as f:
+        rows = {row["file"]: row for row in csv.DictReader(f)}  # The last row of a file wins
+    assert len(rows) == len(DOCUMENTS)
+    assert rows["2024/passport.jpg"]["status"] == "ok"
+    assert rows["2024/passport.jpg"]["passport_number"] == "AB123456"
+    assert rows["2024/car.jpg"]["vin"] == "1HGCM82633A004352"
@@ -0,0 +1,174 @@
+import asyncio
+import html
+import zipfile
+from io import BytesIO
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from fakeredis import FakeAsyncRedis
+
+from app.handlers import _issue_fleet_policies, _process_fleet_upload
+from app.middlewares import THROTTLED_TEXTS, RateLimit, TokenBucketLimiter
+from app.models import PassportData, VehicleDocumentData
+from app.services.fleet import ProgressMessage, issue_policies, run_bounded
+from app.services.openai import POLICY_ERROR_TEXT
+from app.session import Session
+from app.states import FleetForm
+from app.storage import ChatEventIsolation, SessionStorage
+
+KEY = StorageKey(bot_id=42, chat_id=7, user_id=7)
+PASSPORT = PassportData(given_names="John", surnames="Doe", passport_number="AB123456")
+VINS = {"car_1.jpg": "1HGCM82633A004352", "car_2.jpg": "1M8GDM9AXKP042788", "car_3.jpg": "1HGCM82633A004352"}
+
+
+def make_zip() -> BytesIO:
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for name in [*VINS, "car_4.jpg"]:
+            zf.writestr(f"fleet/{name}", name.encode())
+        zf.writestr("fleet/readme.txt", b"not a photo")
+    archive.seek(0)
+    return archive
+
+
+async def fake_recognize_photo(photo, bot, doc_type, file=None):
+    """Recognizes the VIN named by the file; car_4.jpg is unreadable."""
+    vin = VINS.get(file.read().decode())
+    if vin is None:
+        return "🛑 Vehicle document photo is not valid.", False, None
+    return "text", True, VehicleDocumentData(vin=vin, vehicle_make_and_model="Tesla Model S")
+
+
+@pytest.mark.asyncio
+async def test_run_bounded_limits_concurrency():
+    running, peak = 0, 0
+
+    async def worker(item: int) -> int:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return item * 2
+
+    assert await run_bounded(list(range(10)), worker, concurrency=3) == [i * 2 for i in range(10)]
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_fleet_zip_upload_builds_the_fleet():
+    """Images of a ZIP file are recognized and added; failures and duplicate VINs are reported per file."""
+    state = FSMContext(storage=SessionStorage(redis=FakeAsyncRedis()), key=KEY)
+    session = Session()
+    session.passport_data = PASSPORT
+    await session.save(state)
+    message = AsyncMock()
+
+    with (
+        patch("app.services.fleet.PhotoProcessor.recognize_photo", side_effect=fake_recognize_photo),
+        zipfile.ZipFile(make_zip()) as archive,
+    ):
+        await _process_fleet_upload(message, state, AsyncMock(), archive=archive)
+
+    session = await Session.load(state)
+    assert [vehicle.vin for vehicle in session.fleet_vehicles] == [VINS["car_1.jpg"], VINS["car_2.jpg"]]
+
+    table = message.answer.return_value.edit_text.call_args_list[-1].args[0]
+    assert "2 vehicle(s)" in table
+    assert "car_3.jpg: VIN 1HGCM82633A004352 is already in the fleet." in table
+    assert "car_4.jpg: 🛑 Vehicle document photo is not valid." in table
+    assert "readme" not in table
+
+
+@pytest.mark.asyncio
+async def test_issue_policies_reports_failures():
+    """Policies are generated for every vehicle; the ones OpenAI failed on are returned to retry."""
+    vehicles = [VehicleDocumentData(vin=vin) for vin in ("1HGCM82633A004352", "1M8GDM9AXKP042788")]
+
+    async def generate_policy_text(passport, vehicle):
+        return POLICY_ERROR_TEXT if vehicle.vin.startswith("1M8") else f"<b>Policy {vehicle.vin}</b>"
+
+    progress = ProgressMessage(AsyncMock(), "Issuing policies", total=2, interval=0)
+    with (
+        patch("app.services.fleet.s.policy_mode", "enhanced"),
+        patch("app.services.fleet.openai_service.generate_policy_text", side_effect=generate_policy_text),
+        patch("app.services.fleet.save_policies", new_callable=AsyncMock) as save_policies,
+    ):
+        document, failed = await issue_policies(PASSPORT, vehicles, progress, user_id=7)
+
+    assert b"<b>Policy 1HGCM82633A004352</b>" in document
+    assert failed == vehicles[1:]
+    save_policies.assert_awaited_once_with(7, PASSPORT, [(vehicles[0], "<b>Policy 1HGCM82633A004352</b>")])
+    assert progress.text == "⏳ Issuing policies: 2/2 done, 1 failed."
+
+
+@pytest.mark.asyncio
+async def test_fleet_charges_every_document_and_policy():
+    """A ZIP file takes a "fleet" token per document and issuing takes an "llm" token per generated policy."""
+    state = FSMContext(storage=SessionStorage(redis=FakeAsyncRedis()), key=KEY)
+    session = Session()
+    session.passport_data = PASSPORT
+    await session.save(state)
+    message = AsyncMock()
+    message.from_user.id = 7
+    limiter = TokenBucketLimiter(
+        FakeAsyncRedis(),
+        limits={
+            budget: (RateLimit(burst=2, per_minute=1), RateLimit(burst=100, per_minute=1))
+            for budget in ("fleet", "llm")
+        },
+    )
+
+    with (
+        patch("app.services.fleet.s.fleet_concurrency", 1),
+        patch("app.services.fleet.PhotoProcessor.recognize_photo", side_effect=fake_recognize_photo) as recognize,
+        zipfile.ZipFile(make_zip()) as archive,
+    ):
+        await _process_fleet_upload(message, state, AsyncMock(), archive=archive, rate_limiter=limiter)
+
+    assert recognize.call_count == 2
+    table = message.answer.return_value.edit_text.call_args_list[-1].args[0]
+    assert f"car_3.jpg: {html.escape(THROTTLED_TEXTS['user'])}" in table
+
+    vehicles = [VehicleDocumentData(vin=vin) for vin in ("1HGCM82633A004352", "1M8GDM9AXKP042788")]
+    progress = ProgressMessage(AsyncMock(), "Issuing policies", total=2, interval=0)
+    with (
+        patch("app.services.fleet.s.fleet_concurrency", 1),
+        patch("app.services.fleet.s.policy_mode", "enhanced"),
+        patch("app.services.fleet.openai_service.generate_policy_text", new_callable=AsyncMock, return_value="Policy"),
+        patch("app.services.fleet.save_policies", new_callable=AsyncMock),
+    ):
+        await limiter.acquire("llm", 7)  # One token left
+        _, failed = await issue_policies(PASSPORT, vehicles, progress, user_id=7, rate_limiter=limiter)
+
+    assert failed == vehicles[1:]
+
+
+@pytest.mark.asyncio
+async def test_fleet_policies_are_issued_under_the_chat_lock():
+    """Issuing runs after the callback has returned; vehicles whose policy failed stay in the saved fleet."""
+    redis = FakeAsyncRedis()
+    state = FSMContext(storage=SessionStorage(redis=redis), key=KEY)
+    await state.set_state(FleetForm.waiting_for_vehicle_documents)
+    session = Session()
+    session.passport_data = PASSPORT
+    session.fleet_vehicles = [VehicleDocumentData(vin=vin) for vin in ("1HGCM82633A004352", "1M8GDM9AXKP042788")]
+    await session.save(state)
+    isolation = ChatEventIsolation(redis=redis)
+    message = AsyncMock()
+
+    async def issue_policies(passport, vehicles, progress, user_id, rate_limiter):
+        assert await redis.exists(isolation.key_builder.build(KEY, "lock"))
+        return b"<html></html>", vehicles[1:]
+
+    with (
+        patch("app.handlers.events_isolation", isolation),
+        patch("app.handlers.issue_policies", side_effect=issue_policies),
+    ):
+        await _issue_fleet_policies(message, state, user_id=7)
+
+    message.answer_document.assert_awaited_once()
+    assert [vehicle.vin for vehicle in (await Session.load(state)).fleet_vehicles] == ["1M8GDM9AXKP042788"]
+    assert await state.get_state() == FleetForm.waiting_for_vehicle_documents.state
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from prometheus_client import REGISTRY
+
+from app.metrics import EXTERNAL_CALL_ERRORS, track_call, track_stream
+from app.webhook import create_monitoring_app
+
+
+def test_track_call_counts_failed_calls():
+    """A call that raises inside track_call is counted as an error and re-raised."""
+    errors = EXTERNAL_CALL_ERRORS.labels("mindee", "test_failure")
+    before = errors._value.get()
+
+    with pytest.raises(TimeoutError), track_call("mindee", "test_failure"):
+        raise TimeoutError
+
+    assert errors._value.get() == before + 1
+
+
+@pytest.mark.asyncio
+async def test_track_stream_times_only_the_service():
+    """The time the consumer spends between chunks, e.g. editing a Telegram message, is not counted."""
+
+    async def chunks():
+        for chunk in range(3):
+            await asyncio.sleep(0.01)
+            yield chunk
+
+    async def open_stream():
+        return chunks()
+
+    labels = {"service": "openai", "operation": "test_stream"}
+    async for _ in track_stream("openai", "test_stream", open_stream):
+        await asyncio.sleep(0.1)
+
+    assert 0.03 <= REGISTRY.get_sample_value("bot_external_call_duration_seconds_sum", labels) < 0.1
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exposes_prometheus_metrics():
+    """The /metrics endpoint should serve handler and external call histograms in Prometheus format."""
+    with track_call("telegram", "download_file"):
+        pass
+
+    async with TestClient(TestServer(create_monitoring_app())) as client:
+        response = await client.get("/metrics")
+        body = await response.text()
+
+    assert response.status == 200
+    assert "bot_handler_duration_seconds" in body
+    assert 'bot_external_call_duration_seconds_count{operation="download_file",service="telegram"}' in body
@@ -0,0 +1,113 @@
+from io import BytesIO
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+import requests
+from mindee.input.polling_options import PollingOptions
+
+from app.services import mindee
+from app.services.mindee import MindeeService, _is_retryable
+from app.services.ocr_executor import OCRExecutor
+from app.services.resilience import CircuitBreaker, CircuitOpenError, Resilience, RetryPolicy
+
+FIELDS = {
+    "given_names": SimpleNamespace(value="John"),
+    "surnames": SimpleNamespace(value="Doe"),
+    "passport_number": SimpleNamespace(value="AB123456"),
+}
+
+
+def make_file() -> BytesIO:
+    file = BytesIO(b"photo bytes")
+    file.name = "passport.jpg"
+    return file
+
+
+def make_service(failure_threshold: int = 5) -> tuple[MindeeService, Resilience]:
+    """
+    A real MindeeService whose uploads and polls go through Mindee's HTTP layer and the pooled transport,
+    with only the HTTP POST, the job status and the result faked.
+    """
+    service = MindeeService(api_key="fake-key", model_id="fake-model")
+    service.params.polling_options = PollingOptions(initial_delay_sec=0, delay_sec=0)
+    client = service.client
+
+    def enqueue_inference(input_source, params):
+        client.mindee_api.req_post_inference_enqueue(input_source, params, "inferences")  # Reads the file
+        return SimpleNamespace(job=SimpleNamespace(id="job-1"))
+
+    def get_job(job_id):
+        client.mindee_api.req_get_job(job_id)
+        return SimpleNamespace(job=SimpleNamespace(status="Processed"))
+
+    client.enqueue_inference = enqueue_inference
+    client.get_job = get_job
+    client.get_result = lambda response_type, job_id: SimpleNamespace(
+        inference=SimpleNamespace(result=SimpleNamespace(fields=FIELDS))
+    )
+    resilience = Resilience(
+        "mindee",
+        _is_retryable,
+        RetryPolicy(attempts=3, base_delay=0, max_delay=0),
+        CircuitBreaker("mindee", failure_threshold=failure_threshold, reset_timeout=30),
+    )
+    return service, resilience
+
+
+@pytest.mark.asyncio
+async def test_mindee_upload_is_retried_with_the_same_file():
+    """A connection error on the upload is retried, and the retry sends the whole photo again."""
+    service, resilience = make_service()
+    ok = SimpleNamespace(status_code=202)
+    file = make_file()
+
+    with (
+        patch.object(mindee, "mindee_resilience", resilience),
+        patch.object(mindee, "ocr_executor", OCRExecutor(max_concurrency=1, timeout=5)),
+        patch.object(mindee._transport.session, "post", side_effect=[requests.ConnectionError(), ok]) as post,
+        patch.object(mindee._transport.session, "get"),
+    ):
+        passport = await service.process_passport_photo(file)
+
+    assert passport.given_names == "John"
+    assert post.call_count == 2
+    assert [call.kwargs["files"]["file"][1] for call in post.call_args_list] == [b"photo bytes"] * 2
+    assert resilience.breaker.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_mindee_poll_is_retried_without_uploading_again():
+    """An error while polling a job Mindee has accepted retries only the poll, so the photo is paid for once."""
+    service, resilience = make_service()
+    accepted = SimpleNamespace(status_code=202)
+
+    with (
+        patch.object(mindee, "mindee_resilience", resilience),
+        patch.object(mindee, "ocr_executor", OCRExecutor(max_concurrency=1, timeout=5)),
+        patch.object(mindee._transport.session, "post", return_value=accepted) as post,
+        patch.object(mindee._transport.session, "get", side_effect=[requests.ConnectionError(), None]) as get,
+    ):
+        passport = await service.process_passport_photo(make_file())
+
+    assert passport.given_names == "John"
+    assert post.call_count == 1
+    assert get.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_mindee_breaker_opens_after_repeated_connection_errors():
+    service, resilience = make_service(failure_threshold=3)
+
+    with (
+        patch.object(mindee, "mindee_resilience", resilience),
+        patch.object(mindee, "ocr_executor", OCRExecutor(max_concurrency=1, timeout=5)),
+        patch.object(mindee._transport.session, "post", side_effect=requests.ConnectionError()) as post,
+    ):
+        with pytest.raises(requests.ConnectionError):
+            await service.process_passport_photo(make_file())
+        assert resilience.breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            await service.process_passport_photo(make_file())
+
+    assert post.call_count == 3
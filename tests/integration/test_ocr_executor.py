@@ -0,0 +1,86 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from mindee.input.polling_options import PollingOptions
+
+from app.services.mindee import MindeeService
+from app.services.ocr_executor import OCRExecutor, OCRTimeoutError
+
+MINDEE_LATENCY = 0.3
+
+
+class FakeField:
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return str(self.value)
+
+
+def slow_mindee_inference(*args, **kwargs):
+    """Mimics the blocking polling of the Mindee client until the inference is ready."""
+    time.sleep(MINDEE_LATENCY)
+    fields = {
+        "given_names": FakeField("John"),
+        "surnames": FakeField("Doe"),
+        "passport_number": FakeField("AB123456"),
+    }
+    return SimpleNamespace(inference=SimpleNamespace(result=SimpleNamespace(fields=fields)))
+
+
+@pytest.mark.asyncio
+async def test_concurrent_uploads_finish_in_time_of_one():
+    """N concurrent passport uploads should take roughly as long as a single one."""
+    uploads = 4
+    with (
+        patch("app.services.mindee.ClientV2") as mock_client_constructor,
+        patch("app.services.mindee.ocr_executor", OCRExecutor(max_concurrency=uploads, timeout=5)),
+    ):
+        client = mock_client_constructor.return_value
+        client.get_job.return_value.job.status = "Processed"
+        client.get_result.side_effect = slow_mindee_inference
+        service = MindeeService(api_key="fake-key", model_id="fake-model")
+        service.params.polling_options = PollingOptions(initial_delay_sec=0, delay_sec=0)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(service.process_passport_photo(b"photo") for _ in range(uploads)))
+        elapsed = time.perf_counter() - started
+
+    assert all(result.given_names == "John" for result in results)
+    assert elapsed < MINDEE_LATENCY * 2
+
+
+@pytest.mark.asyncio
+async def test_event_loop_stays_responsive_during_ocr():
+    """The event loop keeps serving other tasks while an OCR job is running."""
+    executor = OCRExecutor(max_concurrency=1, timeout=5)
+    ocr_job = asyncio.create_task(executor.run(time.sleep, MINDEE_LATENCY))
+
+    started = time.perf_counter()
+    await asyncio.sleep(0.01)
+    assert time.perf_counter() - started < MINDEE_LATENCY
+
+    await ocr_job
+
+
+@pytest.mark.asyncio
+async def test_ocr_job_timeout():
+    """A job that exceeds its deadline raises OCRTimeoutError."""
+    executor = OCRExecutor(max_concurrency=1, timeout=5)
+    with pytest.raises(OCRTimeoutError):
+        await executor.run(time.sleep, MINDEE_LATENCY, timeout=0.05)
+
+
+@pytest.mark.asyncio
+async def test_abandoned_job_keeps_its_slot():
+    """After a timeout the next job waits for the thread to finish, and its deadline starts only then."""
+    executor = OCRExecutor(max_concurrency=1, timeout=5)
+    with pytest.raises(OCRTimeoutError):
+        await executor.run(time.sleep, MINDEE_LATENCY, timeout=0.05)
+
+    started = time.perf_counter()
+    assert await executor.run(lambda: "done", timeout=0.1) == "done"
+    assert time.perf_counter() - started > MINDEE_LATENCY / 2  # Waited for the abandoned job's thread
@@ -0,0 +1,182 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.redis import RedisEventIsolation
+from aiogram.types import PhotoSize
+from fakeredis import FakeAsyncRedis
+
+import app.keyboard as kb
+from app.config import s
+from app.models import PassportData
+from app.processors import PhotoProcessor
+from app.services.ocr_queue import OCRJob, OCRQueue
+from app.storage import SessionStorage
+from app.worker import FAILED_TEXT, OCRWorker
+
+PHOTO = PhotoSize(file_id="passport", file_unique_id="p", width=1280, height=960)
+
+
+def make_worker(redis: FakeAsyncRedis, consumer: str = "worker-1") -> OCRWorker:
+    bot = AsyncMock()
+    bot.id = 42
+    queue = OCRQueue(redis)
+    return OCRWorker(queue, bot, SessionStorage(redis=redis), RedisEventIsolation(redis=redis), 2, consumer=consumer)
+
+
+def user_state(redis: FakeAsyncRedis) -> FSMContext:
+    return FSMContext(storage=SessionStorage(redis=redis), key=StorageKey(bot_id=42, chat_id=7, user_id=7))
+
+
+@pytest.mark.asyncio
+async def test_worker_delivers_result_by_editing_processing_message():
+    """A queued photo is recognized by a worker, stored in the user's FSM data and shown in place."""
+    redis = FakeAsyncRedis()
+    worker = make_worker(redis)
+    await worker.queue.ensure_group()
+    job = OCRJob(chat_id=7, user_id=7, message_id=100, doc_type="passport", photo=PHOTO)
+    await user_state(redis).update_data(ocr_job_id=job.job_id)
+    await worker.queue.enqueue(job)
+    passport = PassportData(given_names="John", surnames="Doe")
+
+    with patch.object(PhotoProcessor, "recognize_photo", AsyncMock(return_value=("John Doe", True, passport))):
+        await worker.poll(block=10)
+        await worker.drain()
+
+    data = await user_state(redis).get_data()
+    assert data["passport_data"]["given_names"] == "John"
+    assert data["ocr_job_id"] is None
+    worker.bot.edit_message_text.assert_called_once_with(
+        "John Doe", chat_id=7, message_id=100, reply_markup=kb.document_confirm_kb
+    )
+    assert await redis.xlen(worker.queue.stream) == 0
+
+
+@pytest.mark.asyncio
+async def test_worker_drops_superseded_result():
+    """If the user has sent another photo or cancelled, the old result is not applied."""
+    redis = FakeAsyncRedis()
+    worker = make_worker(redis)
+    await worker.queue.ensure_group()
+    job = OCRJob(chat_id=7, user_id=7, message_id=100, doc_type="passport", photo=PHOTO)
+    await user_state(redis).update_data(ocr_job_id="newer-job")
+    await worker.queue.enqueue(job)
+
+    with patch.object(PhotoProcessor, "recognize_photo", AsyncMock(return_value=("John Doe", True, PassportData()))):
+        await worker.poll(block=10)
+        await worker.drain()
+
+    assert "passport_data" not in await user_state(redis).get_data()
+    worker.bot.delete_message.assert_called_once_with(chat_id=7, message_id=100)
+    worker.bot.edit_message_text.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_jobs_of_a_crashed_worker_are_claimed():
+    """A job taken by a worker that never finished it is picked up by another worker."""
+    redis = FakeAsyncRedis()
+    crashed, worker = make_worker(redis, "crashed"), make_worker(redis, "alive")
+    await worker.queue.ensure_group()
+    job = OCRJob(chat_id=7, user_id=7, message_id=100, doc_type="passport", photo=PHOTO)
+    await worker.queue.enqueue(job)
+    assert len(await crashed.queue.read("crashed", count=1, block=10)) == 1
+
+    recognize = AsyncMock(return_value=("John Doe", True, PassportData()))
+    with patch.object(s, "ocr_job_claim_idle", 0), patch.object(PhotoProcessor, "recognize_photo", recognize):
+        await worker.poll(block=10)
+        await worker.drain()
+
+    recognize.assert_called_once()
+    assert await redis.xlen(worker.queue.stream) == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_job_is_acked_once_the_user_is_told():
+    """A job that fails is acknowledged after the error is shown; if even that fails, it stays pending."""
+    redis = FakeAsyncRedis()
+    worker = make_worker(redis)
+    await worker.queue.ensure_group()
+    job = OCRJob(chat_id=7, user_id=7, message_id=100, doc_type="passport", photo=PHOTO)
+    await user_state(redis).update_data(ocr_job_id=job.job_id)
+    await worker.queue.enqueue(job)
+
+    recognize = AsyncMock(side_effect=RuntimeError("Telegram is down"))
+    worker.bot.edit_message_text.side_effect = RuntimeError("Telegram is down")
+    with patch.object(PhotoProcessor, "recognize_photo", recognize):
+        await worker.poll(block=10)
+        await worker.drain()
+    assert (await redis.xpending(worker.queue.stream, worker.queue.group))["pending"] == 1
+
+    worker.bot.edit_message_text.side_effect = None
+    with patch.object(s, "ocr_job_claim_idle", 0), patch.object(PhotoProcessor, "recognize_photo", recognize):
+        await worker.poll(block=10)
+        await worker.drain()
+    worker.bot.edit_message_text.assert_called_with(FAILED_TEXT, chat_id=7, message_id=100)
+    assert (await user_state(redis).get_data())["ocr_job_id"] is None
+    assert await redis.xlen(worker.queue.stream) == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_job_stays_pending():
+    """A job interrupted by the worker shutting down is left for another worker."""
+    redis = FakeAsyncRedis()
+    worker = make_worker(redis)
+    await worker.queue.ensure_group()
+    await worker.queue.enqueue(OCRJob(chat_id=7, user_id=7, message_id=100, doc_type="passport", photo=PHOTO))
+
+    with patch.object(PhotoProcessor, "recognize_photo", AsyncMock(side_effect=asyncio.CancelledError)):
+        await worker.poll(block=10)
+        await worker.drain()
+
+    assert (await redis.xpending(worker.queue.stream, worker.queue.group))["pending"] == 1
+
+
+@pytest.mark.asyncio
+async def test_job_that_always_fails_is_dead_lettered():
+    """A job whose outcome can never be shown is redelivered a limited number of times, then set aside."""
+    redis = FakeAsyncRedis()
+    worker = make_worker(redis)
+    await worker.queue.ensure_group()
+    job = OCRJob(chat_id=7, user_id=7, message_id=100, doc_type="passport", photo=PHOTO)
+    await user_state(redis).update_data(ocr_job_id=job.job_id)
+    await worker.queue.enqueue(job)
+
+    recognize = AsyncMock(side_effect=RuntimeError("Telegram is down"))
+    worker.bot.edit_message_text.side_effect = worker.bot.delete_message.side_effect = RuntimeError("Telegram is down")
+    with (
+        patch.object(s, "ocr_job_claim_idle", 0),
+        patch.object(s, "ocr_job_max_deliveries", 3),
+        patch.object(PhotoProcessor, "recognize_photo", recognize),
+    ):
+        for _ in range(6):
+            await worker.poll(block=10)
+            await worker.drain()
+
+    assert recognize.call_count == 3
+    assert await redis.xlen(worker.queue.stream) == 0
+    assert await redis.xlen(worker.queue.dead_stream) == 1
+
+
+@pytest.mark.asyncio
+async def test_job_of_a_user_who_blocked_the_bot_is_acked():
+    """Telegram refusing the result is final, so the job is not recognized again."""
+    redis = FakeAsyncRedis()
+    worker = make_worker(redis)
+    await worker.queue.ensure_group()
+    job = OCRJob(chat_id=7, user_id=7, message_id=100, doc_type="passport", photo=PHOTO)
+    await user_state(redis).update_data(ocr_job_id=job.job_id)
+    await worker.queue.enqueue(job)
+
+    worker.bot.edit_message_text.side_effect = TelegramForbiddenError(
+        method=AsyncMock(), message="Forbidden: bot was blocked by the user"
+    )
+    recognize = AsyncMock(return_value=("John Doe", True, PassportData()))
+    with patch.object(PhotoProcessor, "recognize_photo", recognize):
+        await worker.poll(block=10)
+        await worker.drain()
+
+    recognize.assert_called_once()
+    assert await redis.xlen(worker.queue.stream) == 0
@@ -1,9 +1,12 @@
 from unittest.mock import AsyncMock, patch
 
+import httpx
 import pytest
+from openai import InternalServerError
 
 from app.models import PassportData, VehicleDocumentData
-from app.services.openai import OpenAIService
+from app.services.openai import CONVERSATION_ERROR_REPLY, SERVICE_BUSY_REPLY, OpenAIService, openai_resilience
+from app.services.resilience import CircuitBreaker
 
 
 @pytest.mark.asyncio
@@ -21,6 +24,9 @@ async def test_generate_policy_text_mocks_api_call():
         mock_client.chat.completions.create.return_value.choices = [
             type("obj", (), {"message": type("obj", (), {"content": "<b>Mocked Policy HTML</b>"})})
         ]
+        mock_client.chat.completions.create.return_value.usage = type(
+            "obj", (), {"prompt_tokens": 120, "completion_tokens": 80}
+        )
         mock_openai_constructor.return_value = mock_client
 
         # 3. Instantiate our service (it will now use the mocked client)
@@ -36,3 +42,55 @@ async def test_generate_policy_text_mocks_api_call():
         # Assert: Verify the outcome
         mock_client.chat.completions.create.assert_called_once()
         assert "<b>Mocked Policy HTML</b>" in result
+
+
+def make_chunk(content):
+    return type("obj", (), {"choices": [type("obj", (), {"delta": type("obj", (), {"content": content})})]})
+
+
+@pytest.mark.asyncio
+async def test_stream_policy_text_yields_growing_text():
+    """
+    Tests that OpenAIService.stream_policy_text yields the accumulated policy after every streamed chunk.
+    """
+    # Arrange: Mock the client to return an async stream of chunks
+    with patch("app.services.openai.AsyncOpenAI") as mock_openai_constructor:
+        mock_client = AsyncMock()
+
+        async def mock_stream():
+            for content in ["📜 <b>Car ", "Insurance", " Policy</b>", None]:
+                yield make_chunk(content)
+
+        mock_client.chat.completions.create.return_value = mock_stream()
+        mock_openai_constructor.return_value = mock_client
+
+        service = OpenAIService(api_key="fake-key", model="gpt-4o-mini")
+        passport_data = PassportData(given_names="John", surnames="Doe")
+        vehicle_data = VehicleDocumentData(model="Tesla", reg_number="A123")
+
+        # Act
+        snapshots = [text async for text in service.stream_policy_text(passport_data, vehicle_data)]
+
+        # Assert
+        assert mock_client.chat.completions.create.call_args.kwargs["stream"] is True
+        assert snapshots == ["📜 <b>Car", "📜 <b>Car Insurance", "📜 <b>Car Insurance Policy</b>"]
+
+
+@pytest.mark.asyncio
+async def test_conversational_reply_fails_fast_when_openai_is_down():
+    """While the OpenAI circuit breaker is open, users get a "busy" reply without an API call."""
+    with (
+        patch("app.services.openai.AsyncOpenAI") as mock_openai_constructor,
+        patch.object(openai_resilience, "breaker", CircuitBreaker("openai", failure_threshold=1, reset_timeout=60)),
+    ):
+        mock_client = AsyncMock()
+        mock_client.chat.completions.create.side_effect = InternalServerError(
+            "Service unavailable", response=httpx.Response(503, request=httpx.Request("POST", "https://api")), body=None
+        )
+        mock_openai_constructor.return_value = mock_client
+        service = OpenAIService(api_key="fake-key", model="gpt-4o-mini")
+
+        assert await service.generate_conversational_reply("hello") == CONVERSATION_ERROR_REPLY
+        assert await service.generate_conversational_reply("hello") == SERVICE_BUSY_REPLY
+
+    mock_client.chat.completions.create.assert_called_once()
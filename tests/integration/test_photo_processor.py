@@ -1,9 +1,21 @@
+from io import BytesIO
 from unittest.mock import AsyncMock, patch
 
 import pytest
 
-from app.models import PassportData
-from app.processors import PhotoProcessor
+from app.models import PassportData, VehicleDocumentData
+from app.processors import WRONG_DOCUMENT_TEXTS, PhotoProcessor
+from app.session import Session
+
+# Complete and valid, so validation has nothing to warn about
+VALID_PASSPORT = PassportData(
+    given_names="John",
+    surnames="Doe",
+    date_of_birth="1990-01-01",
+    passport_number="AB123456",
+    date_of_issue="2020-01-01",
+    date_of_expiry="2035-01-01",
+)
 
 
 @pytest.mark.asyncio
@@ -12,27 +24,31 @@ async def test_process_photo_success():
     # Arrange: Mock the bot, message, and state
     mock_bot = AsyncMock()
     mock_message = AsyncMock()
-    mock_state = AsyncMock()
-
-    # Setup mock for state.get_data to return an empty dict
-    mock_state.get_data.return_value = {}
+    session = Session()
 
     # Create a mock for the Mindee data
-    mock_mindee_data = PassportData(given_names="John", surnames="Doe")
+    mock_mindee_data = VALID_PASSPORT
 
     # Patch the download_user_photo function to return a mock file-like object
+    downloaded = BytesIO(b"photo")
     with (
-        patch("app.processors.download_user_photo", new_callable=AsyncMock),
-        patch("app.processors.MindeeService") as mock_mindee_service,
+        patch("app.processors.download_user_photo", new_callable=AsyncMock, return_value=downloaded),
+        patch("app.processors.image_preprocessor") as mock_preprocessor,
+        patch("app.processors.classify_document", new_callable=AsyncMock, return_value="passport"),
+        patch("app.processors.mindee_registry") as mock_mindee_registry,
+        patch("app.processors.ocr_cache") as mock_ocr_cache,
     ):
-        mock_mindee_instance = mock_mindee_service.return_value
+        mock_ocr_cache.get = AsyncMock(return_value=None)
+        mock_ocr_cache.set = AsyncMock()
+        mock_preprocessor.run = AsyncMock(return_value=BytesIO(b"small photo"))
+        mock_mindee_instance = mock_mindee_registry.get.return_value
 
         async def mock_async_process(*args, **kwargs):
             return mock_mindee_data
 
         mock_mindee_instance.process_passport_photo = mock_async_process
         # Act: Call the process_photo method
-        text, success, data_obj = await PhotoProcessor.process_photo(mock_message, mock_state, mock_bot, "passport")
+        text, success, data_obj = await PhotoProcessor.process_photo(mock_message, session, mock_bot, "passport")
 
         # Assert: Check that the method returns the expected text and success status
         assert success is True
@@ -42,3 +58,180 @@ async def test_process_photo_success():
         # Check that bot delete message
         mock_message.answer.assert_called_with("✨ Photo received, processing...")
         mock_message.answer.return_value.delete.assert_called_once()
+        # The download is released once the preprocessed copy has been recognized
+        assert downloaded.closed
+        # Check that the result was cached for the next upload of the same photo
+        mock_ocr_cache.set.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_process_photo_cache_hit_skips_mindee():
+    """A photo that was already recognized is served from the OCR cache without downloading it."""
+    mock_bot = AsyncMock()
+    mock_message = AsyncMock()
+    session = Session()
+    cached_data = VALID_PASSPORT
+
+    with (
+        patch("app.processors.download_user_photo", new_callable=AsyncMock) as mock_download,
+        patch("app.processors.mindee_registry") as mock_mindee_registry,
+        patch("app.processors.ocr_cache") as mock_ocr_cache,
+    ):
+        mock_ocr_cache.get = AsyncMock(return_value=cached_data)
+
+        text, success, data_obj = await PhotoProcessor.process_photo(mock_message, session, mock_bot, "passport")
+
+    assert success is True
+    assert data_obj == cached_data
+    assert "John" in text
+    mock_download.assert_not_called()
+    mock_mindee_registry.get.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    ("doc_type", "detected", "rejected"), [("vehicle", "passport", True), ("passport", "unknown", False)]
+)
+@pytest.mark.asyncio
+async def test_process_photo_rejects_wrong_document_before_mindee(doc_type, detected, rejected):
+    """A passport sent instead of the vehicle document is caught locally; a photo the classifier is unsure of is not."""
+    mock_bot = AsyncMock()
+    mock_message = AsyncMock()
+    session = Session()
+
+    with (
+        patch("app.processors.s.document_classifier", True),
+        patch("app.processors.download_user_photo", new_callable=AsyncMock, return_value=BytesIO(b"photo")),
+        patch("app.processors.image_preprocessor") as mock_preprocessor,
+        patch("app.processors.classify_document", new_callable=AsyncMock, return_value=detected),
+        patch("app.processors.mindee_registry") as mock_mindee_registry,
+        patch("app.processors.ocr_cache") as mock_ocr_cache,
+    ):
+        mock_ocr_cache.get = AsyncMock(return_value=None)
+        mock_ocr_cache.set = AsyncMock()
+        mock_preprocessor.run = AsyncMock(return_value=BytesIO(b"small photo"))
+        mock_mindee_registry.get.return_value.process_passport_photo = AsyncMock(return_value=None)
+
+        text, success, data_obj = await PhotoProcessor.process_photo(mock_message, session, mock_bot, doc_type)
+
+    assert success is False
+    if rejected:
+        mock_mindee_registry.get.assert_not_called()
+        mock_message.answer.return_value.edit_text.assert_called_once_with(WRONG_DOCUMENT_TEXTS[doc_type])
+    else:
+        mock_mindee_registry.get.return_value.process_passport_photo.assert_awaited_once()
+
+
+@pytest.mark.parametrize(
+    ("classified", "recognize_calls"),
+    [
+        ({b"vehicle_photo": "unknown", b"passport_photo": "passport"}, 2),
+        # The passport's MRZ was not found: the other order is tried because only one side was read,
+        # and that one is not a valid vehicle document
+        ({b"vehicle_photo": "unknown", b"passport_photo": "unknown"}, 4),
+    ],
+)
+@pytest.mark.asyncio
+async def test_process_document_pair_detects_swapped_order(classified, recognize_calls):
+    """Both documents sent together are recognized concurrently, whichever order they were sent in."""
+    mock_bot = AsyncMock()
+    mock_message = AsyncMock()
+    passport_data = VALID_PASSPORT
+    vehicle_data = VehicleDocumentData(
+        vin="1HGCM82633A004352",
+        vehicle_make_and_model="Tesla Model S",
+        registration_number="AA0000BB",
+        document_series_and_number="CXX123456",
+    )
+    # The vehicle document was sent first, the passport second
+    recognized = {
+        ("vehicle_photo", "vehicle"): vehicle_data,
+        ("passport_photo", "passport"): passport_data,
+        ("passport_photo", "vehicle"): VehicleDocumentData(vin="P<UTODOE<<JOHN"),  # Misread from the passport
+    }
+
+    downloads = []
+
+    async def mock_download(photo, bot, name):
+        downloads.append(BytesIO(photo.encode()))
+        return downloads[-1]
+
+    async def mock_classify(file):
+        return classified[file.getvalue()]
+
+    async def mock_recognize(photo, bot, doc_type, file=None, check_type=True):
+        return recognized.get((photo, doc_type))
+
+    with (
+        patch("app.processors.s.document_classifier", True),
+        patch("app.processors.download_user_photo", side_effect=mock_download),
+        patch("app.processors.classify_document", side_effect=mock_classify),
+        patch.object(PhotoProcessor, "_recognize", side_effect=mock_recognize) as mock_recognize_method,
+    ):
+        text, success, documents = await PhotoProcessor.process_document_pair(
+            mock_message, mock_bot, ["vehicle_photo", "passport_photo"]
+        )
+
+    assert success is True
+    assert documents == (passport_data, vehicle_data)
+    assert "John" in text
+    assert "Tesla Model S" in text
+    assert mock_recognize_method.call_count == recognize_calls
+    assert all(file.closed for file in downloads)
+
+
+@pytest.mark.asyncio
+async def test_process_photo_local_ocr_skips_mindee():
+    """A passport whose MRZ is read locally with valid check digits never reaches Mindee."""
+    mock_bot = AsyncMock()
+    mock_message = AsyncMock()
+    session = Session()
+    local_data = PassportData(
+        given_names="ANNA MARIA",
+        surnames="ERIKSSON",
+        date_of_birth="1974-08-12",
+        passport_number="L898902C3",
+        date_of_issue=None,
+        date_of_expiry="2034-04-15",
+    )
+
+    with (
+        patch("app.processors.s.local_ocr", True),
+        patch("app.processors.download_user_photo", new_callable=AsyncMock, return_value=BytesIO(b"photo")),
+        patch("app.processors.image_preprocessor") as mock_preprocessor,
+        patch("app.processors.classify_document", new_callable=AsyncMock, return_value="passport"),
+        patch("app.processors.local_reader") as mock_local_reader,
+        patch("app.processors.mindee_registry") as mock_mindee_registry,
+        patch("app.processors.ocr_cache") as mock_ocr_cache,
+    ):
+        mock_ocr_cache.get = AsyncMock(return_value=None)
+        mock_ocr_cache.set = AsyncMock()
+        mock_preprocessor.run = AsyncMock(return_value=BytesIO(b"small photo"))
+        mock_local_reader.read = AsyncMock(return_value=local_data)
+
+        text, success, data_obj = await PhotoProcessor.process_photo(mock_message, session, mock_bot, "passport")
+
+    assert success is True
+    # The MRZ has no date of issue, which is pointed out to the user
+    assert data_obj == local_data.model_copy(update={"warnings": ["The date of issue wasn't recognized."]})
+    assert "ERIKSSON" in text
+    mock_mindee_registry.get.assert_not_called()
+    mock_ocr_cache.set.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_process_photo_rejects_expired_passport_before_confirmation():
+    """Data that fails validation is rejected with the reason instead of being shown for confirmation."""
+    mock_bot = AsyncMock()
+    mock_message = AsyncMock()
+    expired = PassportData(given_names="John", surnames="Doe", passport_number="AB123456", date_of_expiry="2020-01-01")
+
+    with patch("app.processors.ocr_cache") as mock_ocr_cache:
+        mock_ocr_cache.get = AsyncMock(return_value=expired)
+
+        text, success, data_obj = await PhotoProcessor.process_photo(mock_message, Session(), mock_bot, "passport")
+
+    assert (success, data_obj) == (False, None)
+    mock_message.answer.return_value.edit_text.assert_called_once_with(
+        "🛑 The passport expired on 2020-01-01, a valid passport is needed for the policy.\n"
+        "Please send a clear photo of your passport."
+    )
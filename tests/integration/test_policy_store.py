@@ -0,0 +1,75 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.handlers import handle_my_policies, handle_policy_choice
+from app.models import PassportData, VehicleDocumentData
+from app.services.policy_store import PostgresPolicyRepository, SQLitePolicyRepository, StoredPolicy
+
+PASSPORT = PassportData(given_names="John", surnames="Doe", passport_number="AB123456")
+VEHICLES = [
+    VehicleDocumentData(vin="1HGCM82633A004352", vehicle_make_and_model="Tesla Model S"),
+    VehicleDocumentData(vin="1M8GDM9AXKP042788", vehicle_make_and_model="Volvo XC90"),
+]
+
+
+@pytest.fixture
+async def repository(tmp_path):
+    repository = SQLitePolicyRepository(f"sqlite:///{tmp_path}/db/policies.db")
+    yield repository
+    await repository.close()
+
+
+@pytest.mark.asyncio
+async def test_policies_are_found_by_user_passport_and_vin(repository):
+    await repository.add_many(
+        [StoredPolicy.issue(7, PASSPORT, vehicle, f"<b>{vehicle.vin}</b>") for vehicle in VEHICLES]
+    )
+    await repository.add(
+        StoredPolicy.issue(8, PASSPORT.model_copy(update={"passport_number": "ZZ999999"}), VEHICLES[0], "x")
+    )
+
+    policies = await repository.find_by_user(7)
+    assert [policy.vin for policy in policies] == ["1M8GDM9AXKP042788", "1HGCM82633A004352"]  # Newest first
+    assert policies[0].holder == "John Doe" and policies[0].vehicle_model == "Volvo XC90"
+    assert await repository.get(policies[1].id) == policies[1]
+    assert [policy.user_id for policy in await repository.find_by_vin("1HGCM82633A004352")] == [8, 7]
+    assert len(await repository.find_by_passport_number("AB123456", limit=1)) == 1
+    assert await repository.find_by_user(9) == []
+
+    plan = await repository._fetch("EXPLAIN QUERY PLAN SELECT * FROM policies WHERE vin = ?", "x")
+    assert "policies_vin_idx" in plan[0][-1]
+
+
+def test_postgres_placeholders():
+    assert PostgresPolicyRepository._numbered("a = ? AND b = ? LIMIT ?") == "a = $1 AND b = $2 LIMIT $3"
+
+
+@pytest.mark.asyncio
+async def test_my_policies_resends_only_own_policies(repository):
+    """/mypolicies lists the user's policies and a chosen one is sent again as it was issued."""
+    await repository.add_many(
+        [StoredPolicy.issue(7, PASSPORT, vehicle, f"<b>{vehicle.vin}</b>") for vehicle in VEHICLES]
+    )
+    message = AsyncMock()
+    message.from_user.id = 7
+
+    with patch("app.handlers.policy_repository", repository):
+        await handle_my_policies(message)
+        keyboard = message.answer.call_args.kwargs["reply_markup"].inline_keyboard
+        assert len(keyboard) == 2
+
+        callback = AsyncMock(data=keyboard[1][0].callback_data)
+        callback.from_user.id = 7
+        await handle_policy_choice(callback)
+        callback.message.answer.assert_awaited_once_with("<b>1HGCM82633A004352</b>", parse_mode="HTML")
+
+        callback = AsyncMock(data=keyboard[1][0].callback_data)
+        callback.from_user.id = 8
+        await handle_policy_choice(callback)
+        callback.message.answer.assert_not_awaited()
+        callback.answer.assert_awaited_once_with("🛑 This policy was not found.", show_alert=True)
+
+        callback = AsyncMock(data="policy:forged")
+        await handle_policy_choice(callback)
+        callback.answer.assert_awaited_once_with("🛑 This policy was not found.", show_alert=True)
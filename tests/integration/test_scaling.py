@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.redis import RedisEventIsolation, RedisStorage
+from aiogram.types import Message, Update
+from fakeredis import FakeAsyncRedis
+
+from app.middlewares import DeduplicationMiddleware
+from app.storage import ChatEventIsolation
+
+
+def make_update(update_id: int, text: str = "hello") -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 1700000000,
+                "chat": {"id": 42, "type": "private"},
+                "from": {"id": 42, "is_bot": False, "first_name": "John"},
+                "text": text,
+            },
+        }
+    )
+
+
+def make_dispatcher(redis: FakeAsyncRedis, router: Router) -> Dispatcher:
+    """A dispatcher wired the same way as app.main, on top of a shared (fake) Redis."""
+    dispatcher = Dispatcher(storage=RedisStorage(redis=redis), events_isolation=RedisEventIsolation(redis=redis))
+    dispatcher.update.outer_middleware(DeduplicationMiddleware(redis, ttl=60))
+    dispatcher.include_router(router)
+    return dispatcher
+
+
+@pytest.mark.asyncio
+async def test_duplicate_update_is_handled_once_across_workers():
+    """The same update delivered to two workers should only be handled by one of them."""
+    redis = FakeAsyncRedis()
+    handled = []
+    router = Router()
+
+    @router.message()
+    async def record_message(message: Message):
+        handled.append(message.message_id)
+
+    worker_a = make_dispatcher(redis, router)
+    worker_b = make_dispatcher(redis, Router())
+    bot = Bot(token="42:TEST")
+
+    await worker_a.feed_update(bot, make_update(1))
+    await worker_b.feed_update(bot, make_update(1))
+
+    assert handled == [1]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_updates_of_one_chat_do_not_clobber_fsm_data():
+    """Read-modify-write of FSM data from concurrent updates should be serialized per chat."""
+    redis = FakeAsyncRedis()
+    router = Router()
+
+    @router.message()
+    async def count_message(message: Message, state: FSMContext):
+        data = await state.get_data()
+        await asyncio.sleep(0.01)  # e.g. waiting for OCR between the read and the write
+        await state.update_data(counter=data.get("counter", 0) + 1)
+
+    dispatcher = make_dispatcher(redis, router)
+    bot = Bot(token="42:TEST")
+
+    await asyncio.gather(*(dispatcher.feed_update(bot, make_update(update_id)) for update_id in range(1, 6)))
+
+    state = dispatcher.fsm.get_context(bot, chat_id=42, user_id=42)
+    assert (await state.get_data())["counter"] == 5
+
+
+@pytest.mark.asyncio
+async def test_background_batch_keeps_the_chat_lock_past_its_timeout():
+    """A fleet upload holds the chat's lock for as long as it runs, while updates still use the timeout."""
+    redis = FakeAsyncRedis()
+    isolation = ChatEventIsolation(redis=redis, lock_kwargs={"timeout": 0.3})
+    key = StorageKey(bot_id=42, chat_id=7, user_id=7)
+
+    async with isolation.hold(key):
+        await asyncio.sleep(0.6)
+        assert await redis.exists(isolation.key_builder.build(key, "lock"))
+    assert not await redis.exists(isolation.key_builder.build(key, "lock"))
@@ -0,0 +1,176 @@
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.types import Message, Update
+from fakeredis import FakeAsyncRedis
+
+from app.middlewares import SessionMiddleware
+from app.models import PassportData, VehicleDocumentData
+from app.services.session_sweeper import SessionSweeper
+from app.session import Session
+from app.states import Form
+from app.storage import SessionStorage
+
+KEY = StorageKey(bot_id=42, chat_id=7, user_id=7)
+
+
+def make_update(update_id: int) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 1700000000,
+                "chat": {"id": 7, "type": "private"},
+                "from": {"id": 7, "is_bot": False, "first_name": "John"},
+                "text": "hello",
+            },
+        }
+    )
+
+
+@pytest.mark.asyncio
+async def test_session_round_trips_documents():
+    """Documents saved through a session are loaded back as the same models."""
+    state = FSMContext(storage=SessionStorage(redis=FakeAsyncRedis()), key=KEY)
+    passport = PassportData(given_names="John", surnames="Doe")
+    vehicle = VehicleDocumentData(vin="123XYZ", vehicle_make_and_model="Tesla Model S")
+
+    session = await Session.load(state)
+    session.store_document("passport", passport)
+    session.store_document("vehicle", vehicle)
+    await session.save(state)
+
+    loaded = await Session.load(state)
+    assert loaded.passport_data == passport
+    assert loaded.vehicle_document_data == vehicle
+    assert not loaded.is_dirty
+
+
+@pytest.mark.asyncio
+async def test_middleware_writes_only_changed_fields():
+    """A handler's changes are saved after it ran, without rewriting the fields it didn't touch."""
+    redis = FakeAsyncRedis()
+    storage = SessionStorage(redis=redis)
+    state = FSMContext(storage=storage, key=KEY)
+    await state.update_data(passport_data={"given_names": "John"}, is_changing=True)
+
+    router = Router()
+    router.message.middleware(SessionMiddleware())
+
+    @router.message()
+    async def remember_message(message: Message, session: Session):
+        assert session.passport_data.given_names == "John"
+        session.msg_to_edit_id = message.message_id
+        # Changed behind the session's back, e.g. by an OCR worker: must survive the save
+        await storage.save_fields(KEY, {"is_changing": False})
+
+    dispatcher = Dispatcher(storage=storage)
+    dispatcher.include_router(router)
+    await dispatcher.feed_update(Bot(token="42:TEST"), make_update(5))
+
+    data = await state.get_data()
+    assert data["msg_to_edit_id"] == 5
+    assert data["is_changing"] is False
+    assert data["passport_data"]["given_names"] == "John"
+
+
+@pytest.mark.asyncio
+async def test_middleware_drops_changes_of_a_failed_handler():
+    """A handler that raises halfway leaves the stored data as it was."""
+    storage = SessionStorage(redis=FakeAsyncRedis())
+    state = FSMContext(storage=storage, key=KEY)
+    await state.update_data(passport_data={"given_names": "John"})
+
+    router = Router()
+    router.message.middleware(SessionMiddleware())
+
+    @router.message()
+    async def fail_halfway(message: Message, session: Session):
+        session.passport_data = None
+        raise RuntimeError("Telegram is down")
+
+    dispatcher = Dispatcher(storage=storage)
+    dispatcher.include_router(router)
+    with pytest.raises(RuntimeError):
+        await dispatcher.feed_update(Bot(token="42:TEST"), make_update(5))
+
+    assert (await state.get_data())["passport_data"]["given_names"] == "John"
+
+
+@pytest.mark.asyncio
+async def test_cleared_session_empties_storage():
+    """Clearing a session drops the stored data, including fields set before the clear."""
+    state = FSMContext(storage=SessionStorage(redis=FakeAsyncRedis()), key=KEY)
+    await state.update_data(msg_to_edit_id=1, ocr_job_id="job")
+
+    session = await Session.load(state)
+    session.clear()
+    session.is_changing = True
+    await session.save(state)
+
+    assert await state.get_data() == {"is_changing": True}
+
+
+@pytest.mark.asyncio
+async def test_data_expires_with_its_state():
+    """Data written in a state gets the state's TTL, and entering another state restarts both."""
+    redis = FakeAsyncRedis()
+    storage = SessionStorage(redis=redis, state_ttls={Form.waiting_for_summary_confirmation.state: 60}, state_ttl=3600)
+    state = FSMContext(storage=storage, key=KEY)
+
+    await state.set_state(Form.waiting_for_summary_confirmation)
+    await storage.save_fields(KEY, {"passport_data": {"given_names": "John"}})
+    state_key, session_key = storage.key_builder.build(KEY, "state"), storage.key_builder.build(KEY, "session")
+    assert 0 < await redis.ttl(session_key) <= 60
+
+    await state.set_state(Form.waiting_for_passport)
+    assert await redis.ttl(state_key) > 60
+    assert await redis.ttl(session_key) > 60
+
+
+@pytest.mark.asyncio
+async def test_key_count_stays_flat_under_churn_of_abandoned_sessions():
+    """Thousands of conversations abandoned after the passport leave no keys behind once their TTL is over."""
+    redis = FakeAsyncRedis()
+    storage = SessionStorage(redis=redis, state_ttl=3600)
+    wave_size = 1000
+    key_counts = []
+    clock = SimpleNamespace(now=time.time())
+
+    # fakeredis reads the clock for every command, so whole hours pass instantly
+    with patch("fakeredis._socket._base.time", SimpleNamespace(time=lambda: clock.now)):
+        for wave in range(3):
+            for chat_id in range(wave * wave_size, (wave + 1) * wave_size):
+                key = StorageKey(bot_id=42, chat_id=chat_id, user_id=chat_id)
+                await storage.set_state(key, Form.waiting_for_passport)
+                await storage.save_fields(key, {"passport_data": {"given_names": "John"}})
+            key_counts.append(await redis.dbsize())
+            clock.now += 3601
+
+        assert key_counts == [2 * wave_size] * 3
+        assert await redis.dbsize() == 0
+
+
+@pytest.mark.asyncio
+async def test_sweeper_counts_keys_and_gives_ttl_to_keys_without_one():
+    """Keys written before TTLs were configured get one, so their data can't stay forever."""
+    redis = FakeAsyncRedis()
+    state = FSMContext(storage=SessionStorage(redis=redis, state_ttl=3600), key=KEY)
+    await state.set_state(Form.waiting_for_passport)
+    await state.update_data(is_changing=False)
+    legacy_key = "fsm:42:8:data"
+    await redis.set(legacy_key, '{"passport_data": {}}')  # The format before the session layer
+    await redis.set("throttle:ocr:global", "1")  # Not an FSM key
+
+    report = await SessionSweeper(redis, default_ttl=600, interval=60, batch_size=2).sweep()
+
+    assert report.keys == {"state": 1, "session": 1, "data": 1}
+    assert report.ttl_added == 1
+    assert 0 < await redis.ttl(legacy_key) <= 600
+    assert await redis.ttl("throttle:ocr:global") == -1
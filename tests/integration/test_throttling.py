@@ -0,0 +1,81 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import Message, User
+from fakeredis import FakeAsyncRedis
+
+from app.handlers import handle_price_confirmation
+from app.middlewares import RateLimit, ThrottlingMiddleware, TokenBucketLimiter
+from app.middlewares.throttling import USER_THROTTLED_TEXT
+from app.models import PassportData, VehicleDocumentData
+from app.session import Session
+
+
+def make_limiter(redis: FakeAsyncRedis) -> TokenBucketLimiter:
+    return TokenBucketLimiter(
+        redis,
+        limits={"ocr": (RateLimit(burst=2, per_minute=1), RateLimit(burst=3, per_minute=1))},
+    )
+
+
+@pytest.mark.asyncio
+async def test_token_buckets_limit_per_user_and_globally():
+    """A user is stopped after the burst, and all users together are stopped by the global bucket."""
+    limiter = make_limiter(FakeAsyncRedis())
+
+    assert await limiter.acquire("ocr", user_id=1) is None
+    assert await limiter.acquire("ocr", user_id=1) is None
+    assert await limiter.acquire("ocr", user_id=1) == "user"
+    assert await limiter.acquire("ocr", user_id=2) is None
+    assert await limiter.acquire("ocr", user_id=3) == "global"
+
+
+@pytest.mark.asyncio
+async def test_throttled_message_gets_polite_reply_instead_of_handler():
+    """Once the budget is spent, the flagged handler is skipped and the user is asked to wait."""
+    middleware = ThrottlingMiddleware(make_limiter(FakeAsyncRedis()))
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event)
+
+    message = AsyncMock(spec=Message)
+    message.answer = AsyncMock()
+    data = {
+        "handler": HandlerObject(callback=handler, flags={"rate_limit": "ocr"}),
+        "event_from_user": User(id=1, is_bot=False, first_name="John"),
+    }
+
+    for _ in range(3):
+        await middleware(handler, message, data)
+
+    assert len(handled) == 2
+    message.answer.assert_called_once()
+    assert "too fast" in message.answer.call_args.args[0]
+
+
+@pytest.mark.asyncio
+async def test_price_confirmation_charges_llm_only_when_openai_generates_the_policy():
+    """A rejected price or a template policy is free; a throttled user is asked to wait before OpenAI is called."""
+    limiter = AsyncMock(spec=TokenBucketLimiter)
+    limiter.acquire.return_value = "user"
+    session = Session()
+    session.passport_data = PassportData(given_names="John", surnames="Doe", passport_number="AB123456")
+    session.vehicle_document_data = VehicleDocumentData(vin="1HGCM82633A004352")
+
+    with patch("app.handlers.save_policies", new_callable=AsyncMock):
+        await handle_price_confirmation(AsyncMock(data="confirm_no"), AsyncMock(), session, rate_limiter=limiter)
+        await handle_price_confirmation(AsyncMock(data="confirm_yes"), AsyncMock(), session, rate_limiter=limiter)
+    limiter.acquire.assert_not_awaited()
+
+    callback = AsyncMock(data="confirm_yes")
+    with (
+        patch("app.handlers.s.policy_mode", "enhanced"),
+        patch("app.handlers.openai_service.stream_policy_text") as stream_policy_text,
+    ):
+        await handle_price_confirmation(callback, AsyncMock(), session, rate_limiter=limiter)
+    limiter.acquire.assert_awaited_once_with("llm", callback.from_user.id)
+    callback.answer.assert_awaited_once_with(USER_THROTTLED_TEXT, show_alert=True)
+    stream_policy_text.assert_not_called()
+    callback.message.edit_text.assert_not_awaited()
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+
+from app.webhook import create_webhook_app
+
+SECRET = "test-secret"
+
+FAKE_UPDATE = {
+    "update_id": 1001,
+    "message": {
+        "message_id": 1,
+        "date": 1700000000,
+        "chat": {"id": 42, "type": "private"},
+        "from": {"id": 42, "is_bot": False, "first_name": "John"},
+        "text": "hello",
+    },
+}
+
+
+@pytest.mark.asyncio
+async def test_webhook_feeds_telegram_update_to_dispatcher():
+    """A Telegram update POSTed to the webhook path should reach the dispatcher's handlers."""
+    # Arrange: a dispatcher with a handler that records the received text
+    received = asyncio.Queue()
+    router = Router()
+
+    @router.message()
+    async def record_message(message: Message):
+        await received.put(message.text)
+
+    dispatcher = Dispatcher()
+    dispatcher.include_router(router)
+    bot = Bot(token="42:TEST")
+    app = create_webhook_app(dispatcher, bot, path="/webhook", secret=SECRET)
+
+    async with TestClient(TestServer(app)) as client:
+        # Act
+        response = await client.post("/webhook", json=FAKE_UPDATE, headers={"X-Telegram-Bot-Api-Secret-Token": SECRET})
+        rejected = await client.post("/webhook", json=FAKE_UPDATE, headers={"X-Telegram-Bot-Api-Secret-Token": "x"})
+        health = await client.get("/health")
+
+        # Assert
+        assert response.status == 200
+        assert await asyncio.wait_for(received.get(), timeout=1) == "hello"
+        assert rejected.status == 401
+        assert health.status == 200
+        assert received.empty()
@@ -0,0 +1,33 @@
+import pytest
+from fakeredis import FakeAsyncRedis
+
+from app.models import VehicleDocumentData
+from app.services.cache import OCRResultCache, RedisLRUCache
+
+
+@pytest.mark.asyncio
+async def test_lru_cache_evicts_least_recently_used():
+    """Once the cache is full, the entry that was read least recently is evicted."""
+    cache = RedisLRUCache(FakeAsyncRedis(), namespace="test", ttl=60, max_entries=2)
+
+    await cache.set("a", "1")
+    await cache.set("b", "2")
+    await cache.get("a")  # "b" is now the least recently used entry
+    await cache.set("c", "3")
+
+    assert await cache.get("a") == b"1"
+    assert await cache.get("b") is None
+    assert await cache.get("c") == b"3"
+    assert await cache.size() == 2
+
+
+@pytest.mark.asyncio
+async def test_ocr_cache_finds_forwarded_photo_by_content_hash():
+    """A document cached under one file_unique_id is found again by the hash of the same bytes."""
+    ocr_cache = OCRResultCache(RedisLRUCache(FakeAsyncRedis(), namespace="ocr", ttl=60, max_entries=10))
+    vehicle_data = VehicleDocumentData(vin="123XYZ", vehicle_make_and_model="Tesla Model S")
+
+    await ocr_cache.set("vehicle", vehicle_data, file_unique_id="file-1", content_hash="abc")
+
+    assert await ocr_cache.get("vehicle", file_unique_id="file-2", content_hash="abc") == vehicle_data
+    assert await ocr_cache.get("passport", content_hash="abc") is None
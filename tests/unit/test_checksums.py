@@ -0,0 +1,16 @@
+from app.utils.checksums import is_valid_vin, mrz_check_digit
+
+
+def test_mrz_check_digit():
+    """Check digits of the ICAO 9303 specimen passport."""
+    assert mrz_check_digit("L898902C3") == "6"
+    assert mrz_check_digit("740812") == "2"
+    assert mrz_check_digit("120415") == "9"
+
+
+def test_is_valid_vin():
+    assert is_valid_vin("1M8GDM9AXKP042788")  # "X" check digit
+    assert is_valid_vin("1HGCM82633A004352")
+    assert not is_valid_vin("1HGCM82643A004352")  # Wrong check digit
+    assert not is_valid_vin("1HGCM82633A00435")  # Too short
+    assert not is_valid_vin("1HGCM82633A0O4352")  # "O" is not used in VINs
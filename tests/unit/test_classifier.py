@@ -0,0 +1,19 @@
+import random
+
+from app.services.classifier import detect_document_type
+from benchmarks.document_fixtures import make_passport_page, make_vehicle_document_page, photograph, to_jpeg
+
+
+def test_detect_document_type_by_mrz():
+    """Passport photos are recognized by their machine-readable zone, anything else is left undecided."""
+    rng = random.Random(42)
+    passport_page = make_passport_page(rng)
+    passport = to_jpeg(photograph(passport_page, rng))
+    cropped_passport = to_jpeg(
+        photograph(passport_page.crop((0, 0, passport_page.width, passport_page.height * 2 // 3)), rng)
+    )
+    vehicle_document = to_jpeg(photograph(make_vehicle_document_page(rng), rng))
+
+    assert detect_document_type(passport) == "passport"
+    assert detect_document_type(cropped_passport) == "unknown"  # MRZ cut off: not mistaken for a vehicle document
+    assert detect_document_type(vehicle_document) == "unknown"
@@ -0,0 +1,25 @@
+from app.models import PassportData
+from app.services.local_ocr import parse_mrz
+
+# The ICAO 9303 specimen, as OCR reads it: spaces, a short filler run and "O" for "0" in the expiry date
+SPECIMEN_MRZ = """UTOPIA PASSPORT
+P<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<
+L898902C36UTO7408122F12O4159ZE184226B<<<<<10
+"""
+
+
+def test_parse_mrz():
+    """The MRZ is read when every check digit matches, and dates get their century."""
+    assert parse_mrz(SPECIMEN_MRZ) == PassportData(
+        given_names="ANNA MARIA",
+        surnames="ERIKSSON",
+        date_of_birth="1974-08-12",
+        passport_number="L898902C3",
+        date_of_expiry="2012-04-15",
+    )
+
+
+def test_parse_mrz_rejects_wrong_check_digit():
+    """A single misread character fails a check digit and leaves the photo to Mindee."""
+    assert parse_mrz(SPECIMEN_MRZ.replace("L898902C3", "L898982C3")) is None
+    assert parse_mrz("no machine-readable zone here") is None
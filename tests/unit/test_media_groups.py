@@ -0,0 +1,23 @@
+import pytest
+from aiogram.types import PhotoSize
+from fakeredis import FakeAsyncRedis
+
+from app.services.media_groups import MediaGroupCollector
+
+
+@pytest.mark.asyncio
+async def test_media_group_collector_gathers_album_photos():
+    """Only the first photo of an album starts processing, and collect returns every photo in order."""
+    collector = MediaGroupCollector(FakeAsyncRedis(), wait=0)
+    passport = PhotoSize(file_id="passport", file_unique_id="p", width=1280, height=960)
+    vehicle = PhotoSize(file_id="vehicle", file_unique_id="v", width=1280, height=960)
+
+    assert await collector.add("album-1", passport) is True
+    assert await collector.add("album-1", vehicle) is False
+
+    assert await collector.collect("album-1") == [passport, vehicle]
+    assert await collector.collect("album-1") == []
+
+    # A photo delayed past the wait doesn't start another album
+    late = PhotoSize(file_id="late", file_unique_id="l", width=1280, height=960)
+    assert await collector.add("album-1", late) is False
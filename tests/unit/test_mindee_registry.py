@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from mindee.mindee_http import mindee_api_v2
+
+from app.services.mindee import MindeeClientRegistry, _PooledRequests
+
+
+def test_registry_reuses_clients_per_key():
+    """The registry should build one MindeeService per (api_key, model_id) and reuse it afterwards."""
+    with patch("app.services.mindee.ClientV2") as mock_client_constructor:
+        registry = MindeeClientRegistry()
+        registry.warm_up([("passport-key", "passport-model")])
+
+        first = registry.get("passport-key", "passport-model")
+        second = registry.get("passport-key", "passport-model")
+        vehicle = registry.get("vehicle-key", "vehicle-model")
+
+    assert first is second
+    assert vehicle is not first
+    assert mock_client_constructor.call_count == 2
+
+    stats = registry.stats()
+    assert stats["clients"] == 2
+    assert stats["client_hits"] == 2
+    assert stats["client_misses"] == 1
+
+
+def test_mindee_http_layer_uses_pooled_session():
+    """Mindee's HTTP calls from the OCR threads go through the shared keep-alive session and are all counted."""
+    registry = MindeeClientRegistry()
+    assert mindee_api_v2.requests is registry.transport
+    sent_before = registry.stats()["requests_sent"]
+
+    with patch.object(registry.transport.session, "get") as mock_get, ThreadPoolExecutor(max_workers=8) as pool:
+        for _ in range(800):
+            pool.submit(mindee_api_v2.requests.get, "https://api-v2.mindee.net/v2/jobs/1", timeout=1)
+
+    mock_get.assert_called_with("https://api-v2.mindee.net/v2/jobs/1", timeout=1)
+    assert registry.stats()["requests_sent"] - sent_before == 800
+
+
+def test_transport_resize_keeps_a_connection_per_thread():
+    """`python -m app.cli --concurrency` grows the connection pool along with the OCR threads."""
+    transport = _PooledRequests(pool_size=4)
+    transport.resize(16)
+
+    assert transport.session.get_adapter("https://api-v2.mindee.net")._pool_maxsize == 16
+    assert MindeeClientRegistry(transport=transport).stats()["pool_size"] == 16
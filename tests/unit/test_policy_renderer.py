@@ -0,0 +1,22 @@
+from datetime import date
+
+from app.models import PassportData, VehicleDocumentData
+from app.services.policy_renderer import PolicyRenderer
+
+
+def test_render_policy_escapes_document_values():
+    """Test that the policy is rendered from the template and OCR values can't inject HTML."""
+    # Arrange
+    renderer = PolicyRenderer()
+    passport_data = PassportData(given_names="John <b>", surnames="Doe & Sons", passport_number="AB123456")
+    vehicle_data = VehicleDocumentData(vin="123XYZ", vehicle_make_and_model="Tesla Model S")
+
+    # Act
+    policy_text = renderer.render_policy(passport_data, vehicle_data, issued_on=date(2024, 2, 29))
+
+    # Assert
+    assert policy_text.startswith("📜 <b>Car Insurance Policy</b>")
+    assert "John &lt;b&gt; Doe &amp; Sons" in policy_text
+    assert "AB123456" in policy_text
+    assert "Tesla Model S" in policy_text
+    assert "29.02.2024 – 28.02.2025" in policy_text
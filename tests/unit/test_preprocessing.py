@@ -0,0 +1,41 @@
+import random
+from io import BytesIO
+
+import pytest
+from PIL import Image, ImageFilter
+
+from app.services.preprocessing import PhotoQualityError, preprocess_photo
+from benchmarks.document_fixtures import make_passport_page, photograph, to_jpeg
+
+OPTIONS = {"max_side": 1600, "quality": 85, "min_sharpness": 30, "min_brightness": 50}
+
+
+@pytest.fixture
+def photo():
+    rng = random.Random(0)
+    return photograph(make_passport_page(rng), rng)
+
+
+def test_preprocess_photo_downscales_and_recompresses(photo):
+    """A high-resolution photo is shrunk to the size OCR needs and gets much smaller."""
+    original = to_jpeg(photo.resize((3200, 2400)), quality=95)
+
+    processed = preprocess_photo(original, **OPTIONS)
+
+    assert max(Image.open(BytesIO(processed)).size) == 1600
+    assert len(processed) < len(original) / 2
+
+
+@pytest.mark.parametrize(
+    ("degrade", "reason"),
+    [
+        (lambda image: image.filter(ImageFilter.GaussianBlur(4)), "blurry"),
+        (lambda image: image.point(lambda p: p // 4), "dark"),
+    ],
+)
+def test_preprocess_photo_rejects_unreadable_photos(photo, degrade, reason):
+    """Blurry and dark photos are rejected locally instead of being sent to OCR."""
+    with pytest.raises(PhotoQualityError) as error:
+        preprocess_photo(to_jpeg(degrade(photo)), **OPTIONS)
+
+    assert error.value.reason == reason
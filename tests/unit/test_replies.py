@@ -0,0 +1,47 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fakeredis import FakeAsyncRedis
+
+from app.middlewares import THROTTLED_TEXTS
+from app.services.cache import RedisLRUCache, ReplyCache
+from app.services.replies import get_conversational_reply, match_intent, normalize_message
+
+
+def test_normalize_message():
+    """Test that case, punctuation and whitespace differences are folded away."""
+    assert normalize_message("  Is it SAFE?!  ") == "is it safe"
+    assert normalize_message("is   it safe") == "is it safe"
+
+
+def test_match_intent():
+    """Test that the top FAQs are recognized and other questions are left for the LLM."""
+    assert match_intent(normalize_message("How much is it?")) == "price"
+    assert match_intent(normalize_message("Hi!")) == "start"
+    assert match_intent(normalize_message("I want to cancel")) == "cancel"
+    assert match_intent(normalize_message("Which documents do you accept?")) is None
+
+
+@pytest.mark.asyncio
+async def test_get_conversational_reply_calls_openai_once_per_question():
+    """Equivalent messages should be answered from the cache after the first OpenAI call, which alone is charged."""
+    reply_cache = ReplyCache(RedisLRUCache(FakeAsyncRedis(), namespace="reply", ttl=60, max_entries=10))
+    with (
+        patch("app.services.replies.reply_cache", reply_cache),
+        patch("app.services.replies.openai_service") as mock_openai_service,
+    ):
+        mock_openai_service.generate_conversational_reply = AsyncMock(return_value="Passport and vehicle document.")
+
+        limiter = AsyncMock()
+        limiter.acquire.return_value = None
+        first = await get_conversational_reply("Which documents do you accept?", limiter, 7)
+        second = await get_conversational_reply("which documents do you accept", limiter, 7)
+        faq = await get_conversational_reply("how much?", limiter, 7)
+        limiter.acquire.return_value = "user"
+        throttled = await get_conversational_reply("Is it valid abroad?", limiter, 7)
+
+    assert first == second == "Passport and vehicle document."
+    assert "USD" in faq
+    assert throttled == THROTTLED_TEXTS["user"]
+    mock_openai_service.generate_conversational_reply.assert_called_once()
+    assert limiter.acquire.await_count == 2  # The OpenAI call and the throttled question
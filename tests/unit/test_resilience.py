@@ -0,0 +1,52 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services.resilience import CircuitBreaker, CircuitOpenError, Resilience, RetryPolicy
+
+
+class TransientError(Exception):
+    pass
+
+
+def make_resilience(attempts: int = 3, failure_threshold: int = 5, reset_timeout: float = 30) -> Resilience:
+    return Resilience(
+        "test",
+        lambda error: isinstance(error, TransientError),
+        RetryPolicy(attempts=attempts, base_delay=0, max_delay=0),
+        CircuitBreaker("test", failure_threshold=failure_threshold, reset_timeout=reset_timeout),
+    )
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried():
+    """A transient error is retried with backoff, other errors are raised right away."""
+    resilience = make_resilience()
+    flaky = AsyncMock(side_effect=[TransientError(), TransientError(), "ok"])
+    broken = AsyncMock(side_effect=ValueError("bad request"))
+
+    assert await resilience.call(flaky) == "ok"
+    assert flaky.call_count == 3
+    with pytest.raises(ValueError):
+        await resilience.call(broken)
+    assert broken.call_count == 1
+    assert resilience.breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_fails_fast_and_recovers():
+    """After repeated failures calls fail without reaching the service, until a trial call succeeds."""
+    resilience = make_resilience(attempts=1, failure_threshold=2, reset_timeout=10)
+    down = AsyncMock(side_effect=TransientError())
+    for _ in range(2):
+        with pytest.raises(TransientError):
+            await resilience.call(down)
+
+    with pytest.raises(CircuitOpenError):
+        await resilience.call(down)
+    assert down.call_count == 2
+    assert resilience.breaker.state == "open"
+
+    with patch("app.services.resilience.time.monotonic", return_value=resilience.breaker.opened_at + 10):
+        assert await resilience.call(AsyncMock(return_value="ok")) == "ok"
+    assert resilience.breaker.state == "closed"
@@ -1,7 +1,16 @@
+import hashlib
+from io import BytesIO
+
 import pytest
 
 from app.models import PassportData, VehicleDocumentData
-from app.utils.file_utils import get_clean_text, get_summary_text
+from app.utils.file_utils import (
+    DownloadedFile,
+    get_clean_text,
+    get_content_hash,
+    get_html_safe_prefix,
+    get_summary_text,
+)
 
 
 def test_get_clean_text():
@@ -40,3 +49,32 @@ async def test_get_summary_text():
     assert "AB123456" in summary_text
     assert "AA0000BB" in summary_text
     assert "🟩 Is this data correct" in summary_text
+
+
+def test_get_html_safe_prefix():
+    """Test that a partially streamed HTML text is cut and closed so Telegram can parse it."""
+    # Arrange
+    partial_text = "📜 <b>Car Insurance Policy</b>\n<i>Valid for 1 year &amp; covers <b>Collis"
+    cut_tag_text = "📜 <b>Policy</b> <i"
+    cut_entity_text = "Liability &am"
+
+    # Act & Assert
+    assert get_html_safe_prefix(partial_text) == partial_text + "</b></i>"
+    assert get_html_safe_prefix(cut_tag_text) == "📜 <b>Policy</b> "
+    assert get_html_safe_prefix(cut_entity_text) == "Liability "
+
+
+@pytest.mark.parametrize("max_size", [1024 * 1024, 1024])
+def test_downloaded_file_hashes_while_writing(max_size):
+    """The hash is computed during the download, whether the file stays in memory or is spooled to disk."""
+    chunks = [bytes([i]) * 4096 for i in range(4)]
+    file = DownloadedFile("passport.jpg", max_size=max_size)
+    for chunk in chunks:
+        file.write(chunk)
+    file.seek(0)
+
+    assert file._rolled == (max_size < 4 * 4096)
+    assert file.name == "passport.jpg"
+    assert get_content_hash(file) == hashlib.sha256(b"".join(chunks)).hexdigest()
+    assert get_content_hash(BytesIO(b"".join(chunks))) == get_content_hash(file)
+    assert file.read() == b"".join(chunks)
@@ -0,0 +1,105 @@
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from mindee.input.polling_options import PollingOptions
+from mindee.parsing.v2.field.inference_fields import InferenceFields
+
+from app.models import PassportData, VehicleDocumentData
+from app.services.mindee import MindeeService
+from app.services.validation import InvalidDocument, validate_document
+
+TODAY = date(2026, 1, 15)
+
+
+def test_validate_passport_normalizes_and_warns():
+    """Dates are normalized to ISO 8601 and what couldn't be read is pointed out, without rejecting the photo."""
+    passport = PassportData(
+        given_names=" John ",
+        surnames="Doe",
+        date_of_birth="12.08.1974",
+        passport_number="ab 123456",
+        date_of_issue=None,
+        date_of_expiry="15/04/2030",
+    )
+
+    validated = validate_document("passport", passport, today=TODAY)
+
+    assert validated == PassportData(
+        given_names="John",
+        surnames="Doe",
+        date_of_birth="1974-08-12",
+        passport_number="AB123456",
+        date_of_expiry="2030-04-15",
+        warnings=["The date of issue wasn't recognized."],
+    )
+
+
+@pytest.mark.parametrize(
+    ("changes", "reason"),
+    [
+        ({"date_of_expiry": "2025-12-31"}, "The passport expired on 2025-12-31"),
+        ({"date_of_birth": "2074-08-12"}, "The date of birth 2074-08-12 can't be right"),
+        ({"passport_number": "null"}, "Couldn't read the passport number"),
+    ],
+)
+def test_validate_passport_rejects(changes, reason):
+    passport = PassportData(given_names="John", surnames="Doe", date_of_birth="1974-08-12", passport_number="AB123456")
+
+    with pytest.raises(InvalidDocument) as error:
+        validate_document("passport", passport.model_copy(update=changes), today=TODAY)
+
+    assert error.value.reasons[0].startswith(reason)
+
+
+def test_validate_vehicle_document():
+    """Lookalike letters are fixed in the VIN; a wrong check digit is a warning, a malformed VIN an error."""
+    vehicle = VehicleDocumentData(
+        vin="1hgcm82633aoo4352",
+        vehicle_make_and_model="Tesla Model S",
+        registration_number="aa 0000 bb",
+        document_series_and_number="CXX123456",
+    )
+
+    validated = validate_document("vehicle", vehicle)
+    assert (validated.vin, validated.reg_number) == ("1HGCM82633A004352", "AA0000BB")
+    assert validated.warnings == []
+
+    wrong_check_digit = validate_document("vehicle", vehicle.model_copy(update={"vin": "1HGCM82643A004352"}))
+    assert wrong_check_digit.warnings == ["The VIN check digit doesn't match, please check the VIN carefully."]
+    with pytest.raises(InvalidDocument):
+        validate_document("vehicle", vehicle.model_copy(update={"vin": "1HGCM82633A00435"}))
+
+
+@pytest.mark.asyncio
+async def test_mindee_drops_low_confidence_values():
+    """A passport number Mindee isn't confident about counts as unread, so the photo is rejected."""
+
+    def field(value, confidence):
+        return {"value": value, "confidence": confidence, "locations": []}
+
+    fields = InferenceFields(
+        {
+            "given_names": field("John", "Certain"),
+            "surnames": field("Doe", "High"),
+            "passport_number": field("AB12345G", "Low"),
+            "date_of_birth": field("1990-01-01", "Medium"),
+        }
+    )
+    result = SimpleNamespace(inference=SimpleNamespace(result=SimpleNamespace(fields=fields)))
+    with patch("app.services.mindee.ClientV2") as mock_client_constructor:
+        client = mock_client_constructor.return_value
+        client.get_job.return_value.job.status = "Processed"
+        client.get_result.return_value = result
+        service = MindeeService(api_key="fake-key", model_id="fake-model")
+        service.params.polling_options = PollingOptions(initial_delay_sec=0, delay_sec=0)
+
+        assert await service.process_passport_photo(b"photo") is None
+        fields["passport_number"].confidence = fields["surnames"].confidence
+        passport = await service.process_passport_photo(b"photo")
+
+    assert passport.passport_number == "AB12345G"
+    assert passport.date_of_birth == "1990-01-01"
+    params = client.enqueue_inference.call_args.kwargs["params"]
+    assert params.confidence is True